@@ -1,18 +1,100 @@
 """
 Vercel Serverless Entry Point for FastAPI
+
+Routers are imported on the first request that targets them, so a cold start
+serving /api/health or /api/v1/auth/login does not pay for pandas, jinja2,
+aiosmtplib or unrelated routers. See benchmarks/cold_start.py for the budget.
 """
 import sys
 import os
+import hmac
+import importlib
+import logging
+import time
 
 # Add backend to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from mangum import Mangum
 
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.core.replica import ReadYourWritesMiddleware
+from app.core.responses import ORJSONResponse
+
+setup_logging()
+logger = logging.getLogger("app.api.index")
+
+if not settings.CRON_SECRET:
+    # No scheduled outbox dispatch: each request delivers its own email after the response
+    logger.warning(
+        "CRON_SECRET is not set; outbox emails are sent before responses complete. "
+        "Set CRON_SECRET and schedule /api/cron/outbox so auth requests don't wait on SMTP."
+    )
+
+API_V1_PREFIX = "/api/v1"
+
+# URL segment under /api/v1 -> module providing `router`
+LAZY_ROUTERS = {
+    "auth": "app.routers.auth",
+    "campaigns": "app.routers.campaigns",
+    "templates": "app.routers.templates",
+    "smtp": "app.routers.smtp",
+    "uploads": "app.routers.uploads",
+    "stats": "app.routers.stats",
+    "suppressions": "app.routers.suppressions",
+    "t": "app.routers.tracking",
+    "unsubscribe": "app.routers.unsubscribe",
+}
+
+_loaded_routers: set = set()
+
 # Create simple app first
-app = FastAPI(title="NovaMailer API", version="1.0.0")
+app = FastAPI(title="NovaMailer API", version="1.0.0", default_response_class=ORJSONResponse)
+
+
+def include_router(name: str) -> None:
+    """Import and mount a router once per process"""
+    if name in _loaded_routers:
+        return
+    module = importlib.import_module(LAZY_ROUTERS[name])
+    app.include_router(module.router, prefix=f"{API_V1_PREFIX}/{name}", tags=[name])
+    _loaded_routers.add(name)
+
+
+class LazyRouterMiddleware:
+    """Mount the router owning the requested path before routing happens"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            try:
+                if path.startswith(API_V1_PREFIX + "/"):
+                    name = path[len(API_V1_PREFIX) + 1:].split("/", 1)[0]
+                    if name in LAZY_ROUTERS:
+                        include_router(name)
+                elif path in ("/openapi.json", "/docs", "/redoc"):
+                    # The schema has to describe every router
+                    for name in LAZY_ROUTERS:
+                        include_router(name)
+            except Exception as e:
+                logger.exception("Failed to load router for %s", path)
+                response = JSONResponse({"error": str(e)}, status_code=500)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+app.add_middleware(LazyRouterMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 
 # Configure CORS - allow all for now
 app.add_middleware(
@@ -35,21 +117,29 @@ async def api_root():
 async def health_check():
     return {"status": "ok"}
 
-# Try to import routers - catch errors
-try:
-    from app.core.config import settings
-    from app.routers import auth, campaigns, templates, smtp, uploads, stats
-    
-    app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
-    app.include_router(campaigns.router, prefix="/api/v1/campaigns", tags=["campaigns"])
-    app.include_router(templates.router, prefix="/api/v1/templates", tags=["templates"])
-    app.include_router(smtp.router, prefix="/api/v1/smtp", tags=["smtp"])
-    app.include_router(uploads.router, prefix="/api/v1/uploads", tags=["uploads"])
-    app.include_router(stats.router, prefix="/api/v1/stats", tags=["stats"])
-except Exception as e:
-    @app.get("/api/error")
-    async def show_error():
-        return {"error": str(e)}
+@app.get("/api/cron/outbox", include_in_schema=False)
+async def dispatch_outbox(request: Request):
+    """Scheduled outbox delivery (a Vercel cron job); there is no lifespan dispatcher here"""
+    if not settings.CRON_SECRET or not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {settings.CRON_SECRET}"
+    ):
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+
+    from app.services import email as email_service, outbox
+
+    deadline = time.monotonic() + settings.OUTBOX_CRON_SECONDS
+    attempted = 0
+    try:
+        while time.monotonic() < deadline:
+            count = await outbox.dispatch_pending()
+            if not count:
+                break
+            attempted += count
+        purged = await outbox.purge_resolved(settings.OTP_PURGE_BATCH_SIZE)
+    finally:
+        # The instance may be frozen until the next invocation; don't keep SMTP sessions open
+        await email_service.smtp_pool.close_all()
+    return {"attempted": attempted, "purged": purged}
 
 # Vercel serverless handler
 handler = Mangum(app, lifespan="off")
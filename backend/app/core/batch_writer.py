@@ -0,0 +1,92 @@
+"""
+Background batching for high-volume append-only writes.
+
+Producers put rows on a bounded asyncio.Queue; `run()` drains it and hands
+rows to `write` in batches, flushing when `batch_size` rows are waiting or
+`flush_seconds` have passed since the first one. The in-flight write is
+shielded from cancellation and whatever is buffered is flushed when the
+task is stopped at shutdown. Without a running writer (serverless entry
+point, no lifespan) `put` writes each row directly.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+
+class BatchWriter:
+    """Drains queued rows into batched writes from one background task"""
+
+    def __init__(
+        self,
+        write: Callable[[List[dict]], Awaitable[None]],
+        batch_size: int,
+        flush_seconds: float,
+        queue_size: int,
+    ):
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    async def put(self, row: dict) -> None:
+        """Queue a row, waiting while the writer is far behind"""
+        if self._queue is not None:
+            await self._queue.put(row)
+        else:
+            await self.write([row])
+
+    def offer(self, row: dict) -> bool:
+        """Queue a row without waiting; False when it was not accepted"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def _drain(self, queue: asyncio.Queue, batch: List[dict]) -> None:
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def run(self) -> None:
+        """Long-running loop batching queued rows"""
+        queue = self._queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        batch: List[dict] = []
+        writing: Optional[asyncio.Future] = None
+        try:
+            while True:
+                batch.append(await queue.get())
+                deadline = loop.time() + self.flush_seconds
+                while True:
+                    self._drain(queue, batch)
+                    remaining = deadline - loop.time()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                rows, batch = batch, []
+                # Shielded so a shutdown mid-write neither loses nor duplicates the batch
+                writing = asyncio.ensure_future(self.write(rows))
+                await asyncio.shield(writing)
+        finally:
+            # Shutdown: stop accepting rows, then flush whatever is buffered
+            self._queue = None
+            if writing is not None and not writing.done():
+                await writing
+            while True:
+                self._drain(queue, batch)
+                if not batch:
+                    break
+                rows, batch = batch, []
+                await self.write(rows)
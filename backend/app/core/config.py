@@ -10,17 +10,107 @@ class Settings(BaseSettings):
     # Database URL - supports SQLite, PostgreSQL (Supabase), MySQL
     # For Supabase: use the connection string from Project Settings > Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./novamailer.db"
+    # Apply pending schema migrations when a worker boots
+    AUTO_MIGRATE: bool = True
+    # Optional read replica for SELECT-only endpoints (empty = use DATABASE_URL)
+    READ_REPLICA_URL: str = ""
+    # After a write, the same client reads from the primary for this long (replication lag budget)
+    READ_REPLICA_STICKY_SECONDS: float = 5.0
+    # Connection pool (PostgreSQL/MySQL); per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    # SQLite pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"  # readers no longer wait behind the writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # safe with WAL, far fewer fsyncs than FULL
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # wait for locks instead of "database is locked"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
     # CORS origins - comma-separated list
     CORS_ORIGINS: str = "http://localhost:3000"
     # Frontend URL for email links
     FRONTEND_URL: str = "http://localhost:3000"
+    # Public URL of this API, used in tracking and unsubscribe links inside emails
+    PUBLIC_BASE_URL: str = "http://localhost:8000"
+    # Query instrumentation: log statements slower than this (milliseconds)
+    SLOW_QUERY_MS: int = 200
+    # Flag a statement shape repeated this many times in one request as N+1
+    N_PLUS_ONE_THRESHOLD: int = 5
+    # Logging: JSON lines written by a background thread
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    # Per campaign, keep the first LOG_SAMPLE_BURST info/debug records, then 1 in LOG_SAMPLE_EVERY
+    LOG_SAMPLE_BURST: int = 20
+    LOG_SAMPLE_EVERY: int = 100
+    # At most LOG_ERROR_RATE_LIMIT identical warnings/errors per LOG_ERROR_RATE_WINDOW seconds
+    LOG_ERROR_RATE_LIMIT: int = 10
+    LOG_ERROR_RATE_WINDOW: float = 60.0
+    # Responses smaller than this (bytes) are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # Expired OTPs are deleted every OTP_PURGE_INTERVAL_SECONDS, OTP_PURGE_BATCH_SIZE rows per statement
+    OTP_PURGE_INTERVAL_SECONDS: int = 3600
+    OTP_PURGE_BATCH_SIZE: int = 1000
+    # Email outbox dispatcher
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_SECONDS: float = 5.0
+    OUTBOX_LEASE_SECONDS: int = 300  # claimed rows are retried if not resolved by then
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETRY_BASE_SECONDS: int = 30  # doubled after every failed attempt
+    OUTBOX_RETENTION_HOURS: int = 24  # sent/failed rows (OTP codes in plaintext) are deleted after this
+    OUTBOX_PURGE_INTERVAL_SECONDS: int = 3600
+    # Serverless: a cron job calls /api/cron/outbox with "Authorization: Bearer CRON_SECRET". Empty disables
+    # that endpoint, and each request then delivers its own email before its response completes (see README)
+    CRON_SECRET: str = ""
+    OUTBOX_CRON_SECONDS: float = 8.0  # stop claiming new batches after this long in one cron request
+    # Pooled SMTP connections idle longer than this are reopened
+    SMTP_POOL_MAX_IDLE_SECONDS: float = 60.0
+    # A relay failing this many sends in a row is ejected for SMTP_BREAKER_RESET_SECONDS
+    SMTP_BREAKER_FAILURE_THRESHOLD: int = 5
+    SMTP_BREAKER_RESET_SECONDS: float = 60.0
+    # Campaign sends commit recipient statuses and rollups every N recipients
+    SEND_COMMIT_EVERY: int = 500
+    # Delivery event writer: flush every DELIVERY_EVENTS_BATCH_SIZE events or DELIVERY_EVENTS_FLUSH_SECONDS
+    DELIVERY_EVENTS_BATCH_SIZE: int = 500
+    DELIVERY_EVENTS_FLUSH_SECONDS: float = 1.0
+    DELIVERY_EVENTS_QUEUE_SIZE: int = 10000  # senders wait when this many events are unwritten
+    # False-positive rate of the per-user suppression Bloom filters (hits are confirmed in the DB)
+    SUPPRESSION_BLOOM_FP_RATE: float = 0.001
+    # Per worker: users whose template snapshots stay loaded, and compiled templates kept per render process
+    TEMPLATE_ENV_CACHE_SIZE: int = 256
+    TEMPLATE_CACHE_SIZE: int = 100
+    # Sandboxed render processes per worker (0 = render inline in a thread, without the memory limit)
+    TEMPLATE_RENDER_WORKERS: int = 2
+    TEMPLATE_RENDER_CPU_SECONDS: float = 1.0  # per recipient render
+    TEMPLATE_RENDER_MEMORY_MB: int = 512  # address space per render process (0 = unlimited)
+    TEMPLATE_RENDER_TIMEOUT_SECONDS: float = 60.0  # wall clock per chunk of renders before it fails and its pool is replaced
+    TEMPLATE_MAX_OUTPUT_CHARS: int = 2_000_000
+    # Recipients rendered ahead of sending, split across the render processes
+    TEMPLATE_RENDER_BATCH_SIZE: int = 200
+    # Open/click event writer; hits beyond TRACKING_EVENTS_QUEUE_SIZE unwritten events are dropped
+    TRACKING_EVENTS_BATCH_SIZE: int = 2000
+    TRACKING_EVENTS_FLUSH_SECONDS: float = 1.0
+    TRACKING_EVENTS_QUEUE_SIZE: int = 100000
+    # Resumable CSV uploads are staged here (empty = system temp dir); must be shared by all workers of a host
+    UPLOAD_DIR: str = ""
+    UPLOAD_MAX_BYTES: int = 2 * 1024 ** 3
+    UPLOAD_MAX_CHUNK_BYTES: int = 64 * 1024 ** 2
+    UPLOAD_INGEST_BATCH_ROWS: int = 10000  # rows parsed and inserted per progress update
+    UPLOAD_EXPIRE_HOURS: int = 24  # unfinished uploads idle this long are deleted
+    UPLOAD_INGEST_STALL_MINUTES: int = 15  # a processing upload without progress this long is resumed
+    # Unsubscribes are coalesced into suppression inserts; requests wait when the queue is full
+    UNSUBSCRIBE_BATCH_SIZE: int = 500
+    UNSUBSCRIBE_FLUSH_SECONDS: float = 1.0
+    UNSUBSCRIBE_QUEUE_SIZE: int = 10000
+    # A batch that fails to store is retried after this long, doubling up to UNSUBSCRIBE_RETRY_MAX_SECONDS
+    UNSUBSCRIBE_RETRY_SECONDS: float = 1.0
+    UNSUBSCRIBE_RETRY_MAX_SECONDS: float = 30.0
 
     class Config:
         env_file = ".env"
 
-    def get_database_url(self) -> str:
-        """Convert DATABASE_URL to async version if needed"""
-        url = self.DATABASE_URL
+    @staticmethod
+    def _async_url(url: str) -> str:
         # Supabase/Railway PostgreSQL URL starts with postgres:// or postgresql://
         if url.startswith("postgres://"):
             url = url.replace("postgres://", "postgresql+asyncpg://", 1)
@@ -28,6 +118,34 @@ class Settings(BaseSettings):
             url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
         return url
 
+    def get_database_url(self) -> str:
+        """Convert DATABASE_URL to async version if needed"""
+        return self._async_url(self.DATABASE_URL)
+
+    def get_read_database_url(self) -> str:
+        """Async READ_REPLICA_URL, or an empty string when no replica is configured"""
+        return self._async_url(self.READ_REPLICA_URL) if self.READ_REPLICA_URL else ""
+
+    def get_engine_options(self, url: str) -> dict:
+        """Pool settings for create_async_engine, by database backend"""
+        if url.startswith("sqlite"):
+            # SQLite picks its own pool class; tuning happens through pragmas
+            return {}
+        return {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+        }
+
+    def get_sqlite_pragmas(self) -> dict:
+        return {
+            "journal_mode": self.SQLITE_JOURNAL_MODE,
+            "synchronous": self.SQLITE_SYNCHRONOUS,
+            "busy_timeout": self.SQLITE_BUSY_TIMEOUT_MS,
+            "mmap_size": self.SQLITE_MMAP_SIZE,
+        }
+
     def get_cors_origins(self) -> list[str]:
         """Parse CORS origins from comma-separated string"""
         origins = [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
@@ -1,28 +1,90 @@
+import time
+from fastapi import Depends, Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core import metrics, query_stats, replica
+
+def _create_engine(database_url: str):
+    # Disable prepared statements for Supabase connection pooler (pgbouncer)
+    connect_args = {}
+    if "supabase" in database_url or "pooler" in database_url:
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+        }
+
+    db_engine = create_async_engine(
+        database_url, 
+        echo=False,
+        connect_args=connect_args,
+        pool_pre_ping=True,
+        **settings.get_engine_options(database_url),
+    )
+
+    if database_url.startswith("sqlite"):
+        @event.listens_for(db_engine.sync_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in settings.get_sqlite_pragmas().items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    metrics.instrument_engine(db_engine)
+    query_stats.instrument_engine(db_engine)
+    return db_engine
 
 # Use get_database_url() to handle PostgreSQL URL conversion
 database_url = settings.get_database_url()
-
-# Disable prepared statements for Supabase connection pooler (pgbouncer)
-connect_args = {}
-if "supabase" in database_url or "pooler" in database_url:
-    connect_args = {
-        "statement_cache_size": 0,
-        "prepared_statement_cache_size": 0,
-    }
-
-engine = create_async_engine(
-    database_url, 
-    echo=False,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-)
+engine = _create_engine(database_url)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Optional read replica for SELECT-only endpoints; falls back to the primary
+read_database_url = settings.get_read_database_url()
+read_engine = _create_engine(read_database_url) if read_database_url else engine
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
 Base = declarative_base()
 
+async def _session(session_factory):
+    async with session_factory() as session:
+        # Check out the connection up front so pool wait time is measurable
+        start = time.perf_counter()
+        await session.connection()
+        metrics.DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+        yield session
+
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async for session in _session(AsyncSessionLocal):
+        yield session
+
+def read_session_factory(request: Request):
+    """The replica's sessionmaker, unless the caller needs its own recent writes"""
+    if read_engine is engine or replica.wants_primary(request.scope):
+        return AsyncSessionLocal
+    return ReadSessionLocal
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """Session for SELECT-only endpoints (see app/core/replica.py).
+
+    Reads served by the primary reuse the request's primary session (the one
+    get_current_user already holds), so a request never checks out two
+    primary connections.
+    """
+    if read_session_factory(request) is AsyncSessionLocal:
+        yield db
+        return
+    async for session in _session(ReadSessionLocal):
         yield session
+
+def pool_status(db_engine=engine) -> dict:
+    """Current pool usage, for tuning DB_POOL_SIZE and DB_MAX_OVERFLOW"""
+    pool = db_engine.sync_engine.pool
+    status = {"pool_class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    if hasattr(pool, "_max_overflow"):
+        status["max_overflow"] = pool._max_overflow
+    return status
@@ -0,0 +1,43 @@
+"""
+ETag helpers for conditional GETs.
+
+ETags are derived from cheap version markers (the `version` counters on
+Campaign and Template) so an endpoint can answer If-None-Match with a 304
+after a single aggregate query, before loading or serializing any bodies.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def check_not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already has `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
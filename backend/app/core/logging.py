@@ -0,0 +1,151 @@
+"""
+Structured, non-blocking logging.
+
+Records are filtered in the calling coroutine (per-campaign sampling and
+error rate limiting), handed to a bounded in-memory queue and written as
+JSON lines by a background QueueListener thread, so a slow stdout pipe never
+stalls the event loop. When the queue is full records are dropped rather
+than blocking the sender.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.core.config import settings
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class CampaignSamplingFilter(logging.Filter):
+    """Keep the first `burst` records per campaign, then one in every `every`.
+
+    Warnings and errors are not sampled here; they go through the rate limiter.
+    """
+
+    def __init__(self, burst: int, every: int, max_campaigns: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.every = max(every, 1)
+        self.max_campaigns = max_campaigns
+        self._seen: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        campaign_id = getattr(record, "campaign_id", None)
+        if campaign_id is None or record.levelno >= logging.WARNING:
+            return True
+        if len(self._seen) >= self.max_campaigns:
+            self._seen.clear()
+        n = self._seen.get(campaign_id, 0) + 1
+        self._seen[campaign_id] = n
+        return n <= self.burst or n % self.every == 0
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Allow at most `limit` warnings/errors per call site in each `window` seconds.
+
+    The next record let through after a quiet period reports how many were
+    suppressed, so bursts of identical SMTP failures cost one line each window.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._buckets: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.limit <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window_start, count, suppressed = self._buckets.get(key, (now, 0, 0))
+        if now - window_start >= self.window:
+            window_start, count = now, 0
+        if count >= self.limit:
+            self._buckets[key] = (window_start, count, suppressed + 1)
+            return False
+        self._buckets[key] = (window_start, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def setup_logging() -> None:
+    """Route the `app` logger hierarchy through a background writer (idempotent)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if settings.LOG_JSON:
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(CampaignSamplingFilter(settings.LOG_SAMPLE_BURST, settings.LOG_SAMPLE_EVERY))
+        queue_handler.addFilter(ErrorRateLimitFilter(settings.LOG_ERROR_RATE_LIMIT, settings.LOG_ERROR_RATE_WINDOW))
+
+        app_logger = logging.getLogger("app")
+        app_logger.setLevel(settings.LOG_LEVEL.upper())
+        app_logger.addHandler(queue_handler)
+        app_logger.propagate = False
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        app_logger = logging.getLogger("app")
+        for handler in list(app_logger.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                app_logger.removeHandler(handler)
+        app_logger.propagate = True
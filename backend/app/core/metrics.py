@@ -0,0 +1,192 @@
+"""
+Prometheus metrics for the API, the database pool and SMTP delivery.
+
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn with several workers), every
+worker writes its samples to that directory and /metrics aggregates them, so
+a scrape sees the whole server rather than whichever worker answered.
+"""
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy import event
+
+REQUEST_LATENCY = Histogram(
+    "novamailer_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "novamailer_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "novamailer_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "novamailer_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "novamailer_db_pool_size",
+    "Configured pool size (persistent connections per worker)",
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_OVERFLOW = Gauge(
+    "novamailer_db_pool_max_overflow",
+    "Configured extra connections allowed beyond the pool size, per worker",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTION_HOLD = Histogram(
+    "novamailer_db_pool_connection_hold_seconds",
+    "How long a connection stays checked out before it is returned",
+)
+DB_POOL_CONNECTIONS_OPENED = Counter(
+    "novamailer_db_pool_connections_opened_total",
+    "New DBAPI connections opened by the pool",
+)
+
+SMTP_CONNECT_LATENCY = Histogram(
+    "novamailer_smtp_connect_duration_seconds",
+    "SMTP connect, TLS and login latency",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+SMTP_SEND_LATENCY = Histogram(
+    "novamailer_smtp_send_duration_seconds",
+    "SMTP message submission latency",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+SMTP_RELAY_EJECTIONS = Counter(
+    "novamailer_smtp_relay_ejections_total",
+    "Times a relay's circuit breaker opened after repeated failures",
+)
+SMTP_RELAY_FAILURES = Counter(
+    "novamailer_smtp_relay_failures_total",
+    "Relay-level send failures (connection, auth, throttling) that trigger failover",
+)
+DELIVERY_EVENTS_WRITTEN = Counter(
+    "novamailer_delivery_events_written_total",
+    "Delivery events inserted by the batch writer",
+)
+DELIVERY_EVENTS_FLUSH_SIZE = Histogram(
+    "novamailer_delivery_events_flush_size",
+    "Events per delivery event batch insert",
+    buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000),
+)
+TRACKING_EVENTS = Counter(
+    "novamailer_tracking_events_total",
+    "Open/click hits by event and outcome (queued, dropped, invalid)",
+    ["event", "outcome"],
+)
+UNSUBSCRIBES = Counter(
+    "novamailer_unsubscribes_total",
+    "Unsubscribes accepted from List-Unsubscribe and unsubscribe links",
+)
+
+EMAILS_TOTAL = Counter(
+    "novamailer_emails_total",
+    "Campaign emails processed by delivery status",
+    ["status"],
+)
+CAMPAIGNS_TOTAL = Counter(
+    "novamailer_campaigns_total",
+    "Campaign sends finished by final campaign status",
+    ["status"],
+)
+
+
+def instrument_engine(engine) -> None:
+    """Track pool usage through SQLAlchemy pool events"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.inc(pool.size())
+        DB_POOL_MAX_OVERFLOW.inc(max(getattr(pool, "_max_overflow", 0), 0))
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_OPENED.inc()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            DB_POOL_CHECKED_OUT.dec()
+            DB_POOL_CONNECTION_HOLD.observe(time.perf_counter() - started)
+
+
+def _route_template(scope) -> str:
+    # Label by route template rather than raw path to keep cardinality bounded
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if not template:
+        return "unmatched"
+    # Some FastAPI versions report the router-local template for included
+    # routers; restore the static prefix from the concrete request path.
+    tail = template.rstrip("/").split("/")[1:]
+    segments = scope["path"].rstrip("/").split("/")
+    prefix = "/".join(segments[: len(segments) - len(tail)])
+    return prefix + template if not template.startswith(prefix + "/") else template
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording latency and in-flight requests"""
+
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, _route_template(scope), str(status_code)).observe(
+                time.perf_counter() - start
+            )
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Serialize current metrics, aggregating across workers in multiprocess mode"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,117 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events count every statement and its duration against the request
+that issued it (tracked through a context variable), the middleware reports
+the totals as response headers, slow statements are logged with their
+parameters redacted, and repeated statement shapes within one request are
+flagged as likely N+1 patterns.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER_LIST = re.compile(r"(\?|%\(\w+\)s|\$\d+|:\w+)(\s*,\s*(\?|%\(\w+\)s|\$\d+|:\w+))+")
+_NUMBER = re.compile(r"\b\d+\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int) -> list[tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.items() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so that calls differing only in literals compare equal"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    return _NUMBER.sub("N", shape)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def instrument_engine(engine) -> None:
+    """Attach cursor execution hooks that feed the per-request QueryStats"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            # Parameters may hold emails, OTP codes or password hashes
+            redacted = len(parameters) if isinstance(parameters, (list, tuple, dict)) else 0
+            logger.warning(
+                "Slow query (%.1f ms, %d params redacted): %s",
+                elapsed * 1000,
+                redacted,
+                _WHITESPACE.sub(" ", statement).strip(),
+            )
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware exposing per-request query counts and DB time"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append(
+                    (b"server-timing", f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'.encode())
+                )
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            for shape, n in stats.repeated_shapes(settings.N_PLUS_ONE_THRESHOLD):
+                logger.warning(
+                    "Possible N+1 on %s %s: statement executed %d times: %s",
+                    scope["method"],
+                    scope["path"],
+                    n,
+                    shape,
+                )
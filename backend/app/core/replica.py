@@ -0,0 +1,84 @@
+"""
+Read-your-writes routing for the optional read replica.
+
+`get_read_db` sends SELECT-only endpoints to READ_REPLICA_URL, except for
+clients that just wrote something: after a successful POST/PUT/PATCH/DELETE
+the same bearer token reads from the primary for READ_REPLICA_STICKY_SECONDS,
+so a campaign list fetched right after creating a campaign includes it even
+if the replica lags. Clients can also ask for the primary explicitly with
+`X-Read-Consistency: primary` (stickiness is tracked per worker process).
+
+To try it locally with two SQLite files, migrate both and point the app at
+them; reads then show whatever the "replica" file contains:
+
+    DATABASE_URL=sqlite+aiosqlite:///./primary.db python migrate.py
+    DATABASE_URL=sqlite+aiosqlite:///./replica.db python migrate.py
+    DATABASE_URL=sqlite+aiosqlite:///./primary.db \\
+    READ_REPLICA_URL=sqlite+aiosqlite:///./replica.db uvicorn main:app
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Clients remembered per worker; the oldest are forgotten first
+MAX_TRACKED_CLIENTS = 10000
+
+_recent_writes: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value
+    return None
+
+
+def _client_key(scope) -> Optional[str]:
+    authorization = _header(scope, b"authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization).hexdigest()
+
+
+def mark_write(scope) -> None:
+    key = _client_key(scope)
+    if key is None:
+        return
+    _recent_writes[key] = time.monotonic()
+    _recent_writes.move_to_end(key)
+    while len(_recent_writes) > MAX_TRACKED_CLIENTS:
+        _recent_writes.popitem(last=False)
+
+
+def wants_primary(scope) -> bool:
+    """Whether this request must see the primary's latest state"""
+    consistency = _header(scope, b"x-read-consistency")
+    if consistency and consistency.lower() == b"primary":
+        return True
+    key = _client_key(scope)
+    if key is None:
+        return False
+    written_at = _recent_writes.get(key)
+    return written_at is not None and time.monotonic() - written_at < settings.READ_REPLICA_STICKY_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware remembering which clients just wrote successfully"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                mark_write(scope)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
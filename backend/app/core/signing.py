@@ -0,0 +1,31 @@
+"""
+Compact HMAC-signed tokens for public links (tracking, unsubscribe).
+
+A token is its dot-separated payload followed by a truncated HMAC-SHA256
+of it, keyed with SECRET_KEY and a per-purpose prefix so a token minted for
+one link type is never valid for another. Verification needs no database.
+"""
+import base64
+import hashlib
+import hmac
+from typing import List, Optional
+from app.core.config import settings
+
+
+def _signature(purpose: str, payload: str) -> str:
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"{purpose}:{payload}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+
+
+def sign(purpose: str, *parts) -> str:
+    """Token carrying `parts`; they must not contain '.'"""
+    payload = ".".join(str(part) for part in parts)
+    return f"{payload}.{_signature(purpose, payload)}"
+
+
+def verify(purpose: str, token: str) -> Optional[List[str]]:
+    """The token's parts, or None when it wasn't signed by us for `purpose`"""
+    payload, _, signature = token.rpartition(".")
+    if not payload or not hmac.compare_digest(signature, _signature(purpose, payload)):
+        return None
+    return payload.split(".")
@@ -0,0 +1,48 @@
+"""
+In-process background tasks started from the app lifespan.
+
+Every worker runs its own copy, so periodic jobs must be idempotent and
+safe to run concurrently (batched deletes, SKIP LOCKED claims and so on).
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+_tasks: list = []
+
+
+def start_periodic(name: str, interval: float, job: Callable[[], Awaitable]) -> asyncio.Task:
+    """Run `job` every `interval` seconds until stop_all() is called"""
+
+    async def runner():
+        while True:
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background task %s failed", name)
+            await asyncio.sleep(interval)
+
+    task = asyncio.create_task(runner(), name=name)
+    _tasks.append(task)
+    return task
+
+
+def start_background(name: str, coro_fn: Callable[[], Awaitable]) -> asyncio.Task:
+    """Run a long-lived coroutine (which loops on its own) until stop_all()"""
+    task = asyncio.create_task(coro_fn(), name=name)
+    _tasks.append(task)
+    return task
+
+
+async def stop_all() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
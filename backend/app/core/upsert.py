@@ -0,0 +1,78 @@
+"""
+Dialect-aware upserts.
+
+PostgreSQL and SQLite use INSERT ... ON CONFLICT, MySQL uses ON DUPLICATE
+KEY UPDATE (or INSERT IGNORE). One statement handles a whole batch of rows,
+and concurrent writers resolve conflicts in the database instead of racing.
+"""
+from typing import Dict, List, Sequence
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported on {dialect_name}")
+    return insert
+
+
+async def upsert_increment(
+    db: AsyncSession,
+    table: Table,
+    key_columns: Sequence[str],
+    counter_columns: Sequence[str],
+    rows: List[Dict],
+) -> None:
+    """Insert `rows`, adding their counters to rows that already exist for the key"""
+    if not rows:
+        return
+    dialect_name = db.bind.dialect.name
+    stmt = _dialect_insert(dialect_name)(table).values(rows)
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = stmt.on_duplicate_key_update(
+            {name: table.c[name] + stmt.inserted[name] for name in counter_columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: table.c[name] + stmt.excluded[name] for name in counter_columns},
+        )
+    await db.execute(stmt)
+
+
+async def upsert_rows(
+    db: AsyncSession,
+    table: Table,
+    key_columns: Sequence[str],
+    rows: List[Dict],
+    update_columns: Sequence[str] = (),
+) -> int:
+    """Insert `rows`; existing rows for the key get `update_columns` overwritten, or are left alone.
+
+    Keys must be unique within `rows` (PostgreSQL can't update a row twice in one statement).
+    Returns the driver's rowcount; without `update_columns` that is the number of rows inserted.
+    """
+    if not rows:
+        return 0
+    dialect_name = db.bind.dialect.name
+    stmt = _dialect_insert(dialect_name)(table).values(rows)
+    if dialect_name in ("mysql", "mariadb"):
+        if update_columns:
+            stmt = stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_columns})
+        else:
+            stmt = stmt.prefix_with("IGNORE")
+    elif update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: stmt.excluded[name] for name in update_columns},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+    result = await db.execute(stmt)
+    return result.rowcount
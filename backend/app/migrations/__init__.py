@@ -0,0 +1,41 @@
+"""
+Versioned schema migrations.
+
+Each migration is a module exposing VERSION, DESCRIPTION and
+`upgrade(conn)` (run on a synchronous connection). Register new modules in
+MIGRATIONS in version order; `runner.run_migrations` applies whatever the
+database is missing and records it in the schema_migrations table.
+"""
+from app.migrations import (
+    v0001_initial,
+    v0002_version_counters,
+    v0003_otp_indexes,
+    v0004_email_outbox,
+    v0005_recipient_columns,
+    v0006_suppressions,
+    v0007_smtp_relays,
+    v0008_send_rollups,
+    v0009_delivery_events,
+    v0010_template_loader_index,
+    v0011_engagement_tracking,
+    v0012_csv_uploads,
+    v0013_recipient_unique_email,
+    v0014_recipient_status_index,
+)
+
+MIGRATIONS = [
+    v0001_initial,
+    v0002_version_counters,
+    v0003_otp_indexes,
+    v0004_email_outbox,
+    v0005_recipient_columns,
+    v0006_suppressions,
+    v0007_smtp_relays,
+    v0008_send_rollups,
+    v0009_delivery_events,
+    v0010_template_loader_index,
+    v0011_engagement_tracking,
+    v0012_csv_uploads,
+    v0013_recipient_unique_email,
+    v0014_recipient_status_index,
+]
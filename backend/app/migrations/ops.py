@@ -0,0 +1,63 @@
+"""
+Idempotent schema operations used by migrations.
+
+Operations take a synchronous connection (migrations run through
+`conn.run_sync`) and read table, column and index definitions from the
+models, so the models stay the single source of truth. Every operation
+checks the live schema first: a fresh database created from the current
+models and an old database upgraded step by step converge on the same
+schema, and re-running a half-applied migration is harmless.
+"""
+from sqlalchemy import inspect, text
+from app.core.database import Base
+
+
+def _table(table_name: str):
+    import app.models  # noqa: F401 - registers every model on Base.metadata
+
+    return Base.metadata.tables[table_name]
+
+
+def has_table(conn, table_name: str) -> bool:
+    return inspect(conn).has_table(table_name)
+
+
+def create_table(conn, table_name: str) -> None:
+    """Create a table (and the indexes declared on it) from its model"""
+    _table(table_name).create(conn, checkfirst=True)
+
+
+def add_column(conn, table_name: str, column_name: str, default_sql: str = None) -> None:
+    """Add a column declared on the model if the live table lacks it"""
+    if has_column(conn, table_name, column_name):
+        return
+    column = _table(table_name).c[column_name]
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=conn.dialect)}"
+    if default_sql is not None:
+        ddl += f" DEFAULT {default_sql}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def create_index(conn, table_name: str, index_name: str) -> None:
+    """Create an index declared on the model (in __table_args__ or via index=True)"""
+    table = _table(table_name)
+    index = next(i for i in table.indexes if i.name == index_name)
+    index.create(conn, checkfirst=True)
+
+
+def drop_index(conn, table_name: str, index_name: str) -> None:
+    existing = {i["name"] for i in inspect(conn).get_indexes(table_name)}
+    if index_name in existing:
+        conn.execute(text(f"DROP INDEX {index_name}"))
+
+
+def has_column(conn, table_name: str, column_name: str) -> bool:
+    return column_name in {c["name"] for c in inspect(conn).get_columns(table_name)}
+
+
+def drop_column(conn, table_name: str, column_name: str) -> None:
+    """Drop a column the models no longer declare (SQLite needs 3.35+)"""
+    if has_column(conn, table_name, column_name):
+        conn.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {column_name}"))
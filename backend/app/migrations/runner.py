@@ -0,0 +1,77 @@
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from app.migrations import MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+# Kept outside Base.metadata so create_all-style tooling never touches it
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary key for the PostgreSQL advisory lock serialising concurrent workers
+_ADVISORY_LOCK_KEY = 7_318_260_415
+
+LATEST_VERSION = max(m.VERSION for m in MIGRATIONS)
+
+
+async def current_version(engine) -> int:
+    """Return the applied schema version, or 0 for an unmanaged database"""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(select(func.max(schema_migrations.c.version)))
+            return result.scalar() or 0
+    except DBAPIError:
+        # schema_migrations does not exist yet
+        return 0
+
+
+async def run_migrations(engine) -> int:
+    """Bring the schema up to LATEST_VERSION.
+
+    An up-to-date database costs exactly one query, so this is cheap enough
+    to run on every worker boot.
+    """
+    version = await current_version(engine)
+    if version >= LATEST_VERSION:
+        return version
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Other workers booting at the same time wait here, then find nothing to do
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        await conn.run_sync(schema_migrations.create, checkfirst=True)
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m.VERSION):
+        if migration.VERSION <= version:
+            continue
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            applied = await conn.execute(
+                select(schema_migrations.c.version).where(schema_migrations.c.version == migration.VERSION)
+            )
+            if applied.first() is not None:
+                continue
+            logger.info("Applying migration %04d: %s", migration.VERSION, migration.DESCRIPTION)
+            await conn.run_sync(migration.upgrade)
+            try:
+                await conn.execute(
+                    schema_migrations.insert().values(
+                        version=migration.VERSION,
+                        description=migration.DESCRIPTION,
+                        applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                    )
+                )
+            except IntegrityError:
+                # Another worker recorded it first; the operations are idempotent
+                logger.info("Migration %04d already recorded by another worker", migration.VERSION)
+        version = migration.VERSION
+
+    return version
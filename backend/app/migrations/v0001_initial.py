@@ -0,0 +1,12 @@
+"""Baseline schema, folding in the old migrate_otp.py user columns"""
+from app.migrations import ops
+
+VERSION = 1
+DESCRIPTION = "initial schema"
+
+
+def upgrade(conn):
+    for table_name in ("users", "smtp_configs", "campaigns", "templates", "recipients", "otps", "attachments"):
+        ops.create_table(conn, table_name)
+    ops.add_column(conn, "users", "email_verified", "FALSE")
+    ops.add_column(conn, "users", "two_factor_enabled", "FALSE")
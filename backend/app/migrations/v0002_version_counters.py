@@ -0,0 +1,10 @@
+"""Version counters on campaigns and templates for ETag generation"""
+from app.migrations import ops
+
+VERSION = 2
+DESCRIPTION = "version counters on campaigns and templates"
+
+
+def upgrade(conn):
+    ops.add_column(conn, "campaigns", "version", "1")
+    ops.add_column(conn, "templates", "version", "1")
@@ -0,0 +1,10 @@
+"""Indexes for OTP invalidation, verification and purging"""
+from app.migrations import ops
+
+VERSION = 3
+DESCRIPTION = "otp lookup and expiry indexes"
+
+
+def upgrade(conn):
+    ops.create_index(conn, "otps", "ix_otps_user_purpose_used")
+    ops.create_index(conn, "otps", "ix_otps_expires_at")
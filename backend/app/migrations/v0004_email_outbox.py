@@ -0,0 +1,9 @@
+"""Transactional email outbox"""
+from app.migrations import ops
+
+VERSION = 4
+DESCRIPTION = "email outbox"
+
+
+def upgrade(conn):
+    ops.create_table(conn, "email_outbox")
@@ -0,0 +1,58 @@
+"""Store recipient CSV data as positional arrays with a per-campaign column schema"""
+from sqlalchemy import JSON, bindparam, column, select, table, update
+from app.migrations import ops
+
+VERSION = 5
+DESCRIPTION = "compact recipient personalisation data"
+
+# Rows rewritten per executemany UPDATE
+BATCH_SIZE = 1000
+
+# Lightweight table handles: the legacy `data` column is no longer on the model
+_recipients = table("recipients", column("id"), column("campaign_id"), column("data", JSON), column("fields", JSON))
+_campaigns = table("campaigns", column("id"), column("recipient_columns", JSON))
+_rewrite = (
+    update(_recipients)
+    .where(_recipients.c.id == bindparam("rid"))
+    .values(fields=bindparam("new_fields", type_=JSON))
+)
+
+
+def upgrade(conn):
+    from app.services import recipient_service
+
+    ops.add_column(conn, "campaigns", "recipient_columns")
+    ops.add_column(conn, "recipients", "fields")
+    if not ops.has_column(conn, "recipients", "data"):
+        return
+
+    campaign_ids = conn.execute(
+        select(_recipients.c.campaign_id).where(_recipients.c.data.isnot(None)).distinct()
+    ).scalars().all()
+    for campaign_id in campaign_ids:
+        legacy = select(_recipients.c.id, _recipients.c.data).where(
+            _recipients.c.campaign_id == campaign_id,
+            _recipients.c.data.isnot(None),
+            _recipients.c.fields.is_(None),
+        )
+        # First pass fixes the column order, second rewrites the rows
+        first_pass = conn.execute(legacy.order_by(_recipients.c.id).execution_options(yield_per=BATCH_SIZE))
+        existing = conn.execute(
+            select(_campaigns.c.recipient_columns).where(_campaigns.c.id == campaign_id)
+        ).scalar()
+        columns = recipient_service.merge_columns(existing, (r.data for r in first_pass if r.data))
+        conn.execute(update(_campaigns).where(_campaigns.c.id == campaign_id).values(recipient_columns=columns))
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                legacy.where(_recipients.c.id > last_id).order_by(_recipients.c.id).limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                _rewrite,
+                [{"rid": r.id, "new_fields": recipient_service.encode_row(columns, r.data or {})} for r in rows],
+            )
+            last_id = rows[-1].id
+
+    ops.drop_column(conn, "recipients", "data")
@@ -0,0 +1,9 @@
+"""Per-user suppression list"""
+from app.migrations import ops
+
+VERSION = 6
+DESCRIPTION = "suppressions"
+
+
+def upgrade(conn):
+    ops.create_table(conn, "suppressions")
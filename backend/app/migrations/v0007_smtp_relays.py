@@ -0,0 +1,12 @@
+"""Several SMTP relays per user: name, weight, rate budget and active flag"""
+from app.migrations import ops
+
+VERSION = 7
+DESCRIPTION = "smtp relay load balancing columns"
+
+
+def upgrade(conn):
+    ops.add_column(conn, "smtp_configs", "name")
+    ops.add_column(conn, "smtp_configs", "weight", "1")
+    ops.add_column(conn, "smtp_configs", "rate_limit_per_minute")
+    ops.add_column(conn, "smtp_configs", "is_active", "TRUE")
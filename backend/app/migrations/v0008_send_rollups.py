@@ -0,0 +1,11 @@
+"""Delivery timestamps on recipients and hourly send rollups"""
+from app.migrations import ops
+
+VERSION = 8
+DESCRIPTION = "recipient delivery timestamps and send rollups"
+
+
+def upgrade(conn):
+    ops.add_column(conn, "recipients", "sent_at")
+    ops.add_column(conn, "recipients", "failed_at")
+    ops.create_table(conn, "send_rollups")
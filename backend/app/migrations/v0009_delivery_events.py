@@ -0,0 +1,9 @@
+"""Append-only delivery event log"""
+from app.migrations import ops
+
+VERSION = 9
+DESCRIPTION = "delivery events"
+
+
+def upgrade(conn):
+    ops.create_table(conn, "delivery_events")
@@ -0,0 +1,9 @@
+"""Index for the Jinja loader's per-user template refresh"""
+from app.migrations import ops
+
+VERSION = 10
+DESCRIPTION = "templates (user_id, name, version) index"
+
+
+def upgrade(conn):
+    ops.create_index(conn, "templates", "ix_templates_user_name")
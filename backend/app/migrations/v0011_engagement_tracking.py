@@ -0,0 +1,12 @@
+"""Open/click tracking: campaign flags, link tables and the event log"""
+from app.migrations import ops
+
+VERSION = 11
+DESCRIPTION = "engagement tracking"
+
+
+def upgrade(conn):
+    ops.add_column(conn, "campaigns", "track_opens", "FALSE")
+    ops.add_column(conn, "campaigns", "track_clicks", "FALSE")
+    ops.create_table(conn, "campaign_links")
+    ops.create_table(conn, "tracking_events")
@@ -0,0 +1,9 @@
+"""Resumable chunked CSV uploads"""
+from app.migrations import ops
+
+VERSION = 12
+DESCRIPTION = "csv uploads"
+
+
+def upgrade(conn):
+    ops.create_table(conn, "csv_uploads")
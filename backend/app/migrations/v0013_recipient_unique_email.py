@@ -0,0 +1,41 @@
+"""One recipient per (campaign_id, email): normalise addresses, drop duplicates, add the unique index"""
+from itertools import groupby
+from sqlalchemy import and_, column, delete, func, select, table, text
+from app.migrations import ops
+
+VERSION = 13
+DESCRIPTION = "unique recipient email per campaign"
+
+# Duplicate rows deleted per statement
+BATCH_SIZE = 1000
+
+_recipients = table("recipients", column("id"), column("campaign_id"), column("email"), column("status"))
+
+
+def upgrade(conn):
+    ops.add_column(conn, "csv_uploads", "mode", "'append'")
+    ops.add_column(conn, "csv_uploads", "updated", "0")
+
+    conn.execute(text("UPDATE recipients SET email = LOWER(TRIM(email)) WHERE email <> LOWER(TRIM(email))"))
+
+    r = _recipients.c
+    duplicates = (
+        select(r.campaign_id, r.email)
+        .group_by(r.campaign_id, r.email)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = conn.execute(
+        select(r.id, r.campaign_id, r.email, r.status)
+        .join(duplicates, and_(r.campaign_id == duplicates.c.campaign_id, r.email == duplicates.c.email))
+        .order_by(r.campaign_id, r.email)
+    ).all()
+    doomed = []
+    for _, group in groupby(rows, key=lambda row: (row.campaign_id, row.email)):
+        # Keep the row that was already delivered (or attempted), else the oldest
+        group = sorted(group, key=lambda row: (row.status == "pending", row.id))
+        doomed.extend(row.id for row in group[1:])
+    for start in range(0, len(doomed), BATCH_SIZE):
+        conn.execute(delete(_recipients).where(r.id.in_(doomed[start:start + BATCH_SIZE])))
+
+    ops.create_index(conn, "recipients", "uq_recipients_campaign_email")
@@ -0,0 +1,9 @@
+"""Index for filtering and paging recipients by status within a campaign"""
+from app.migrations import ops
+
+VERSION = 14
+DESCRIPTION = "recipients (campaign_id, status, id) index"
+
+
+def upgrade(conn):
+    ops.create_index(conn, "recipients", "ix_recipients_campaign_status_id")
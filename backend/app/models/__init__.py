@@ -5,5 +5,12 @@ from app.models.campaign import Campaign
 from app.models.template import Template
 from app.models.recipient import Recipient
 from app.models.otp import OTP
+from app.models.attachment import Attachment
+from app.models.outbox import OutboxEmail
+from app.models.suppression import Suppression
+from app.models.rollup import SendRollup
+from app.models.delivery_event import DeliveryEvent
+from app.models.tracking import CampaignLink, TrackingEvent
+from app.models.upload import CsvUpload
 
-__all__ = ["User", "SMTPConfig", "Campaign", "Template", "Recipient", "OTP"]
+__all__ = ["User", "SMTPConfig", "Campaign", "Template", "Recipient", "OTP", "Attachment", "OutboxEmail", "Suppression", "SendRollup", "DeliveryEvent", "CampaignLink", "TrackingEvent", "CsvUpload"]
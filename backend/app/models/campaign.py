@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Text, JSON, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -12,6 +12,20 @@ class Campaign(Base):
     body = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String(50), default="draft") # draft, sending, completed, failed
+    # Bumped on every UPDATE; drives ETags for campaign reads
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=text("version + 1"))
+    # CSV column names, stored once; each Recipient.fields is a positional array
+    recipient_columns = Column(JSON, nullable=True)
+    # Engagement tracking: open pixel and click redirects through /t
+    track_opens = Column(Boolean, nullable=False, default=False)
+    track_clicks = Column(Boolean, nullable=False, default=False)
     
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", backref="campaigns")
+
+    # Fetch the new version via RETURNING instead of expiring it after UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    def bump_version(self):
+        """Invalidate cached reads when only related rows (recipients) changed"""
+        self.version = Campaign.version + 1
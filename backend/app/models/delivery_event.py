@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index
+from app.core.database import Base
+
+class DeliveryEvent(Base):
+    """Append-only record of every delivery attempt and outcome.
+
+    Written in batches by services/delivery_events.py; rows are never updated.
+    No foreign keys: events outlive deleted relays and stay cheap to insert.
+    """
+    __tablename__ = "delivery_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    campaign_id = Column(Integer, nullable=True)
+    recipient_id = Column(Integer, nullable=True)
+    smtp_config_id = Column(Integer, nullable=True)
+    event = Column(String(20), nullable=False)  # sent, failed, suppressed
+    attempt = Column(Integer, nullable=False, default=1)  # relay attempt number for this message
+    smtp_response = Column(Text, nullable=True)  # server reply on success, error text on failure
+    duration_ms = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_delivery_events_recipient", "recipient_id", "id"),
+        Index("ix_delivery_events_campaign_created", "campaign_id", "created_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from datetime import datetime, timezone
 from app.core.database import Base
 
@@ -12,6 +12,13 @@ class OTP(Base):
     expires_at = Column(DateTime, nullable=False)
     used = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    __table_args__ = (
+        # Serves both the bulk invalidation in generate_otp and the lookup in verify_otp
+        Index("ix_otps_user_purpose_used", "user_id", "purpose", "used", "created_at"),
+        # Lets the purge task find expired rows without a table scan
+        Index("ix_otps_expires_at", "expires_at"),
+    )
     
     def is_expired(self):
         # Make expires_at timezone-aware if it's naive
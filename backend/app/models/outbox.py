@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from datetime import datetime, timezone
+from app.core.database import Base
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class OutboxEmail(Base):
+    """Transactional email written alongside the change that triggers it.
+
+    The dispatcher claims due rows by pushing next_attempt_at forward (a
+    lease), so a crashed worker's claims are retried once the lease expires.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # otp_registration, otp_login, otp_password_reset, test
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(500), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=_utcnow)
+    created_at = Column(DateTime, nullable=False, default=_utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    # Relay to send through; NULL means the system relay (first configured SMTP account)
+    smtp_config_id = Column(Integer, ForeignKey("smtp_configs.id"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -6,9 +6,19 @@ class Recipient(Base):
     __tablename__ = "recipients"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String(255), nullable=False)
-    data = Column(JSON, nullable=True) # Store other CSV columns
-    status = Column(String(50), default="pending") # pending, sent, failed
+    email = Column(String(255), nullable=False)  # normalised: trimmed and lowercased
+    # CSV values in the order of Campaign.recipient_columns (see recipient_service)
+    fields = Column(JSON, nullable=True)
+    status = Column(String(50), default="pending") # pending, sent, failed, suppressed
+    sent_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
     
     campaign_id = Column(Integer, ForeignKey("campaigns.id"))
     campaign = relationship("Campaign", backref="recipients")
+
+    __table_args__ = (
+        # One row per address and campaign; uploads upsert against it
+        Index("uq_recipients_campaign_email", "campaign_id", "email", unique=True),
+        # Status filters and keyset pages within a campaign, and the send path's pending scan
+        Index("ix_recipients_campaign_status_id", "campaign_id", "status", "id"),
+    )
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.core.database import Base
+
+class SendRollup(Base):
+    """Hourly delivery counts, maintained by the send loop.
+
+    campaign_id 0 holds the user's totals across all campaigns, so the
+    dashboard's time series never has to aggregate per-campaign rows.
+    """
+    __tablename__ = "send_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    campaign_id = Column(Integer, primary_key=True)  # 0 = all campaigns
+    bucket = Column(DateTime, primary_key=True)  # start of the UTC hour
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    suppressed = Column(Integer, nullable=False, default=0)
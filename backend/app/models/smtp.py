@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -6,11 +6,16 @@ class SMTPConfig(Base):
     __tablename__ = "smtp_configs"
 
     id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=True)  # label shown when a user has several relays
     host = Column(String(255), nullable=False)
     port = Column(Integer, nullable=False)
     username = Column(String(255), nullable=False)
     password = Column(String(255), nullable=False) # Should be encrypted
     from_email = Column(String(255), nullable=False)
+    # Load balancing across a user's relays (see services/relay_pool.py)
+    weight = Column(Integer, nullable=False, default=1)
+    rate_limit_per_minute = Column(Integer, nullable=True)  # NULL = unlimited
+    is_active = Column(Boolean, nullable=False, default=True)
     
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", backref="smtp_config")
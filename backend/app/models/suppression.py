@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+class Suppression(Base):
+    """Address a user never sends to again (bounced, unsubscribed, complained)"""
+    __tablename__ = "suppressions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String(255), nullable=False)  # stored lowercased and stripped
+    reason = Column(String(50), nullable=False, default="manual")  # manual, bounce, unsubscribe, complaint
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "email", name="uq_suppressions_user_email"),
+    )
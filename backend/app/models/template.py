@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Text, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -8,6 +8,16 @@ class Template(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     content = Column(Text, nullable=False) # HTML content
+    # Bumped on every UPDATE; drives ETags for template reads
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=text("version + 1"))
     
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", backref="templates")
+
+    __table_args__ = (
+        # Loader refreshes list (id, name, version) per user on every render request
+        Index("ix_templates_user_name", "user_id", "name", "version"),
+    )
+
+    # Fetch the new version via RETURNING instead of expiring it after UPDATE
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index, UniqueConstraint
+from app.core.database import Base
+
+class CampaignLink(Base):
+    """Tracked links of a campaign body; click URLs carry the position, not the target"""
+    __tablename__ = "campaign_links"
+
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)
+    url = Column(Text, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "position", name="uq_campaign_links_position"),
+    )
+
+class TrackingEvent(Base):
+    """Append-only open/click events, written in batches by services/tracking.py"""
+    __tablename__ = "tracking_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    campaign_id = Column(Integer, nullable=False)
+    recipient_id = Column(Integer, nullable=False)
+    event = Column(String(10), nullable=False)  # open, click
+    link_position = Column(Integer, nullable=True)  # clicks only
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Unique opens/clicks per campaign
+        Index("ix_tracking_events_campaign_event", "campaign_id", "event", "recipient_id"),
+    )
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Text, JSON, Index
+from datetime import datetime, timezone
+from app.core.database import Base
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class CsvUpload(Base):
+    """A resumable recipient CSV upload, staged on local disk until ingested.
+
+    Chunks are accepted only at offset `received`; once complete the file is
+    ingested in the background and the counters below report progress.
+    """
+    __tablename__ = "csv_uploads"
+
+    id = Column(String(32), primary_key=True)  # random hex; also names the staged file
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)  # declared total bytes
+    received = Column(BigInteger, nullable=False, default=0)
+    columns = Column(JSON, nullable=True)  # header, once the first line has arrived and validated
+    mode = Column(String(10), nullable=False, default="append")  # append, merge (see recipient_service.add_recipients)
+    status = Column(String(20), nullable=False, default="uploading")  # uploading, processing, completed, failed
+    rows_processed = Column(Integer, nullable=False, default=0)
+    added = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    suppressed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=_utcnow)
+    updated_at = Column(DateTime, nullable=False, default=_utcnow, onupdate=_utcnow)
+
+    __table_args__ = (
+        # Lets the purge task find abandoned uploads
+        Index("ix_csv_uploads_status_updated", "status", "updated_at"),
+    )
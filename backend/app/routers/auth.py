@@ -1,6 +1,6 @@
 from datetime import timedelta
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -10,15 +10,16 @@ from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import User
-from app.models.smtp import SMTPConfig
 from app.schemas.user import Token, UserCreate, User as UserSchema, OTPVerify, ForgotPasswordRequest, ResetPasswordRequest
-from app.services import otp_service
+from app.services import otp_service, outbox
 
 router = APIRouter()
 
 @router.post("/login")
 async def login_access_token(
-    db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     result = await db.execute(select(User).filter(User.email == form_data.username))
     user = result.scalars().first()
@@ -39,18 +40,10 @@ async def login_access_token(
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    # If 2FA enabled, send OTP
+    # If 2FA enabled, queue the OTP email (delivered by the outbox dispatcher)
     if user.two_factor_enabled:
-        code = await otp_service.generate_otp(db, user.id, 'login')
-        
-        result = await db.execute(select(SMTPConfig).limit(1))
-        smtp_config = result.scalars().first()
-        
-        if smtp_config:
-            try:
-                await otp_service.send_otp_email(smtp_config, user.email, code, 'login')
-            except Exception as e:
-                print(f"Failed to send OTP email: {e}")
+        entry = await otp_service.issue_otp(db, user.id, user.email, 'login')
+        outbox.kick(background_tasks, entry)
         
         return {
             "message": "OTP sent to your email",
@@ -93,6 +86,7 @@ async def verify_login(
 @router.post("/register")
 async def register_user(
     *,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     user_in: UserCreate,
 ) -> Any:
@@ -115,18 +109,9 @@ async def register_user(
     await db.commit()
     await db.refresh(user)
     
-    # Generate and send OTP
-    code = await otp_service.generate_otp(db, user.id, 'registration')
-    
-    # Get SMTP config (use first available)
-    result = await db.execute(select(SMTPConfig).limit(1))
-    smtp_config = result.scalars().first()
-    
-    if smtp_config:
-        try:
-            await otp_service.send_otp_email(smtp_config, user.email, code, 'registration')
-        except Exception as e:
-            print(f"Failed to send OTP email: {e}")
+    # Generate OTP and queue its email in one transaction
+    entry = await otp_service.issue_otp(db, user.id, user.email, 'registration')
+    outbox.kick(background_tasks, entry)
     
     return {
         "message": "Registration successful. Please check your email for verification code.",
@@ -158,6 +143,7 @@ async def verify_email(
 @router.post("/forgot-password")
 async def forgot_password(
     request: ForgotPasswordRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     """Request password reset OTP"""
@@ -168,16 +154,8 @@ async def forgot_password(
         # Don't reveal if email exists
         return {"message": "If email exists, OTP has been sent"}
     
-    code = await otp_service.generate_otp(db, user.id, 'password_reset')
-    
-    result = await db.execute(select(SMTPConfig).limit(1))
-    smtp_config = result.scalars().first()
-    
-    if smtp_config:
-        try:
-            await otp_service.send_otp_email(smtp_config, user.email, code, 'password_reset')
-        except Exception as e:
-            print(f"Failed to send OTP email: {e}")
+    entry = await otp_service.issue_otp(db, user.id, user.email, 'password_reset')
+    outbox.kick(background_tasks, entry)
     
     return {
         "message": "If email exists, OTP has been sent",
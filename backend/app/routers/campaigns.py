@@ -1,13 +1,23 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+import logging
+from typing import List, Literal, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case
+from sqlalchemy.orm import defer
 from app import deps
-from app.core.database import get_db
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, read_session_factory
+from app.core.etag import check_not_modified, etag_headers, make_etag
+from app.core.responses import ORJSONResponse
 from app.models.campaign import Campaign
 from app.models.user import User
 from app.models.attachment import Attachment
-from app.schemas.campaign import CampaignCreate, Campaign as CampaignSchema
+from app.schemas.campaign import CampaignCreate, CampaignEngagement, Campaign as CampaignSchema
+from app.schemas.recipient import RecipientPage, RecipientStatus
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -25,18 +35,36 @@ async def create_campaign(
 
 @router.get("/", response_model=List[CampaignSchema])
 async def read_campaigns(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    result = await db.execute(select(Campaign).filter(Campaign.user_id == current_user.id).offset(skip).limit(limit))
-    return result.scalars().all()
+    # Any insert or update changes count, max id or the version sum
+    marker = await db.execute(
+        select(func.count(Campaign.id), func.max(Campaign.id), func.sum(Campaign.version))
+        .filter(Campaign.user_id == current_user.id)
+    )
+    etag = make_etag("campaigns", current_user.id, skip, limit, *marker.one())
+    not_modified = check_not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    # Plain rows straight to orjson; response_model is kept for the schema only
+    result = await db.execute(
+        select(
+            Campaign.id, Campaign.name, Campaign.subject, Campaign.body,
+            Campaign.created_at, Campaign.status, Campaign.user_id,
+            Campaign.track_opens, Campaign.track_clicks,
+        ).filter(Campaign.user_id == current_user.id).offset(skip).limit(limit)
+    )
+    return ORJSONResponse([dict(row._mapping) for row in result], headers=etag_headers(etag))
 
 @router.get("/{campaign_id}", response_model=CampaignSchema)
 async def read_campaign(
     campaign_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     result = await db.execute(select(Campaign).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id))
@@ -49,6 +77,7 @@ async def read_campaign(
 async def upload_csv(
     campaign_id: int,
     file: UploadFile = File(...),
+    mode: Literal["append", "merge"] = Query("append", description="merge also updates the data of addresses already in the campaign"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
@@ -58,38 +87,97 @@ async def upload_csv(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    from app.services import csv_service
-    from app.models.recipient import Recipient
+    from app.services import csv_service, recipient_service
     
     data = await csv_service.parse_csv(file)
+    added, updated, suppressed = await recipient_service.add_recipients(db, campaign, data, merge=mode == "merge")
     
-    # Create recipients
-    for row in data:
-        # Find email column case-insensitively
-        email = None
-        for k, v in row.items():
-            if k.lower() == 'email':
-                email = v
-                break
-        
-        if email:
-            recipient = Recipient(email=email, data=row, campaign_id=campaign.id)
-            db.add(recipient)
-    
+    campaign.bump_version()
     await db.commit()
-    return {"message": f"Successfully added {len(data)} recipients"}
+    return {"message": f"Successfully added {added} recipients", "updated": updated, "suppressed": suppressed}
+
+@router.get("/{campaign_id}/recipients", response_model=RecipientPage)
+async def search_recipients(
+    campaign_id: int,
+    status: Optional[List[RecipientStatus]] = Query(None, description="Repeat to match any of several statuses"),
+    email: Optional[str] = Query(None, description="Exact address (case-insensitive)"),
+    email_prefix: Optional[str] = Query(None, min_length=1),
+    after: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Find recipients of a campaign, paged by id; every filter is served by an index"""
+    from app.models.recipient import Recipient
+    from app.services.recipient_service import decode_row
+    from app.services.suppression_service import normalize
+
+    result = await db.execute(
+        select(Campaign.recipient_columns).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    columns = row.recipient_columns
+
+    query = select(
+        Recipient.id, Recipient.email, Recipient.status, Recipient.sent_at, Recipient.failed_at, Recipient.fields
+    ).filter(Recipient.campaign_id == campaign_id)
+    if status:
+        query = query.filter(Recipient.status.in_(status))
+    if email is not None:
+        # Addresses are stored normalised, so this is a unique index lookup
+        query = query.filter(Recipient.email == normalize(email))
+    if email_prefix is not None:
+        prefix = normalize(email_prefix)
+        # The range condition lets the (campaign_id, email) index serve the prefix match
+        query = query.filter(Recipient.email >= prefix, Recipient.email.startswith(prefix, autoescape=True))
+    if after is not None:
+        query = query.filter(Recipient.id > after)
+    result = await db.execute(query.order_by(Recipient.id).limit(limit + 1))
+    rows = result.all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return ORJSONResponse({
+        "recipients": [
+            {
+                "id": r.id,
+                "email": r.email,
+                "status": r.status,
+                "sent_at": r.sent_at,
+                "failed_at": r.failed_at,
+                "data": decode_row(columns, r.fields),
+            }
+            for r in rows
+        ],
+        "next_cursor": rows[-1].id if has_more else None,
+    })
 
 @router.get("/{campaign_id}/details")
 async def get_campaign_details(
     campaign_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     """Get detailed campaign information including stats and recipients"""
     from app.models.recipient import Recipient
+    from app.services.recipient_service import decode_row
     from sqlalchemy import func
     
-    # Verify campaign ownership
+    # Verify campaign ownership and answer revalidations from the version alone
+    result = await db.execute(
+        select(Campaign.version).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id)
+    )
+    version = result.scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    etag = make_etag("campaign-details", campaign_id, version)
+    not_modified = check_not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
     result = await db.execute(select(Campaign).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id))
     campaign = result.scalars().first()
     if not campaign:
@@ -101,18 +189,19 @@ async def get_campaign_details(
             func.count(Recipient.id).label('total'),
             func.sum(case((Recipient.status == 'sent', 1), else_=0)).label('sent'),
             func.sum(case((Recipient.status == 'pending', 1), else_=0)).label('pending'),
-            func.sum(case((Recipient.status == 'failed', 1), else_=0)).label('failed')
+            func.sum(case((Recipient.status == 'failed', 1), else_=0)).label('failed'),
+            func.sum(case((Recipient.status == 'suppressed', 1), else_=0)).label('suppressed')
         ).filter(Recipient.campaign_id == campaign_id)
     )
     stats = stats_query.first()
     
     # Get recipients
     recipients_result = await db.execute(
-        select(Recipient).filter(Recipient.campaign_id == campaign_id).limit(100)
+        select(Recipient.id, Recipient.email, Recipient.status, Recipient.fields)
+        .filter(Recipient.campaign_id == campaign_id).limit(100)
     )
-    recipients = recipients_result.scalars().all()
     
-    return {
+    return ORJSONResponse({
         "id": campaign.id,
         "name": campaign.name,
         "subject": campaign.subject,
@@ -120,21 +209,61 @@ async def get_campaign_details(
         "status": campaign.status,
         "created_at": campaign.created_at,
         "user_id": campaign.user_id,
+        "track_opens": campaign.track_opens,
+        "track_clicks": campaign.track_clicks,
         "stats": {
             "total_recipients": stats.total or 0,
             "sent": stats.sent or 0,
             "pending": stats.pending or 0,
-            "failed": stats.failed or 0
+            "failed": stats.failed or 0,
+            "suppressed": stats.suppressed or 0
         },
         "recipients": [
-            {
-                "id": r.id,
-                "email": r.email,
-                "status": r.status,
-                "data": r.data
-            } for r in recipients
+            {"id": r.id, "email": r.email, "status": r.status, "data": decode_row(campaign.recipient_columns, r.fields)}
+            for r in recipients_result
         ]
-    }
+    }, headers=etag_headers(etag))
+
+@router.get("/{campaign_id}/engagement", response_model=CampaignEngagement)
+async def get_campaign_engagement(
+    campaign_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Open and click counts from the tracking event log"""
+    result = await db.execute(
+        select(Campaign.id).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    from app.services import tracking
+
+    return ORJSONResponse(await tracking.engagement(db, campaign_id))
+
+@router.get("/{campaign_id}/recipients/export")
+async def export_recipients(
+    campaign_id: int,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Stream every recipient with its delivery status as CSV or NDJSON"""
+    result = await db.execute(
+        select(Campaign.id).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    from app.services import export_service
+
+    media_type, extension = export_service.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_service.stream_recipients(campaign_id, format, read_session_factory(request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="campaign-{campaign_id}-recipients.{extension}"'},
+    )
 
 @router.post("/{campaign_id}/preview")
 async def preview_campaign(
@@ -159,10 +288,13 @@ async def preview_campaign(
             "company": "Acme Corp"
         }
     
+    from app.services import unsubscribe
+    sample_email = str(sample_data.get("email") or current_user.email)
+    context = {"unsubscribe_url": unsubscribe.unsubscribe_url(current_user.id, campaign.id, sample_email), **sample_data}
+    templates = await template_service.get_user_templates(db, current_user.id)
     try:
         # Render both subject and body with sample data
-        rendered_subject = template_service.render_template(campaign.subject, sample_data)
-        rendered_body = template_service.render_template(campaign.body, sample_data)
+        rendered_subject, rendered_body = await templates.render(context, campaign.subject, campaign.body)
         return {
             "subject": rendered_subject,
             "body": rendered_body,
@@ -176,10 +308,11 @@ async def send_test_email(
     campaign_id: int,
     test_email: str = Query(..., description="Email address to send test to"),
     sample_data: Optional[dict] = None,
+    background_tasks: BackgroundTasks = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    """Send a test email to verify campaign before sending"""
+    """Queue a test email to verify campaign before sending"""
     result = await db.execute(select(Campaign).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id))
     campaign = result.scalars().first()
     if not campaign:
@@ -187,12 +320,16 @@ async def send_test_email(
     
     # Get SMTP config
     from app.models.smtp import SMTPConfig
-    result = await db.execute(select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id))
-    smtp_config = result.scalars().first()
-    if not smtp_config:
+    result = await db.execute(
+        select(SMTPConfig.id)
+        .filter(SMTPConfig.user_id == current_user.id, SMTPConfig.is_active.is_(True))
+        .order_by(SMTPConfig.id)
+    )
+    smtp_config_id = result.scalars().first()
+    if not smtp_config_id:
         raise HTTPException(status_code=400, detail="SMTP Configuration not found")
     
-    from app.services import email, template_service
+    from app.services import outbox, template_service
     
     # Use provided sample data or default
     if not sample_data:
@@ -202,17 +339,20 @@ async def send_test_email(
             "company": "Test Company"
         }
     
+    from app.services import unsubscribe
+    context = {"unsubscribe_url": unsubscribe.unsubscribe_url(current_user.id, campaign.id, test_email), **sample_data}
+    templates = await template_service.get_user_templates(db, current_user.id)
     try:
         # Render both subject and body with template variables
-        rendered_subject = template_service.render_template(campaign.subject, sample_data)
-        rendered_body = template_service.render_template(campaign.body, sample_data)
-        await email.send_email(smtp_config, test_email, f"[TEST] {rendered_subject}", rendered_body)
-        return {"message": f"Test email sent to {test_email}"}
+        rendered_subject, rendered_body = await templates.render(context, campaign.subject, campaign.body)
     except Exception as e:
-        import traceback
-        error_detail = f"Failed to send test email: {str(e)}\n{traceback.format_exc()}"
-        print(error_detail)  # Log to console
-        raise HTTPException(status_code=500, detail=f"Failed to send test email: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Template rendering error: {str(e)}")
+
+    # Delivered by the outbox dispatcher (see outbox.kick for serverless)
+    entry = outbox.enqueue(db, "test", test_email, f"[TEST] {rendered_subject}", rendered_body, smtp_config_id)
+    await db.commit()
+    outbox.kick(background_tasks, entry)
+    return {"message": f"Test email queued for {test_email}", "outbox_id": entry.id}
 
 @router.post("/{campaign_id}/attachments")
 async def upload_attachment(
@@ -320,17 +460,35 @@ async def send_campaign(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get SMTP config
+    # Get the user's active SMTP relays; messages are balanced across them
     from app.models.smtp import SMTPConfig
-    result = await db.execute(select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id))
-    smtp_config = result.scalars().first()
-    if not smtp_config:
+    from app.services import relay_pool
+    result = await db.execute(
+        select(SMTPConfig)
+        .filter(SMTPConfig.user_id == current_user.id, SMTPConfig.is_active.is_(True))
+        .order_by(SMTPConfig.id)
+    )
+    smtp_configs = result.scalars().all()
+    if not smtp_configs:
         raise HTTPException(status_code=400, detail="SMTP Configuration not found")
+    relays = relay_pool.RelayPool(smtp_configs)
 
     # Get recipients
     from app.models.recipient import Recipient
-    result = await db.execute(select(Recipient).filter(Recipient.campaign_id == campaign.id, Recipient.status == "pending"))
-    recipients = result.scalars().all()
+    from app.services import recipient_service, template_service
+    # Stored layouts/partials the campaign extends or includes, loaded once for the whole send
+    templates = await template_service.get_user_templates(db, current_user.id)
+    # Extract only the columns the templates reference, in SQL
+    positions = recipient_service.column_positions(
+        campaign.recipient_columns,
+        templates.template_variables(campaign.subject, campaign.body),
+    )
+    result = await db.execute(
+        select(Recipient, *recipient_service.personalisation_select(positions))
+        .options(defer(Recipient.fields))
+        .filter(Recipient.campaign_id == campaign.id, Recipient.status == "pending")
+    )
+    recipients = result.all()
     
     if not recipients:
         raise HTTPException(status_code=400, detail="No pending recipients found")
@@ -348,42 +506,122 @@ async def send_campaign(
         } for a in attachments
     ] if attachments else None
     
-    from app.services import email, template_service
+    from app.services import delivery_events, rollup_service, suppression_service, tracking, unsubscribe
+    
+    # Tracked links are rewritten once in the body source, not per recipient
+    body_source = await tracking.prepare_body(db, campaign) if campaign.track_clicks else campaign.body
+    track = campaign.track_opens or campaign.track_clicks
+    
+    def render_context(row):
+        context = recipient_service.context_from_row(positions, row)
+        context["unsubscribe_url"] = unsubscribe.unsubscribe_url(current_user.id, campaign.id, row.Recipient.email)
+        if track:
+            context[tracking.TOKEN_VARIABLE] = tracking.token(campaign.id, row.Recipient.id)
+        return context
+    
+    # Addresses suppressed after the list was uploaded are skipped at send time too
+    suppressed = await suppression_service.suppressed_emails(
+        db, current_user.id, (row.Recipient.email for row in recipients)
+    )
     
     campaign.status = "sending"
     await db.commit()
     
     sent_count = 0
     failed_count = 0
-    
-    for recipient in recipients:
+    suppressed_count = 0
+    rollups = rollup_service.RollupBuffer(current_user.id)
+    rendered = {}
+    
+    def is_suppressed(recipient):
+        return bool(suppressed) and suppression_service.normalize(recipient.email) in suppressed
+    
+    for i, row in enumerate(recipients, 1):
+        recipient = row.Recipient
+        if is_suppressed(recipient):
+            recipient.status = "suppressed"
+            rollups.record(campaign.id, "suppressed")
+            await delivery_events.record("suppressed", campaign_id=campaign.id, recipient_id=recipient.id, attempt=0)
+            suppressed_count += 1
+            continue
+        if recipient.id not in rendered:
+            # Render the next batch ahead of sending, in parallel across the render processes
+            batch = [
+                r for r in recipients[i - 1:i - 1 + settings.TEMPLATE_RENDER_BATCH_SIZE]
+                if not is_suppressed(r.Recipient)
+            ]
+            results = await templates.render_batch(
+                (campaign.subject, body_source),
+                [render_context(r) for r in batch],
+            )
+            rendered = {r.Recipient.id: result for r, result in zip(batch, results)}
         try:
-            # Render both subject and body with recipient data
-            subject = template_service.render_template(campaign.subject, recipient.data or {})
-            body = template_service.render_template(campaign.body, recipient.data or {})
+            # Subject and body rendered with recipient data
+            result = rendered.pop(recipient.id)
+            if isinstance(result, template_service.RenderError):
+                await delivery_events.record(
+                    "failed",
+                    campaign_id=campaign.id,
+                    recipient_id=recipient.id,
+                    attempt=0,
+                    smtp_response=f"Template rendering error: {result}",
+                )
+                raise result
+            subject, body = result
+            if campaign.track_opens:
+                body = tracking.add_open_pixel(body, tracking.token(campaign.id, recipient.id))
             
-            # Send email with attachments
-            await email.send_email(
-                smtp_config, 
+            # Send email with attachments (each relay attempt is logged as a delivery event)
+            await relays.send(
                 recipient.email, 
                 subject, 
                 body,
-                attachments=attachment_data
+                attachments=attachment_data,
+                campaign_id=campaign.id,
+                recipient_id=recipient.id,
+                unsubscribe_url=unsubscribe.unsubscribe_url(current_user.id, campaign.id, recipient.email),
             )
             recipient.status = "sent"
+            recipient.sent_at = rollup_service.utcnow()
+            rollups.record(campaign.id, "sent", recipient.sent_at)
             sent_count += 1
+        except relay_pool.NoRelayAvailable:
+            # Every relay is ejected; the rest stay pending for a later send
+            logger.error("Campaign send stopped: no healthy SMTP relay", extra={"campaign_id": campaign.id})
+            campaign.status = "failed"
+            break
         except Exception as e:
-            print(f"Failed to send to {recipient.email}: {e}")
+            logger.warning(
+                "Failed to send campaign email: %s",
+                e,
+                extra={"campaign_id": campaign.id, "recipient_id": recipient.id},
+            )
             recipient.status = "failed"
+            recipient.failed_at = rollup_service.utcnow()
+            rollups.record(campaign.id, "failed", recipient.failed_at)
             failed_count += 1
+        if i % settings.SEND_COMMIT_EVERY == 0:
+            # Persist progress and keep dashboard rollups current during long sends;
+            # the version bump makes ETags of clients polling progress change too
+            await rollups.flush(db)
+            campaign.bump_version()
+            await db.commit()
             
-    campaign.status = "completed"
+    if campaign.status == "sending":
+        campaign.status = "completed"
+    await rollups.flush(db)
     await db.commit()
+
+    metrics.EMAILS_TOTAL.labels("sent").inc(sent_count)
+    metrics.EMAILS_TOTAL.labels("failed").inc(failed_count)
+    metrics.EMAILS_TOTAL.labels("suppressed").inc(suppressed_count)
+    metrics.CAMPAIGNS_TOTAL.labels(campaign.status).inc()
     
     return {
-        "message": f"Campaign completed",
+        "message": f"Campaign {campaign.status}",
         "sent": sent_count,
         "failed": failed_count,
+        "suppressed": suppressed_count,
         "total": sent_count + failed_count,
         "attachments": len(attachments) if attachments else 0
     }
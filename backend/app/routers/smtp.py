@@ -1,12 +1,14 @@
-from typing import Union
+from typing import List, Union
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import case, select, update
 from app import deps
 from app.core.database import get_db
+from app.models.outbox import OutboxEmail
 from app.models.smtp import SMTPConfig
 from app.models.user import User
-from app.schemas.smtp import SMTPConfigCreate, SMTPConfigUpdate, SMTPConfig as SMTPConfigSchema
+from app.schemas.smtp import SMTPConfigCreate, SMTPConfigUpdate, SMTPRelayUpdate, SMTPConfig as SMTPConfigSchema
+from app.services import relay_pool
 
 router = APIRouter()
 
@@ -16,7 +18,10 @@ async def create_or_update_smtp(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    result = await db.execute(select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id))
+    # The single-config API edits the user's first relay
+    result = await db.execute(
+        select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id).order_by(SMTPConfig.id)
+    )
     smtp_config = result.scalars().first()
     
     if smtp_config:
@@ -36,6 +41,7 @@ async def create_or_update_smtp(
     
     await db.commit()
     await db.refresh(smtp_config)
+    relay_pool.reset_relay(smtp_config.id)
     return smtp_config
 
 @router.get("/", response_model=SMTPConfigSchema)
@@ -43,8 +49,80 @@ async def read_smtp(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    result = await db.execute(select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id))
+    result = await db.execute(
+        select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id).order_by(SMTPConfig.id)
+    )
     smtp_config = result.scalars().first()
     if smtp_config is None:
         raise HTTPException(status_code=404, detail="SMTP Config not found")
     return smtp_config
+
+@router.get("/relays", response_model=List[SMTPConfigSchema])
+async def read_relays(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    result = await db.execute(
+        select(SMTPConfig).filter(SMTPConfig.user_id == current_user.id).order_by(SMTPConfig.id)
+    )
+    return result.scalars().all()
+
+@router.post("/relays", response_model=SMTPConfigSchema)
+async def create_relay(
+    relay: SMTPConfigCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    smtp_config = SMTPConfig(**relay.model_dump(), user_id=current_user.id)
+    db.add(smtp_config)
+    await db.commit()
+    await db.refresh(smtp_config)
+    return smtp_config
+
+async def _get_relay(db: AsyncSession, relay_id: int, user_id: int) -> SMTPConfig:
+    result = await db.execute(select(SMTPConfig).filter(SMTPConfig.id == relay_id, SMTPConfig.user_id == user_id))
+    smtp_config = result.scalars().first()
+    if smtp_config is None:
+        raise HTTPException(status_code=404, detail="SMTP relay not found")
+    return smtp_config
+
+@router.put("/relays/{relay_id}", response_model=SMTPConfigSchema)
+async def update_relay(
+    relay_id: int,
+    relay: SMTPRelayUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    smtp_config = await _get_relay(db, relay_id, current_user.id)
+    for key, value in relay.model_dump(exclude_unset=True).items():
+        if key == 'password' and not value:
+            # Skip password update if empty
+            continue
+        setattr(smtp_config, key, value)
+    await db.commit()
+    await db.refresh(smtp_config)
+    # New settings get a fresh circuit breaker and rate budget
+    relay_pool.reset_relay(relay_id)
+    return smtp_config
+
+@router.delete("/relays/{relay_id}")
+async def delete_relay(
+    relay_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    smtp_config = await _get_relay(db, relay_id, current_user.id)
+    # Queued test emails can't go out through another account's sender address
+    await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.smtp_config_id == relay_id)
+        .values(
+            smtp_config_id=None,
+            status=case((OutboxEmail.status == "pending", "failed"), else_=OutboxEmail.status),
+            last_error=case((OutboxEmail.status == "pending", "SMTP relay deleted"), else_=OutboxEmail.last_error),
+        )
+    )
+    await db.delete(smtp_config)
+    await db.commit()
+    relay_pool.reset_relay(relay_id)
+    return {"message": "SMTP relay deleted"}
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case
 from app import deps
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.campaign import Campaign
 from app.models.recipient import Recipient
 from app.models.user import User
+from app.services import rollup_service
 
 router = APIRouter()
 
+# Upper bound on points per time series response
+MAX_TIMESERIES_POINTS = 10000
+
 @router.get("/dashboard")
 async def get_dashboard_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     """Get dashboard statistics"""
@@ -82,3 +88,37 @@ async def get_dashboard_stats(
             } for c in recent_campaigns
         ]
     }
+
+@router.get("/timeseries")
+async def get_timeseries(
+    interval: Literal["hour", "day"] = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    campaign_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Sent/failed/suppressed counts per hour or day (UTC), read from rollups only"""
+    end = end or rollup_service.utcnow()
+    start = start or end - (timedelta(days=7) if interval == "hour" else timedelta(days=90))
+    # Stored buckets are naive UTC
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / rollup_service.INTERVALS[interval] > MAX_TIMESERIES_POINTS:
+        raise HTTPException(status_code=400, detail="Time range too large for this interval")
+
+    if campaign_id is not None:
+        result = await db.execute(
+            select(Campaign.id).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id)
+        )
+        if result.scalar() is None:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+
+    points = await rollup_service.timeseries(
+        db, current_user.id, start, end, interval, campaign_id=campaign_id or 0
+    )
+    return {"interval": interval, "start": start, "end": end, "campaign_id": campaign_id, "points": points}
@@ -0,0 +1,95 @@
+import csv
+import io
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app import deps
+from app.core.database import get_db, get_read_db
+from app.core.responses import ORJSONResponse
+from app.models.suppression import Suppression
+from app.models.user import User
+from app.schemas.suppression import (
+    SuppressionBulkCreate,
+    SuppressionCreate,
+    SuppressionReason,
+    Suppression as SuppressionSchema,
+)
+from app.services import suppression_service
+
+router = APIRouter()
+
+@router.get("/", response_model=List[SuppressionSchema])
+async def read_suppressions(
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    result = await db.execute(
+        select(Suppression.id, Suppression.email, Suppression.reason, Suppression.created_at)
+        .filter(Suppression.user_id == current_user.id)
+        .order_by(Suppression.id).offset(skip).limit(limit)
+    )
+    return ORJSONResponse([dict(row._mapping) for row in result])
+
+@router.post("/", response_model=SuppressionSchema)
+async def create_suppression(
+    suppression: SuppressionCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    email = suppression_service.normalize(suppression.email)
+    if not email:
+        raise HTTPException(status_code=400, detail="Email is required")
+    await suppression_service.add_suppressions(db, current_user.id, [email], suppression.reason)
+    await db.commit()
+    result = await db.execute(
+        select(Suppression).filter(Suppression.user_id == current_user.id, Suppression.email == email)
+    )
+    return result.scalars().first()
+
+@router.post("/bulk")
+async def bulk_create_suppressions(
+    payload: SuppressionBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    added = await suppression_service.add_suppressions(db, current_user.id, payload.emails, payload.reason)
+    await db.commit()
+    return {"added": added, "received": len(payload.emails)}
+
+@router.post("/import")
+async def import_suppressions(
+    file: UploadFile = File(...),
+    reason: SuppressionReason = "manual",
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Import a CSV with an 'email' column (or a plain one-address-per-line list)"""
+    content = (await file.read()).decode("utf-8-sig", errors="replace")
+    rows = list(csv.reader(io.StringIO(content)))
+    if not rows:
+        return {"added": 0, "received": 0}
+
+    header = [h.strip().lower() for h in rows[0]]
+    if "email" in header:
+        column, rows = header.index("email"), rows[1:]
+    else:
+        column = 0
+    emails = [row[column] for row in rows if len(row) > column and "@" in row[column]]
+
+    added = await suppression_service.add_suppressions(db, current_user.id, emails, reason)
+    await db.commit()
+    return {"added": added, "received": len(emails)}
+
+@router.delete("/{email}")
+async def delete_suppression(
+    email: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    if not await suppression_service.remove_suppression(db, current_user.id, email):
+        raise HTTPException(status_code=404, detail="Suppression not found")
+    await db.commit()
+    return {"message": "Suppression removed"}
@@ -1,12 +1,14 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from app import deps
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.etag import check_not_modified, etag_headers, make_etag
+from app.core.responses import ORJSONResponse
 from app.models.template import Template
 from app.models.user import User
-from app.schemas.template import TemplateCreate, Template as TemplateSchema
+from app.schemas.template import TemplateCreate, TemplateUpdate, Template as TemplateSchema
 
 router = APIRouter()
 
@@ -24,10 +26,91 @@ async def create_template(
 
 @router.get("/", response_model=List[TemplateSchema])
 async def read_templates(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    # Any insert or update changes count, max id or the version sum
+    marker = await db.execute(
+        select(func.count(Template.id), func.max(Template.id), func.sum(Template.version))
+        .filter(Template.user_id == current_user.id)
+    )
+    etag = make_etag("templates", current_user.id, skip, limit, *marker.one())
+    not_modified = check_not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    # Plain rows straight to orjson; response_model is kept for the schema only
+    result = await db.execute(
+        select(Template.id, Template.name, Template.content, Template.user_id)
+        .filter(Template.user_id == current_user.id).offset(skip).limit(limit)
+    )
+    return ORJSONResponse([dict(row._mapping) for row in result], headers=etag_headers(etag))
+
+@router.get("/{template_id}", response_model=TemplateSchema)
+async def read_template(
+    template_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    # Verify ownership and answer revalidations from the version alone
+    result = await db.execute(
+        select(Template.version).filter(Template.id == template_id, Template.user_id == current_user.id)
+    )
+    version = result.scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    etag = make_etag("template", template_id, version)
+    not_modified = check_not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    result = await db.execute(
+        select(Template.id, Template.name, Template.content, Template.user_id, Template.version)
+        .filter(Template.id == template_id, Template.user_id == current_user.id)
+    )
+    template = result.first()
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    # Tag what is actually returned, in case the template changed in between
+    body = dict(template._mapping)
+    etag = make_etag("template", template_id, body.pop("version"))
+    return ORJSONResponse(body, headers=etag_headers(etag))
+
+@router.put("/{template_id}", response_model=TemplateSchema)
+async def update_template(
+    template_id: int,
+    template_in: TemplateUpdate,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    result = await db.execute(select(Template).filter(Template.user_id == current_user.id).offset(skip).limit(limit))
-    return result.scalars().all()
+    """Edit a template; campaigns extending or including it pick up the change on their next render"""
+    result = await db.execute(
+        select(Template).filter(Template.id == template_id, Template.user_id == current_user.id)
+    )
+    template = result.scalars().first()
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    template.name = template_in.name
+    template.content = template_in.content
+    await db.commit()
+    return template
+
+@router.delete("/{template_id}")
+async def delete_template(
+    template_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    result = await db.execute(
+        select(Template).filter(Template.id == template_id, Template.user_id == current_user.id)
+    )
+    template = result.scalars().first()
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    await db.delete(template)
+    await db.commit()
+    return {"message": "Template deleted"}
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import RedirectResponse
+from app.core import metrics
+from app.services import tracking
+
+router = APIRouter()
+
+# Public, unauthenticated endpoints hit from recipients' mail clients
+
+@router.get("/o/{token}.gif", include_in_schema=False)
+async def track_open(token: str):
+    ids = tracking.parse_token(token)
+    if ids is not None:
+        await tracking.record("open", *ids)
+    else:
+        metrics.TRACKING_EVENTS.labels("open", "invalid").inc()
+    # Always answer with the pixel so clients never show a broken image
+    return Response(tracking.PIXEL_GIF, media_type="image/gif", headers={"Cache-Control": "no-store, max-age=0"})
+
+@router.get("/c/{token}/{position}", include_in_schema=False)
+async def track_click(token: str, position: int):
+    ids = tracking.parse_token(token)
+    url = await tracking.link_url(ids[0], position) if ids is not None else None
+    if url is None:
+        metrics.TRACKING_EVENTS.labels("click", "invalid").inc()
+        raise HTTPException(status_code=404, detail="Link not found")
+    await tracking.record("click", *ids, link_position=position)
+    return RedirectResponse(url, status_code=302)
@@ -0,0 +1,33 @@
+from html import escape
+from fastapi import APIRouter
+from fastapi.responses import HTMLResponse
+from app.services import unsubscribe
+
+router = APIRouter()
+
+# Public endpoints behind the List-Unsubscribe header and the unsubscribe_url template variable
+
+_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Unsubscribe</title></head>
+<body style="font-family:sans-serif;max-width:32em;margin:4em auto">{content}</body></html>"""
+
+@router.get("/{token}", response_class=HTMLResponse, include_in_schema=False)
+async def confirm_unsubscribe(token: str):
+    """Confirmation page; link scanners prefetching the URL must not unsubscribe anyone"""
+    parsed = unsubscribe.parse_token(token)
+    if parsed is None:
+        return HTMLResponse(_PAGE.format(content="<p>This unsubscribe link is not valid.</p>"), status_code=404)
+    content = (
+        f"<p>Stop sending emails to <strong>{escape(parsed[2])}</strong>?</p>"
+        f'<form method="post"><button type="submit">Unsubscribe</button></form>'
+    )
+    return HTMLResponse(_PAGE.format(content=content))
+
+@router.post("/{token}", response_class=HTMLResponse, include_in_schema=False)
+async def one_click_unsubscribe(token: str):
+    """RFC 8058 one-click unsubscribe, also used by the confirmation form"""
+    parsed = unsubscribe.parse_token(token)
+    if parsed is None:
+        return HTMLResponse(_PAGE.format(content="<p>This unsubscribe link is not valid.</p>"), status_code=404)
+    await unsubscribe.unsubscribe(*parsed)
+    return HTMLResponse(_PAGE.format(content=f"<p><strong>{escape(parsed[2])}</strong> has been unsubscribed.</p>"))
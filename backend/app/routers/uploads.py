@@ -1,6 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from app import deps
+from app.core.database import get_db
+from app.models.campaign import Campaign
+from app.models.upload import CsvUpload
 from app.models.user import User
+from app.schemas.upload import UploadCreate, UploadStatus
 from app.services import csv_service
 
 router = APIRouter()
@@ -8,7 +14,96 @@ router = APIRouter()
 @router.post("/csv/preview")
 async def preview_csv(
     file: UploadFile = File(...),
+    rows: int = Query(5, ge=1, le=100),
+    estimate: bool = Query(False, description="Estimate the count from the first block instead of scanning the file"),
     current_user: User = Depends(deps.get_current_user),
 ):
-    data = await csv_service.parse_csv(file)
-    return {"count": len(data), "preview": data[:5], "columns": list(data[0].keys()) if data else []}
+    return await csv_service.preview_csv(file, rows, estimate)
+
+async def _get_upload(db: AsyncSession, upload_id: str, user: User) -> CsvUpload:
+    result = await db.execute(select(CsvUpload).filter(CsvUpload.id == upload_id, CsvUpload.user_id == user.id))
+    upload = result.scalars().first()
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+@router.post("/csv/resumable", response_model=UploadStatus)
+async def initiate_upload(
+    upload_in: UploadCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Start a resumable recipient CSV upload; send chunks with PUT, then complete it"""
+    from app.services import upload_service
+
+    result = await db.execute(
+        select(Campaign.id).filter(Campaign.id == upload_in.campaign_id, Campaign.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    try:
+        return await upload_service.initiate(
+            db, current_user.id, upload_in.campaign_id, upload_in.filename, upload_in.size, upload_in.mode
+        )
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@router.get("/csv/resumable/{upload_id}", response_model=UploadStatus)
+async def get_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Upload progress; `received` is the offset to resume from"""
+    return await _get_upload(db, upload_id, current_user)
+
+@router.put("/csv/resumable/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Append raw CSV bytes at `offset`, which must equal the bytes received so far"""
+    from app.services import upload_service
+
+    upload = await _get_upload(db, upload_id, current_user)
+    try:
+        received = await upload_service.write_chunk(db, upload, offset, request.stream())
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"received": received, "size": upload.size, "columns": upload.columns}
+
+@router.post("/csv/resumable/{upload_id}/complete", response_model=UploadStatus, status_code=202)
+async def complete_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Finish the upload and import its recipients in the background; poll GET for progress"""
+    from app.services import upload_service
+
+    upload = await _get_upload(db, upload_id, current_user)
+    try:
+        await upload_service.complete(db, upload)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    background_tasks.add_task(upload_service.ingest, upload.id)
+    return upload
+
+@router.delete("/csv/resumable/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    from app.services import upload_service
+
+    upload = await _get_upload(db, upload_id, current_user)
+    try:
+        await upload_service.abort(db, upload)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"message": "Upload deleted"}
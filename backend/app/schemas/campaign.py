@@ -6,6 +6,8 @@ class CampaignBase(BaseModel):
     name: str
     subject: str
     body: str
+    track_opens: bool = False
+    track_clicks: bool = False
 
 class CampaignCreate(CampaignBase):
     pass
@@ -30,7 +32,22 @@ class CampaignStats(BaseModel):
     sent: int
     pending: int
     failed: int
+    suppressed: int = 0
     
+class LinkClicks(BaseModel):
+    position: int
+    url: str
+    clicks: int
+    unique_clicks: int
+
+class CampaignEngagement(BaseModel):
+    sent: int
+    opens: int
+    unique_opens: int
+    clicks: int
+    unique_clicks: int
+    links: List[LinkClicks] = []
+
 class CampaignDetail(CampaignInDBBase):
     stats: CampaignStats
     recipients: List[Dict[str, Any]] = []
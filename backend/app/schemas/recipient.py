@@ -1,6 +1,9 @@
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Literal
 from pydantic import BaseModel
 
+RecipientStatus = Literal["pending", "sent", "failed", "suppressed"]
+
 class RecipientBase(BaseModel):
     email: str
     data: Optional[Dict[str, Any]] = None
@@ -18,3 +21,16 @@ class RecipientInDBBase(RecipientBase):
 
 class Recipient(RecipientInDBBase):
     pass
+
+class RecipientListItem(BaseModel):
+    id: int
+    email: str
+    status: str
+    sent_at: Optional[datetime] = None
+    failed_at: Optional[datetime] = None
+    data: Dict[str, Any] = {}
+
+class RecipientPage(BaseModel):
+    recipients: List[RecipientListItem]
+    # Pass as `after` to fetch the next page; None on the last page
+    next_cursor: Optional[int] = None
@@ -1,11 +1,15 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 class SMTPConfigBase(BaseModel):
     host: str
     port: int
     username: str
     from_email: str
+    name: Optional[str] = None
+    weight: int = Field(1, ge=1, le=1000)
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    is_active: bool = True
 
 class SMTPConfigCreate(SMTPConfigBase):
     password: str
@@ -13,6 +17,25 @@ class SMTPConfigCreate(SMTPConfigBase):
 class SMTPConfigUpdate(SMTPConfigBase):
     password: Optional[str] = None
 
+class SMTPRelayUpdate(BaseModel):
+    host: Optional[str] = None
+    port: Optional[int] = None
+    username: Optional[str] = None
+    password: Optional[str] = None
+    from_email: Optional[str] = None
+    name: Optional[str] = None
+    weight: Optional[int] = Field(None, ge=1, le=1000)
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    is_active: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def reject_null_required(self):
+        # Omitted fields are left unchanged, but these columns can't be cleared
+        for name in ("host", "port", "username", "from_email", "weight", "is_active"):
+            if name in self.model_fields_set and getattr(self, name) is None:
+                raise ValueError(f"{name} may not be null")
+        return self
+
 class SMTPConfigInDBBase(SMTPConfigBase):
     id: int
     user_id: int
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import List, Literal
+from pydantic import BaseModel
+
+SuppressionReason = Literal["manual", "bounce", "unsubscribe", "complaint"]
+
+class SuppressionCreate(BaseModel):
+    email: str
+    reason: SuppressionReason = "manual"
+
+class SuppressionBulkCreate(BaseModel):
+    emails: List[str]
+    reason: SuppressionReason = "manual"
+
+class Suppression(BaseModel):
+    id: int
+    email: str
+    reason: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
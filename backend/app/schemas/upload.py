@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+class UploadCreate(BaseModel):
+    campaign_id: int
+    filename: str
+    size: int = Field(..., gt=0)
+    mode: Literal["append", "merge"] = "append"
+
+class UploadStatus(BaseModel):
+    id: str
+    campaign_id: int
+    filename: str
+    size: int
+    received: int
+    mode: str
+    status: str
+    columns: Optional[List[str]] = None
+    rows_processed: int
+    added: int
+    updated: int
+    suppressed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,32 +1,27 @@
-import pandas as pd
 from fastapi import UploadFile, HTTPException
+from typing import Iterable, Iterator, List, Optional
 import io
 import math
+import re
 
-async def parse_csv(file: UploadFile):
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
-    
-    content = await file.read()
-    try:
-        df = pd.read_csv(io.BytesIO(content))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
-    
-    # Check for required columns (e.g., email)
+# Preview reads the upload in blocks of this size
+PREVIEW_BLOCK_BYTES = 1024 * 1024
+# Never buffer more than this while looking for the sample rows
+PREVIEW_MAX_HEAD_BYTES = 16 * 1024 * 1024
+
+def find_email_column(columns: Iterable[str]) -> Optional[str]:
     # We can be flexible and just look for 'email' case-insensitive
-    email_col = None
-    for col in df.columns:
-        if col.lower() == 'email':
-            email_col = col
-            break
-    
-    if not email_col:
-        raise HTTPException(status_code=400, detail="CSV must contain an 'email' column.")
-    
-    # Convert to list of dicts and replace NaN with empty string
+    for col in columns:
+        if str(col).lower() == 'email':
+            return col
+    return None
+
+def clean_records(df) -> List[dict]:
+    """Convert a DataFrame to a list of dicts, replacing NaN with empty string"""
+    import pandas as pd
+
     records = df.to_dict(orient='records')
-    
+
     # Clean NaN values - PostgreSQL JSON doesn't accept NaN
     cleaned_records = []
     for record in records:
@@ -37,5 +32,148 @@ async def parse_csv(file: UploadFile):
             else:
                 cleaned[key] = value
         cleaned_records.append(cleaned)
-    
+
     return cleaned_records
+
+async def parse_csv(file: UploadFile):
+    # pandas costs ~300ms to import; only load it when a CSV is actually parsed
+    import pandas as pd
+
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
+
+    content = await file.read()
+    try:
+        df = pd.read_csv(io.BytesIO(content))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
+
+    # Check for required columns (e.g., email)
+    if not find_email_column(df.columns):
+        raise HTTPException(status_code=400, detail="CSV must contain an 'email' column.")
+
+    return clean_records(df)
+
+# Matches once per blank line after the first newline (blank lines are rare, so this is cheap)
+_BLANK_LINE = re.compile(rb"\n[ \t\r]*(?=\n)")
+_BLANK = b" \t\r"
+
+class _RecordCounter:
+    """Counts records in streamed CSV bytes, like pandas: quoted newlines and blank lines don't end one"""
+
+    def __init__(self):
+        self.records = 0
+        self.in_quotes = False
+        # The current (unterminated) line has content; carried across blocks
+        self.pending = False
+
+    def feed(self, block: bytes) -> None:
+        if not block:
+            return
+        if not self.in_quotes and b'"' not in block:
+            self._scan(block)
+            return
+        # Segments between quote characters alternate outside/inside a quoted field
+        for i, segment in enumerate(block.split(b'"')):
+            if i:
+                self.in_quotes = not self.in_quotes
+                # A quote is part of the current record, even around an empty field
+                self.pending = True
+            if not self.in_quotes:
+                self._scan(segment)
+
+    def _scan(self, data: bytes) -> None:
+        """Count the records ended by unquoted `data`"""
+        first = data.find(b"\n")
+        if first == -1:
+            self.pending = self.pending or bool(data.strip(_BLANK))
+            return
+        if self.pending or data[:first].strip(_BLANK):
+            self.records += 1
+        self.records += data.count(b"\n", first + 1) - len(_BLANK_LINE.findall(data, first))
+        self.pending = bool(data[data.rfind(b"\n") + 1:].strip(_BLANK))
+
+    @property
+    def lines(self) -> int:
+        """Records so far, including an unterminated last one"""
+        return self.records + self.pending
+
+async def preview_csv(file: UploadFile, rows: int = 5, estimate: bool = False) -> dict:
+    """Columns, the first `rows` records and the record count, parsing only the head.
+
+    The count comes from a quote-aware scan of the remaining bytes for
+    non-blank lines,
+    or with `estimate` from the average record size of the first block.
+    """
+    import pandas as pd
+
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
+
+    counter = _RecordCounter()
+    head = bytearray()
+    eof = False
+    # Header plus `rows` complete records
+    while counter.records <= rows and len(head) < PREVIEW_MAX_HEAD_BYTES:
+        block = await file.read(PREVIEW_BLOCK_BYTES)
+        if not block:
+            eof = True
+            break
+        counter.feed(block)
+        head += block
+
+    end = head.rfind(b"\n")
+    sample = head if eof or end == -1 else head[:end + 1]
+    try:
+        df = pd.read_csv(io.BytesIO(bytes(sample)), nrows=rows)
+    except pd.errors.EmptyDataError:
+        raise HTTPException(status_code=400, detail="CSV file is empty.")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
+    if not find_email_column(df.columns):
+        raise HTTPException(status_code=400, detail="CSV must contain an 'email' column.")
+
+    estimated = False
+    if not eof and estimate:
+        size = file.size
+        if size is None:
+            size = file.file.seek(0, io.SEEK_END)
+        count = round(size * counter.records / len(head)) - 1
+        estimated = True
+    else:
+        while not eof:
+            block = await file.read(PREVIEW_BLOCK_BYTES)
+            if not block:
+                break
+            counter.feed(block)
+        count = max(counter.lines - 1, 0)
+
+    return {
+        "count": count,
+        "preview": clean_records(df),
+        "columns": [str(col) for col in df.columns],
+        "estimated": estimated,
+    }
+
+def iter_csv_file(path: str, chunk_rows: int, skip_records: int = 0) -> Iterator[List[dict]]:
+    """Parse a CSV file on disk `chunk_rows` records at a time, with bounded memory.
+
+    The first `skip_records` records are parsed but not returned (resuming an ingest).
+    Raises ValueError for unparseable files or a missing email column.
+    """
+    import pandas as pd
+
+    try:
+        reader = pd.read_csv(path, chunksize=chunk_rows)
+        for df in reader:
+            if not find_email_column(df.columns):
+                raise ValueError("CSV must contain an 'email' column.")
+            if skip_records:
+                skipped = min(skip_records, len(df))
+                skip_records -= skipped
+                df = df.iloc[skipped:]
+                if df.empty:
+                    continue
+            yield clean_records(df)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ValueError(f"Error parsing CSV: {e}") from e
@@ -0,0 +1,71 @@
+"""
+Buffered writer for the append-only delivery event log.
+
+Senders `await record(...)`, which only puts the event on the writer's
+bounded queue; a background BatchWriter inserts events as one multi-row
+INSERT per batch, flushing when DELIVERY_EVENTS_BATCH_SIZE events are
+waiting or DELIVERY_EVENTS_FLUSH_SECONDS have passed since the first one.
+When the database falls behind the queue fills up and `record` waits,
+slowing senders instead of growing memory. Pending events are flushed when
+the writer is stopped at shutdown.
+
+Without a running writer (serverless entry point, no lifespan) each event is
+inserted directly.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import insert
+from app.core import metrics
+from app.core.batch_writer import BatchWriter
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.delivery_event import DeliveryEvent
+
+logger = logging.getLogger(__name__)
+
+
+async def record(
+    event: str,
+    campaign_id: Optional[int] = None,
+    recipient_id: Optional[int] = None,
+    smtp_config_id: Optional[int] = None,
+    attempt: int = 1,
+    smtp_response: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+) -> None:
+    """Queue one delivery event; waits only when the writer is far behind"""
+    row = {
+        "event": event,
+        "campaign_id": campaign_id,
+        "recipient_id": recipient_id,
+        "smtp_config_id": smtp_config_id,
+        "attempt": attempt,
+        "smtp_response": smtp_response,
+        "duration_ms": duration_ms,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    await _writer.put(row)
+
+
+async def _write(rows: List[dict]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(DeliveryEvent).values(rows))
+            await db.commit()
+    except Exception:
+        # The log is diagnostic; never fail a send because of it
+        logger.exception("Failed to write %d delivery events", len(rows))
+        return
+    metrics.DELIVERY_EVENTS_WRITTEN.inc(len(rows))
+    metrics.DELIVERY_EVENTS_FLUSH_SIZE.observe(len(rows))
+
+
+_writer = BatchWriter(
+    _write,
+    settings.DELIVERY_EVENTS_BATCH_SIZE,
+    settings.DELIVERY_EVENTS_FLUSH_SECONDS,
+    settings.DELIVERY_EVENTS_QUEUE_SIZE,
+)
+# Long-running loop batching queued events into multi-row inserts
+run_writer = _writer.run
@@ -1,95 +1,170 @@
-import aiosmtplib
 import ssl
-from email.message import EmailMessage
+import time
+from email.message import EmailMessage, Message
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 from typing import List, Optional, Dict
+from app.core import metrics
+from app.core.config import settings
 from app.models.smtp import SMTPConfig
 
-async def send_email(
-    smtp_config: SMTPConfig, 
-    to_email: str, 
-    subject: str, 
+def build_message(
+    from_email: str,
+    to_email: str,
+    subject: str,
     body: str,
-    attachments: Optional[List[Dict]] = None
-):
-    """
-    Send email via SMTP with optional attachments
-    
-    Args:
-        smtp_config: SMTP configuration
-        to_email: Recipient email
-        subject: Email subject
-        body: HTML email body
-        attachments: List of dicts with keys: filename, content_type, data (bytes)
+    attachments: Optional[List[Dict]] = None,
+    unsubscribe_url: Optional[str] = None,
+) -> Message:
+    """Build an HTML message, multipart when there are attachments.
+
+    With `unsubscribe_url`, adds RFC 8058 one-click List-Unsubscribe headers.
     """
+    if attachments:
+        # Use MIME multipart for attachments
+        message = MIMEMultipart()
+        message["From"] = from_email
+        message["To"] = to_email
+        message["Subject"] = subject
+
+        # Add HTML body
+        html_part = MIMEText(body, "html")
+        message.attach(html_part)
+
+        # Add attachments
+        for attachment in attachments:
+            part = MIMEBase("application", "octet-stream")
+            part.set_payload(attachment["data"])
+            encoders.encode_base64(part)
+            part.add_header(
+                "Content-Disposition",
+                f"attachment; filename= {attachment['filename']}"
+            )
+            if "content_type" in attachment:
+                part.replace_header("Content-Type", attachment["content_type"])
+            message.attach(part)
+    else:
+        # Simple email without attachments
+        message = EmailMessage()
+        message["From"] = from_email
+        message["To"] = to_email
+        message["Subject"] = subject
+        message.set_content(body, subtype="html")
+    if unsubscribe_url:
+        message["List-Unsubscribe"] = f"<{unsubscribe_url}>"
+        message["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"
+    return message
+
+async def connect(smtp_config: SMTPConfig):
+    """Open an authenticated SMTP connection (TLS and login included)"""
+    # Imported lazily so endpoints that never send mail don't pay for it
+    import aiosmtplib
+
+    # Remove spaces from password (Gmail app passwords have spaces but SMTP doesn't need them)
+    password = smtp_config.password.replace(" ", "")
+
+    # Create SSL context that doesn't verify certificates (for development)
+    tls_context = ssl.create_default_context()
+    tls_context.check_hostname = False
+    tls_context.verify_mode = ssl.CERT_NONE
+
+    # Use SSL for port 465, STARTTLS for port 587
+    use_tls = smtp_config.port == 465
+    start_tls = smtp_config.port == 587
+
+    client = aiosmtplib.SMTP(
+        hostname=smtp_config.host,
+        port=smtp_config.port,
+        username=smtp_config.username,
+        password=password,
+        use_tls=use_tls,
+        start_tls=start_tls,
+        tls_context=tls_context,
+        timeout=30,
+    )
+    start = time.perf_counter()
+    await client.connect()
+    metrics.SMTP_CONNECT_LATENCY.observe(time.perf_counter() - start)
+    return client
+
+async def submit(client, message: Message) -> str:
+    """Send a message on an open connection and return the server's reply"""
+    start = time.perf_counter()
+    _, response = await client.send_message(message)
+    metrics.SMTP_SEND_LATENCY.observe(time.perf_counter() - start)
+    return response
+
+async def disconnect(client) -> None:
+    import aiosmtplib
+
     try:
-        # Create message
-        if attachments:
-            # Use MIME multipart for attachments
-            message = MIMEMultipart()
-            message["From"] = smtp_config.from_email
-            message["To"] = to_email
-            message["Subject"] = subject
-            
-            # Add HTML body
-            html_part = MIMEText(body, "html")
-            message.attach(html_part)
-            
-            # Add attachments
-            for attachment in attachments:
-                part = MIMEBase("application", "octet-stream")
-                part.set_payload(attachment["data"])
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition",
-                    f"attachment; filename= {attachment['filename']}"
-                )
-                if "content_type" in attachment:
-                    part.replace_header("Content-Type", attachment["content_type"])
-                message.attach(part)
-                
-            print(f"   📎 {len(attachments)} attachment(s) added")
-        else:
-            # Simple email without attachments
-            message = EmailMessage()
-            message["From"] = smtp_config.from_email
-            message["To"] = to_email
-            message["Subject"] = subject
-            message.set_content(body, subtype="html")
-
-        # Remove spaces from password (Gmail app passwords have spaces but SMTP doesn't need them)
-        password = smtp_config.password.replace(" ", "")
-
-        print(f"📧 Attempting to send email to {to_email}")
-        print(f"   Host: {smtp_config.host}:{smtp_config.port}")
-        print(f"   Username: {smtp_config.username}")
-
-        # Create SSL context that doesn't verify certificates (for development)
-        tls_context = ssl.create_default_context()
-        tls_context.check_hostname = False
-        tls_context.verify_mode = ssl.CERT_NONE
-
-        # Use SSL for port 465, STARTTLS for port 587
-        use_tls = smtp_config.port == 465
-        start_tls = smtp_config.port == 587
-
-        await aiosmtplib.send(
-            message,
-            hostname=smtp_config.host,
-            port=smtp_config.port,
-            username=smtp_config.username,
-            password=password,
-            use_tls=use_tls,
-            start_tls=start_tls,
-            tls_context=tls_context,
-            timeout=30,
-        )
-        
-        print(f"✅ Email sent successfully to {to_email}")
-        
-    except Exception as e:
-        print(f"❌ Email send failed: {type(e).__name__}: {str(e)}")
-        raise
+        await client.quit()
+    except aiosmtplib.SMTPException:
+        client.close()
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP connections open between messages.
+
+    Connections are keyed by relay account and reused until they have been
+    idle for `max_idle` seconds, so a burst of messages pays for connect,
+    TLS and login once instead of once per message.
+    """
+
+    def __init__(self, max_idle: float):
+        self.max_idle = max_idle
+        self._idle: Dict[tuple, list] = {}
+
+    @staticmethod
+    def _key(smtp_config: SMTPConfig) -> tuple:
+        return (smtp_config.host, smtp_config.port, smtp_config.username)
+
+    def _checkout(self, key: tuple):
+        idle = self._idle.get(key, [])
+        now = time.monotonic()
+        while idle:
+            client, released_at = idle.pop()
+            if now - released_at < self.max_idle and client.is_connected:
+                return client
+            client.close()
+        return None
+
+    def _release(self, key: tuple, client) -> None:
+        self._idle.setdefault(key, []).append((client, time.monotonic()))
+
+    async def send(self, smtp_config: SMTPConfig, message: Message) -> str:
+        """Send on a pooled connection and return the server's reply"""
+        import aiosmtplib
+
+        key = self._key(smtp_config)
+        client = self._checkout(key)
+        if client is not None:
+            try:
+                response = await submit(client, message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # The server dropped the idle connection; retry once on a fresh one
+                client.close()
+            except Exception:
+                await disconnect(client)
+                raise
+            else:
+                self._release(key, client)
+                return response
+
+        client = await connect(smtp_config)
+        try:
+            response = await submit(client, message)
+        except Exception:
+            await disconnect(client)
+            raise
+        self._release(key, client)
+        return response
+
+    async def close_all(self) -> None:
+        idle, self._idle = self._idle, {}
+        for clients in idle.values():
+            for client, _ in clients:
+                await disconnect(client)
+
+smtp_pool = SMTPConnectionPool(max_idle=settings.SMTP_POOL_MAX_IDLE_SECONDS)
@@ -2,27 +2,29 @@ import random
 import string
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete
+from app.core.database import AsyncSessionLocal
 from app.models.otp import OTP
-from app.services import email as email_service
+from app.models.outbox import OutboxEmail
+from app.services import outbox
 
-async def generate_otp(db: AsyncSession, user_id: int, purpose: str) -> str:
+async def generate_otp(db: AsyncSession, user_id: int, purpose: str, commit: bool = True) -> str:
     """Generate a 6-digit OTP code"""
     code = ''.join(random.choices(string.digits, k=6))
     # Store as naive datetime for SQLite compatibility
     expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=10)  # 10 min expiry
     
-    # Invalidate old OTPs for this user and purpose
-    result = await db.execute(
-        select(OTP).filter(
+    # Invalidate old OTPs for this user and purpose in a single UPDATE
+    await db.execute(
+        update(OTP)
+        .where(
             OTP.user_id == user_id,
             OTP.purpose == purpose,
             OTP.used == False
         )
+        .values(used=True)
+        .execution_options(synchronize_session=False)
     )
-    old_otps = result.scalars().all()
-    for old_otp in old_otps:
-        old_otp.used = True
     
     # Create new OTP
     otp = OTP(
@@ -32,10 +34,19 @@ async def generate_otp(db: AsyncSession, user_id: int, purpose: str) -> str:
         expires_at=expires_at
     )
     db.add(otp)
-    await db.commit()
+    if commit:
+        await db.commit()
     
     return code
 
+async def issue_otp(db: AsyncSession, user_id: int, to_email: str, purpose: str) -> OutboxEmail:
+    """Generate an OTP and queue its email in the same transaction; returns the queued email"""
+    code = await generate_otp(db, user_id, purpose, commit=False)
+    subject, body = render_otp_email(code, purpose)
+    entry = outbox.enqueue(db, f"otp_{purpose}", to_email, subject, body)
+    await db.commit()
+    return entry
+
 async def verify_otp(db: AsyncSession, user_id: int, code: str, purpose: str) -> bool:
     """Verify OTP code"""
     result = await db.execute(
@@ -60,8 +71,29 @@ async def verify_otp(db: AsyncSession, user_id: int, code: str, purpose: str) ->
     
     return True
 
-async def send_otp_email(smtp_config, to_email: str, code: str, purpose: str):
-    """Send OTP via email"""
+async def purge_expired_otps(batch_size: int) -> int:
+    """Delete expired OTPs in batches, committing after each one.
+
+    Used OTPs are never accepted again and all expire within the OTP
+    lifetime, so filtering on expires_at alone (indexed) removes them too.
+    """
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None)
+    total = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            # Ids first, then a literal IN list: MySQL rejects LIMIT inside an IN subquery
+            result = await db.execute(select(OTP.id).where(OTP.expires_at < cutoff).limit(batch_size))
+            ids = list(result.scalars())
+            if not ids:
+                return total
+            await db.execute(delete(OTP).where(OTP.id.in_(ids)).execution_options(synchronize_session=False))
+            await db.commit()
+            total += len(ids)
+            if len(ids) < batch_size:
+                return total
+
+def render_otp_email(code: str, purpose: str) -> tuple[str, str]:
+    """Build the subject and HTML body of an OTP email"""
     purpose_text = {
         'registration': 'Email Verification',
         'login': 'Login Verification',
@@ -97,4 +129,4 @@ async def send_otp_email(smtp_config, to_email: str, code: str, purpose: str):
     </html>
     """
     
-    await email_service.send_email(smtp_config, to_email, subject, body)
+    return subject, body
@@ -0,0 +1,211 @@
+"""
+Transactional email outbox.
+
+Request handlers call `enqueue` inside their own transaction, so the email is
+stored atomically with the OTP (or other change) that requires it and the
+response never waits on SMTP. A dispatcher delivers due rows in batches over
+pooled SMTP connections, retrying failures with exponential backoff.
+
+Long-lived workers run the dispatcher from the app lifespan. The serverless
+entry point has no lifespan: with CRON_SECRET set, a scheduled cron request
+(api/index.py) delivers the outbox and requests never wait on SMTP. Without
+it, `kick` delivers the request's own email as a background task; Mangum
+holds the response until background tasks finish, so those requests wait on
+SMTP as they did before the outbox, but mail still goes out.
+
+Resolved rows keep OTP codes in plaintext, so they are deleted once they are
+OUTBOX_RETENTION_HOURS old.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+from fastapi import BackgroundTasks
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.outbox import OutboxEmail
+from app.models.smtp import SMTPConfig
+
+logger = logging.getLogger(__name__)
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    smtp_config_id: Optional[int] = None,
+) -> OutboxEmail:
+    """Add an email to the caller's transaction; it is sent after commit"""
+    entry = OutboxEmail(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        smtp_config_id=smtp_config_id,
+    )
+    db.add(entry)
+    return entry
+
+
+def kick(background_tasks: Optional[BackgroundTasks] = None, entry: Optional[OutboxEmail] = None) -> None:
+    """Get a just-committed email delivered.
+
+    Wakes the in-process dispatcher when this worker runs one. Without one
+    (serverless), the scheduled dispatch delivers it when CRON_SECRET is set;
+    otherwise `entry` is delivered after the response through `background_tasks`.
+    """
+    if _wakeup is not None:
+        _wakeup.set()
+    elif background_tasks is not None and entry is not None and not settings.CRON_SECRET:
+        background_tasks.add_task(deliver_now, [entry.id])
+
+
+async def deliver_now(entry_ids: Sequence[int]) -> int:
+    """Deliver specific emails from a request, where no dispatcher or periodic purge runs"""
+    from app.services import email as email_service
+
+    try:
+        attempted = await dispatch_pending(entry_ids)
+        await purge_resolved(settings.OTP_PURGE_BATCH_SIZE)
+        return attempted
+    except Exception:
+        logger.exception("Outbox delivery of %s failed", list(entry_ids))
+        return 0
+    finally:
+        # The instance may be frozen until its next request; don't keep SMTP sessions open
+        await email_service.smtp_pool.close_all()
+
+
+async def _claim(db: AsyncSession, entry_ids: Optional[Sequence[int]] = None) -> list:
+    now = _utcnow()
+    due = (
+        select(OutboxEmail.id)
+        .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+        .order_by(OutboxEmail.id)
+        .limit(settings.OUTBOX_BATCH_SIZE)
+    )
+    if entry_ids is not None:
+        due = due.where(OutboxEmail.id.in_(entry_ids))
+    if db.bind.dialect.name == "postgresql":
+        due = due.with_for_update(skip_locked=True)
+    ids = list((await db.execute(due)).scalars())
+    if not ids:
+        return []
+    # Each conditional UPDATE is the actual claim: a row another worker leased
+    # in the meantime no longer matches. One statement per id keeps the
+    # rowcount meaningful without UPDATE ... RETURNING, which MySQL lacks.
+    lease = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    claimed = []
+    for entry_id in ids:
+        result = await db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == entry_id, OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+            .values(next_attempt_at=lease, attempts=OutboxEmail.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(entry_id)
+    await db.commit()
+    if not claimed:
+        return []
+    rows = await db.execute(select(OutboxEmail).where(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id))
+    return list(rows.scalars())
+
+
+async def dispatch_pending(entry_ids: Optional[Sequence[int]] = None) -> int:
+    """Deliver one batch of due emails (only `entry_ids`, if given); returns how many were attempted"""
+    from app.services import email as email_service
+
+    async with AsyncSessionLocal() as db:
+        entries = await _claim(db, entry_ids)
+        if not entries:
+            return 0
+
+        # Resolve relays once per batch rather than once per email
+        config_ids = {e.smtp_config_id for e in entries if e.smtp_config_id is not None}
+        configs = {}
+        if config_ids:
+            result = await db.execute(select(SMTPConfig).where(SMTPConfig.id.in_(config_ids)))
+            configs = {c.id: c for c in result.scalars()}
+        system_config = None
+        if any(e.smtp_config_id is None for e in entries):
+            result = await db.execute(select(SMTPConfig).where(SMTPConfig.is_active.is_(True)).order_by(SMTPConfig.id).limit(1))
+            system_config = result.scalars().first()
+
+        for entry in entries:
+            smtp_config = configs.get(entry.smtp_config_id) if entry.smtp_config_id else system_config
+            try:
+                if smtp_config is None:
+                    raise RuntimeError("No SMTP configuration available")
+                message = email_service.build_message(smtp_config.from_email, entry.to_email, entry.subject, entry.body)
+                await email_service.smtp_pool.send(smtp_config, message)
+            except Exception as e:
+                entry.last_error = f"{type(e).__name__}: {e}"
+                if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    entry.status = "failed"
+                    logger.error("Outbox email %s failed permanently: %s", entry.id, entry.last_error)
+                else:
+                    backoff = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1)
+                    entry.next_attempt_at = _utcnow() + timedelta(seconds=backoff)
+                    logger.warning("Outbox email %s failed, retrying in %ss: %s", entry.id, backoff, entry.last_error)
+            else:
+                entry.status = "sent"
+                entry.sent_at = _utcnow()
+                entry.last_error = None
+        await db.commit()
+    return len(entries)
+
+
+async def purge_resolved(batch_size: int) -> int:
+    """Delete sent and failed emails older than OUTBOX_RETENTION_HOURS, in batches"""
+    cutoff = _utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    total = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            result = await db.execute(
+                select(OutboxEmail.id)
+                .where(OutboxEmail.status.in_(("sent", "failed")), OutboxEmail.created_at < cutoff)
+                .limit(batch_size)
+            )
+            ids = list(result.scalars())
+            if not ids:
+                return total
+            await db.execute(
+                delete(OutboxEmail).where(OutboxEmail.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            total += len(ids)
+            if len(ids) < batch_size:
+                return total
+
+
+async def run_dispatcher() -> None:
+    """Long-running loop: deliver due emails, then sleep until kicked or polled"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    try:
+        while True:
+            try:
+                while await dispatch_pending() > 0:
+                    pass
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+    finally:
+        _wakeup = None
+        from app.services import email as email_service
+        await email_service.smtp_pool.close_all()
@@ -0,0 +1,135 @@
+"""
+Compact storage for recipient personalisation data.
+
+CSV column names are stored once per campaign in `Campaign.recipient_columns`
+and each recipient keeps only its values, as a JSON array in the same order
+(`Recipient.fields`). Uploads with new columns extend the campaign schema;
+older rows simply end early. The send path asks the database for just the
+array positions its templates reference instead of decoding every column.
+
+See benchmarks/recipient_storage.py for storage and decode measurements.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.upsert import upsert_rows
+from app.models.campaign import Campaign
+from app.models.recipient import Recipient
+from app.services import suppression_service
+
+# Addresses looked up and upserted per statement during ingest
+INSERT_BATCH_SIZE = 1000
+
+
+def merge_columns(columns: Optional[Sequence[str]], records: Iterable[dict]) -> List[str]:
+    """Extend a column schema with any keys it doesn't have yet, keeping order"""
+    merged = list(columns or [])
+    known = set(merged)
+    for record in records:
+        for key in record:
+            if key not in known:
+                known.add(key)
+                merged.append(key)
+    return merged
+
+
+def encode_row(columns: Sequence[str], record: dict) -> list:
+    """Positional array for `record`; trailing missing columns are omitted"""
+    row = [record.get(name) for name in columns]
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def decode_row(columns: Sequence[str], row: Optional[Sequence]) -> dict:
+    """Rebuild the original column -> value mapping of a stored row"""
+    if not row:
+        return {}
+    return {name: value for name, value in zip(columns, row) if value is not None}
+
+
+def column_positions(columns: Optional[Sequence[str]], names: Optional[Iterable[str]]) -> List[Tuple[str, int]]:
+    """(name, position) for each wanted name present in the column schema; None wants every column"""
+    index = {name: i for i, name in enumerate(columns or [])}
+    if names is None:
+        return sorted(index.items(), key=lambda p: p[1])
+    return sorted(((name, index[name]) for name in names if name in index), key=lambda p: p[1])
+
+
+def personalisation_select(positions: Sequence[Tuple[str, int]]) -> list:
+    """Column expressions extracting only the given array positions in SQL"""
+    return [Recipient.fields[i].label(f"f{i}") for _, i in positions]
+
+
+def context_from_row(positions: Sequence[Tuple[str, int]], row) -> Dict:
+    """Template context from a result row selected with personalisation_select"""
+    context = {}
+    for name, i in positions:
+        value = getattr(row, f"f{i}")
+        if value is not None:
+            context[name] = value
+    return context
+
+
+def _email_of(record: dict) -> Optional[str]:
+    # Find email column case-insensitively
+    for key, value in record.items():
+        if key.lower() == "email":
+            return value
+    return None
+
+
+async def add_recipients(
+    db: AsyncSession, campaign: Campaign, records: List[dict], merge: bool = False
+) -> Tuple[int, int, int]:
+    """Store parsed CSV records as recipients of `campaign`, one row per address.
+
+    Addresses already in the campaign are left alone, or with `merge` get
+    their data replaced when it changed; their status is never touched.
+    Addresses on the owner's suppression list are skipped. Returns (added,
+    updated, suppressed). Does not commit; the caller commits with the
+    campaign change.
+    """
+    suppressed = await suppression_service.suppressed_emails(
+        db, campaign.user_id, (str(email) for email in map(_email_of, records) if email)
+    )
+    columns = merge_columns(campaign.recipient_columns, records)
+    if columns != (campaign.recipient_columns or []):
+        # Reassign rather than mutate so the JSON column is flagged dirty
+        campaign.recipient_columns = columns
+
+    # The last occurrence wins when an address appears twice in the upload
+    rows: Dict[str, list] = {}
+    skipped = 0
+    for record in records:
+        email = _email_of(record)
+        if not email:
+            continue
+        email = suppression_service.normalize(str(email))
+        if suppressed and email in suppressed:
+            skipped += 1
+            continue
+        rows[email] = encode_row(columns, record)
+
+    added = updated = 0
+    items = list(rows.items())
+    for start in range(0, len(items), INSERT_BATCH_SIZE):
+        batch = dict(items[start:start + INSERT_BATCH_SIZE])
+        result = await db.execute(
+            select(Recipient.email, Recipient.fields)
+            .filter(Recipient.campaign_id == campaign.id, Recipient.email.in_(list(batch)))
+        )
+        existing = {row.email: row.fields for row in result}
+        # Only new rows, and changed ones when merging, reach the upsert
+        new = [e for e in batch if e not in existing]
+        changed = [e for e in batch if merge and e in existing and existing[e] != batch[e]]
+        await upsert_rows(
+            db,
+            Recipient.__table__,
+            ("campaign_id", "email"),
+            [{"campaign_id": campaign.id, "email": e, "fields": batch[e]} for e in new + changed],
+            update_columns=("fields",) if merge else (),
+        )
+        added += len(new)
+        updated += len(changed)
+    return added, updated, skipped
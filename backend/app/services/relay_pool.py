@@ -0,0 +1,214 @@
+"""
+Load balancing and failover across a user's SMTP relays.
+
+Messages are spread over the active relays by smooth weighted round-robin
+(the nginx algorithm: interleaved rather than bursty). Each relay has a
+token bucket enforcing its per-minute rate budget and a circuit breaker that
+ejects it after SMTP_BREAKER_FAILURE_THRESHOLD consecutive relay-level
+failures, letting one trial message through once SMTP_BREAKER_RESET_SECONDS
+have passed. A message that fails for relay reasons (connection, auth,
+timeouts, 4xx replies) is retried on the next relay; recipient-level
+rejections are not.
+
+Breaker and bucket state lives per worker process, keyed by config id, so
+concurrent campaigns of the same user share budgets and health.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+from app.core import metrics
+from app.core.config import settings
+from app.models.smtp import SMTPConfig
+
+logger = logging.getLogger(__name__)
+
+
+class NoRelayAvailable(Exception):
+    """Every relay is inactive or ejected by its circuit breaker"""
+
+
+class RelayState:
+    def __init__(self):
+        self.tokens: Optional[float] = None
+        self.refilled_at = time.monotonic()
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    # Circuit breaker
+
+    def available(self, now: float) -> bool:
+        if self.failures < settings.SMTP_BREAKER_FAILURE_THRESHOLD:
+            return True
+        # Half-open: one trial message after the reset period
+        return now >= self.open_until and not self.trial_in_flight
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self, now: float) -> bool:
+        """Count a relay-level failure; returns True when the breaker (re)opens"""
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= settings.SMTP_BREAKER_FAILURE_THRESHOLD:
+            self.open_until = now + settings.SMTP_BREAKER_RESET_SECONDS
+            return True
+        return False
+
+    # Token bucket
+
+    def wait_time(self, rate_per_minute: Optional[int], now: float) -> float:
+        """Seconds until a token is available (0 when one can be taken now)"""
+        if not rate_per_minute:
+            return 0.0
+        if self.tokens is None:
+            self.tokens = float(rate_per_minute)
+        self.tokens = min(rate_per_minute, self.tokens + (now - self.refilled_at) * rate_per_minute / 60)
+        self.refilled_at = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * 60 / rate_per_minute
+
+    def take(self, rate_per_minute: Optional[int], now: float) -> None:
+        if rate_per_minute:
+            self.tokens -= 1
+        if self.failures >= settings.SMTP_BREAKER_FAILURE_THRESHOLD:
+            self.trial_in_flight = True
+
+
+_states: Dict[int, RelayState] = {}
+
+
+def relay_state(smtp_config_id: int) -> RelayState:
+    state = _states.get(smtp_config_id)
+    if state is None:
+        state = _states[smtp_config_id] = RelayState()
+    return state
+
+
+def reset_relay(smtp_config_id: int) -> None:
+    """Forget breaker and budget state, e.g. after the relay's settings changed"""
+    _states.pop(smtp_config_id, None)
+
+
+def is_relay_failure(exc: Exception) -> bool:
+    """Whether a send error points at the relay rather than the message or recipient"""
+    import aiosmtplib
+
+    if isinstance(exc, (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPRecipientRefused)):
+        return False
+    if isinstance(exc, aiosmtplib.SMTPResponseException):
+        # 421/45x: relay busy or throttled; 530/535: authentication
+        return 400 <= exc.code < 500 or exc.code in (530, 535)
+    return isinstance(exc, (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError))
+
+
+class RelayPool:
+    """Picks, throttles and fails over between the relays of one sender"""
+
+    def __init__(self, smtp_configs: Sequence[SMTPConfig]):
+        self.relays: List[SMTPConfig] = [c for c in smtp_configs if c.is_active is not False]
+        self._current: Dict[int, int] = {c.id: 0 for c in self.relays}
+
+    def _pick(self, exclude: set) -> Optional[SMTPConfig]:
+        """Smooth weighted round-robin over healthy relays with budget left"""
+        now = time.monotonic()
+        eligible = [
+            c for c in self.relays
+            if c.id not in exclude
+            and relay_state(c.id).available(now)
+            and relay_state(c.id).wait_time(c.rate_limit_per_minute, now) == 0
+        ]
+        if not eligible:
+            return None
+        total = 0
+        best = None
+        for c in eligible:
+            weight = c.weight or 1
+            self._current[c.id] += weight
+            total += weight
+            if best is None or self._current[c.id] > self._current[best.id]:
+                best = c
+        self._current[best.id] -= total
+        relay_state(best.id).take(best.rate_limit_per_minute, now)
+        return best
+
+    async def acquire(self, exclude: set = frozenset()) -> SMTPConfig:
+        """Next relay to use, waiting for rate budget when all are throttled"""
+        while True:
+            relay = self._pick(exclude)
+            if relay is not None:
+                return relay
+            now = time.monotonic()
+            healthy = [
+                c for c in self.relays if c.id not in exclude and relay_state(c.id).available(now)
+            ]
+            if not healthy:
+                raise NoRelayAvailable("No healthy SMTP relay available")
+            await asyncio.sleep(min(relay_state(c.id).wait_time(c.rate_limit_per_minute, now) for c in healthy))
+
+    async def send(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        attachments: Optional[List[Dict]] = None,
+        campaign_id: Optional[int] = None,
+        recipient_id: Optional[int] = None,
+        unsubscribe_url: Optional[str] = None,
+    ) -> SMTPConfig:
+        """Send one message, failing over between relays; returns the relay used.
+
+        Every attempt is written to the delivery event log.
+        """
+        from app.services import delivery_events
+        from app.services import email as email_service
+
+        tried: set = set()
+        while True:
+            try:
+                relay = await self.acquire(tried)
+            except NoRelayAvailable:
+                if tried:
+                    raise last_error
+                raise
+            message = email_service.build_message(relay.from_email, to_email, subject, body, attachments, unsubscribe_url)
+            started = time.perf_counter()
+            try:
+                response = await email_service.smtp_pool.send(relay, message)
+            except Exception as e:
+                await delivery_events.record(
+                    "failed",
+                    campaign_id=campaign_id,
+                    recipient_id=recipient_id,
+                    smtp_config_id=relay.id,
+                    attempt=len(tried) + 1,
+                    smtp_response=f"{type(e).__name__}: {e}",
+                    duration_ms=round((time.perf_counter() - started) * 1000),
+                )
+                if not is_relay_failure(e):
+                    relay_state(relay.id).record_success()
+                    raise
+                last_error = e
+                tried.add(relay.id)
+                if relay_state(relay.id).record_failure(time.monotonic()):
+                    metrics.SMTP_RELAY_EJECTIONS.inc()
+                    logger.warning(
+                        "SMTP relay %s ejected after repeated failures: %s",
+                        relay.id,
+                        e,
+                        extra={"campaign_id": campaign_id},
+                    )
+                metrics.SMTP_RELAY_FAILURES.inc()
+                continue
+            await delivery_events.record(
+                "sent",
+                campaign_id=campaign_id,
+                recipient_id=recipient_id,
+                smtp_config_id=relay.id,
+                attempt=len(tried) + 1,
+                smtp_response=response,
+                duration_ms=round((time.perf_counter() - started) * 1000),
+            )
+            relay_state(relay.id).record_success()
+            return relay
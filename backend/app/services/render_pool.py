@@ -0,0 +1,487 @@
+"""
+Sandboxed template rendering in a bounded process pool.
+
+User templates run in a Jinja SandboxedEnvironment (no attribute access to
+internals, `range` capped at 100k, `*` and `**` refused when the result
+would exceed TEMPLATE_MAX_OUTPUT_CHARS) inside TEMPLATE_RENDER_WORKERS
+spawned processes, so a runaway template burns a worker core instead of
+stalling the event loop for every tenant. Each render is limited to
+TEMPLATE_RENDER_CPU_SECONDS of CPU (SIGVTALRM in the worker) and
+TEMPLATE_MAX_OUTPUT_CHARS of output, and each worker's address space to
+TEMPLATE_RENDER_MEMORY_MB, so an allocation the operator caps don't catch
+fails with MemoryError in the worker instead of exhausting the host. Batches are split into chunks small
+enough that their CPU allowance fits well inside
+TEMPLATE_RENDER_TIMEOUT_SECONDS, and each chunk gets that wall-clock
+deadline from the moment a worker picks it up. A chunk past its deadline
+(stuck outside the interpreter, where the CPU timer can't fire) fails on its
+own; the pool is retired, new work goes to a fresh pool, and the old
+processes are killed only once other callers' chunks on it have finished.
+Workers keep their own compiled-template caches.
+
+With TEMPLATE_RENDER_WORKERS = 0, or where processes can't be started
+(e.g. serverless runtimes without /dev/shm; a warning is logged), templates
+render in a thread with the same wall-clock deadline. The thread can't take
+the CPU timer signal, so the event loop watches its CPU clock and raises
+into it when a render runs over its allowance or the deadline passes; the
+thread stops at its next bytecode. Inline renders are sandboxed and capped
+the same way, but have no memory limit, and a single long C-level call
+(which the operator caps exist to prevent) can't be interrupted.
+"""
+import asyncio
+import ctypes
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from jinja2 import BaseLoader, TemplateNotFound
+from jinja2.exceptions import SecurityError
+from jinja2.sandbox import SandboxedEnvironment
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How often running chunks are checked against their deadline
+DEADLINE_POLL_SECONDS = 0.5
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_unavailable = False
+# Futures submitted to each live or retiring pool
+_inflight: Dict[ProcessPoolExecutor, Set] = {}
+# Retired pools' worker processes (shutdown() forgets them) and the reapers that kill them
+_retired: Dict[ProcessPoolExecutor, list] = {}
+_reapers: Set[asyncio.Task] = set()
+
+
+class RenderError(Exception):
+    """A template failed to render or exceeded a render limit"""
+
+
+class LimitedSandbox(SandboxedEnvironment):
+    """Sandbox that refuses `*` and `**` results larger than `max_size`.
+
+    Intercepting the operators also stops Jinja from folding constant
+    expressions like `'x' * 10**9` at compile time.
+    """
+
+    intercepted_binops = frozenset(["*", "**"])
+
+    def __init__(self, *args, max_size: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_size = max_size
+
+    def call_binop(self, context, operator, left, right):
+        if operator == "*":
+            for sequence, count in ((left, right), (right, left)):
+                if isinstance(sequence, (str, bytes, list, tuple)) and isinstance(count, int):
+                    if len(sequence) * count > self.max_size:
+                        raise SecurityError(f"Repetition result exceeds {self.max_size} items")
+        elif isinstance(left, int) and isinstance(right, int) and right > 0 and abs(left) > 1:
+            # About 3.3 bits per decimal digit of the result
+            if left.bit_length() * right > self.max_size * 4:
+                raise SecurityError(f"Power result exceeds {self.max_size} digits")
+        return super().call_binop(context, operator, left, right)
+
+
+class SnapshotLoader(BaseLoader):
+    """Serves templates by name from a {name: (id, version, content)} snapshot"""
+
+    def __init__(self):
+        self.sources: Dict[str, Tuple[int, int, str]] = {}
+
+    def get_source(self, environment, name):
+        entry = self.sources.get(name)
+        if entry is None:
+            raise TemplateNotFound(name)
+        key, content = entry[:2], entry[2]
+
+        def uptodate():
+            current = self.sources.get(name)
+            return current is not None and current[:2] == key
+
+        return content, None, uptodate
+
+
+# Worker-side state; also used in-process when rendering inline
+_loader = SnapshotLoader()
+_env: Optional[SandboxedEnvironment] = None
+_compiled: "OrderedDict[str, object]" = OrderedDict()
+
+
+class _CpuLimitExceeded(BaseException):
+    # BaseException so template code can't swallow it
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _init_worker(memory_mb: int) -> None:
+    """Render process initializer: cap the address space"""
+    if memory_mb > 0:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _ping() -> bool:
+    return True
+
+
+class _Watch:
+    """Progress of an inline render, shared with the event loop watching its thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread_id: Optional[int] = None
+        # CPU clock of the render thread when the current context started; None between contexts
+        self.started: Optional[float] = None
+        self.cancelled = False
+        self.finished = False
+
+    def begin(self) -> None:
+        with self.lock:
+            self.started = time.thread_time()
+
+    def end(self) -> None:
+        with self.lock:
+            self.started = None
+
+
+def _compile(source: str, max_output: int):
+    global _env
+    if _env is None:
+        _env = LimitedSandbox(
+            loader=_loader, auto_reload=True, cache_size=settings.TEMPLATE_CACHE_SIZE, max_size=max_output
+        )
+    _env.max_size = max_output
+    template = _compiled.get(source)
+    if template is None:
+        template = _compiled[source] = _env.from_string(source or "")
+        while len(_compiled) > settings.TEMPLATE_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(source)
+    return template
+
+
+def _render(template, context: dict, max_output: int) -> str:
+    parts = []
+    size = 0
+    for part in template.generate(context):
+        size += len(part)
+        if size > max_output:
+            raise RenderError(f"Rendered output exceeds {max_output} characters")
+        parts.append(part)
+    return "".join(parts)
+
+
+def render_chunk(
+    templates: Dict[str, Tuple[int, int, str]],
+    sources: Sequence[str],
+    contexts: Sequence[dict],
+    cpu_seconds: float,
+    max_output: int,
+    watch: Optional[_Watch] = None,
+) -> List[Union[Tuple[str, ...], str]]:
+    """Render every source per context; an error message replaces a failed context's output.
+
+    In a pool worker, templates come from the process-wide compiled cache and
+    the CPU timer enforces `cpu_seconds`. Inline renders pass a `watch`
+    instead: they run in a thread, compile privately, and the event loop
+    enforces the CPU limit (see _render_inline).
+    """
+    try:
+        if watch is None:
+            _loader.sources = templates
+            compiled = [_compile(source, max_output) for source in sources]
+        else:
+            loader = SnapshotLoader()
+            loader.sources = templates
+            env = LimitedSandbox(loader=loader, max_size=max_output)
+            compiled = [env.from_string(source or "") for source in sources]
+    except Exception as e:
+        return [f"{type(e).__name__}: {e}"] * len(contexts)
+
+    use_timer = watch is None and cpu_seconds > 0 and hasattr(signal, "setitimer")
+    if use_timer:
+        signal.signal(signal.SIGVTALRM, _on_cpu_limit)
+    results = []
+    for context in contexts:
+        if watch is not None and watch.cancelled:
+            break
+        try:
+            if use_timer:
+                signal.setitimer(signal.ITIMER_VIRTUAL, cpu_seconds)
+            if watch is not None:
+                watch.begin()
+            output = tuple(_render(template, context, max_output) for template in compiled)
+            if use_timer:
+                signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+            results.append(output)
+        except _CpuLimitExceeded:
+            results.append(f"Template exceeded the {cpu_seconds:g}s CPU limit")
+        except RenderError as e:
+            results.append(str(e))
+        except Exception as e:
+            results.append(f"{type(e).__name__}: {e}")
+        finally:
+            if use_timer:
+                signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+            if watch is not None:
+                watch.end()
+    return results
+
+
+async def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_unavailable
+    if _pool is None and not _pool_unavailable and settings.TEMPLATE_RENDER_WORKERS > 0:
+        pool = None
+        try:
+            # spawn: forking a process with running threads (log writer, DB drivers) can deadlock
+            pool = _pool = ProcessPoolExecutor(
+                max_workers=settings.TEMPLATE_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.TEMPLATE_RENDER_MEMORY_MB,),
+            )
+            # Processes start on first use; make sure they can before relying on them
+            await asyncio.wait_for(
+                asyncio.wrap_future(pool.submit(_ping)), timeout=settings.TEMPLATE_RENDER_TIMEOUT_SECONDS
+            )
+        except (OSError, ImportError, NotImplementedError, BrokenProcessPool, asyncio.TimeoutError) as e:
+            logger.warning(
+                "Template render processes can't start (%s: %s); rendering inline, without the memory limit",
+                type(e).__name__,
+                e,
+            )
+            _pool_unavailable = True
+            if pool is not None:
+                if _pool is pool:
+                    _pool = None
+                _kill(pool)
+    return _pool
+
+
+def _processes(pool: ProcessPoolExecutor) -> list:
+    return list((getattr(pool, "_processes", None) or {}).values())
+
+
+def _kill(pool: ProcessPoolExecutor) -> None:
+    # ProcessPoolExecutor can't cancel a running call, so stop its processes directly
+    for process in _retired.pop(pool, None) or _processes(pool):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+    _inflight.pop(pool, None)
+
+
+async def _reap(pool: ProcessPoolExecutor, abandoned: Set) -> None:
+    """Kill a retired pool once every chunk still worth waiting for has finished"""
+    try:
+        others = [f for f in _inflight.get(pool, ()) if f not in abandoned and not f.done()]
+        if others:
+            await asyncio.wait(
+                [asyncio.wrap_future(f) for f in others], timeout=settings.TEMPLATE_RENDER_TIMEOUT_SECONDS
+            )
+    finally:
+        _kill(pool)
+
+
+def _retire(pool: ProcessPoolExecutor, abandoned: Set) -> None:
+    """Send new work to a fresh pool and kill this one when its other callers are done"""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    _retired[pool] = _processes(pool)
+    # Queued and running calls still complete; only new submissions are refused
+    pool.shutdown(wait=False, cancel_futures=False)
+    task = asyncio.create_task(_reap(pool, abandoned))
+    _reapers.add(task)
+    task.add_done_callback(_reapers.discard)
+
+
+def shutdown(kill: bool = False) -> None:
+    """Stop the render workers; `kill` also terminates renders in progress"""
+    global _pool
+    pool, _pool = _pool, None
+    for task in list(_reapers):
+        task.cancel()
+    for retired in list(_retired):
+        _kill(retired)
+    if pool is None:
+        return
+    if kill:
+        _kill(pool)
+    else:
+        pool.shutdown(wait=False, cancel_futures=True)
+        _inflight.pop(pool, None)
+
+
+def _chunk_size(count: int) -> int:
+    """Contexts per chunk: spread over the workers, CPU allowance within a third of the deadline"""
+    size = -(-count // settings.TEMPLATE_RENDER_WORKERS)
+    cpu_seconds = settings.TEMPLATE_RENDER_CPU_SECONDS
+    if cpu_seconds > 0:
+        size = min(size, max(1, int(settings.TEMPLATE_RENDER_TIMEOUT_SECONDS / 3 / cpu_seconds)))
+    return size
+
+
+async def _render_pooled(
+    pool: ProcessPoolExecutor,
+    templates: Dict[str, Tuple[int, int, str]],
+    sources: Sequence[str],
+    contexts: Sequence[dict],
+) -> List[Union[Tuple[str, ...], str]]:
+    """Per context, its output or an error message; a failed chunk fails all of its contexts"""
+    timeout = settings.TEMPLATE_RENDER_TIMEOUT_SECONDS
+    size = _chunk_size(len(contexts))
+    parts = [contexts[start:start + size] for start in range(0, len(contexts), size)]
+    chunks: List[List] = [None] * len(parts)
+    submitted = _inflight.setdefault(pool, set())
+    futures = {}
+    started: Dict[object, float] = {}
+    abandoned: Set = set()
+    crashed = False
+    loop = asyncio.get_running_loop()
+    try:
+        for index, part in enumerate(parts):
+            future = pool.submit(
+                render_chunk,
+                templates,
+                sources,
+                part,
+                settings.TEMPLATE_RENDER_CPU_SECONDS,
+                settings.TEMPLATE_MAX_OUTPUT_CHARS,
+            )
+            submitted.add(future)
+            futures[asyncio.wrap_future(future)] = (index, future)
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=DEADLINE_POLL_SECONDS)
+            for waiter in done:
+                index, _ = futures[waiter]
+                try:
+                    chunks[index] = waiter.result()
+                except (BrokenProcessPool, OSError):
+                    crashed = True
+                    chunks[index] = ["Template render worker crashed"] * len(parts[index])
+            now = loop.time()
+            for waiter in list(pending):
+                index, future = futures[waiter]
+                # The deadline runs from when a worker picks the chunk up, not from queueing
+                if future.running() and now - started.setdefault(waiter, now) > timeout:
+                    pending.discard(waiter)
+                    # Stop waiting on it; the worker is killed once the pool is reaped
+                    waiter.cancel()
+                    abandoned.add(future)
+                    chunks[index] = ["Template rendering timed out"] * len(parts[index])
+    finally:
+        submitted.difference_update(future for _, future in futures.values())
+    if abandoned or crashed:
+        logger.error("Template render pool %s; replacing it", "timed out" if abandoned else "crashed")
+        if _pool is pool:
+            _retire(pool, abandoned)
+    return [result for chunk in chunks for result in chunk]
+
+
+def _interrupt(thread_id: int) -> None:
+    """Raise _CpuLimitExceeded in a thread when it next runs Python bytecode"""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(_CpuLimitExceeded))
+
+
+def _thread_cpu_time(thread_id: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+async def _render_inline(
+    templates: Dict[str, Tuple[int, int, str]],
+    sources: Sequence[str],
+    contexts: Sequence[dict],
+) -> List[Union[Tuple[str, ...], str]]:
+    """Render on a thread of its own, interrupting it at the CPU limit or the deadline"""
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+    watch = _Watch()
+    cpu_seconds = settings.TEMPLATE_RENDER_CPU_SECONDS
+
+    def settle(result):
+        if not finished.done():
+            finished.set_result(result)
+
+    def run():
+        try:
+            result = render_chunk(
+                templates, sources, contexts, cpu_seconds, settings.TEMPLATE_MAX_OUTPUT_CHARS, watch
+            )
+        except BaseException as e:
+            # An interrupt that landed between contexts
+            result = e
+        while True:
+            try:
+                with watch.lock:
+                    watch.finished = True
+                loop.call_soon_threadsafe(settle, result)
+                return
+            except _CpuLimitExceeded:
+                # Raised just before the watcher saw the render finish
+                continue
+
+    thread = threading.Thread(target=run, name="template-render-inline", daemon=True)
+    thread.start()
+    watch.thread_id = thread.ident
+    deadline = loop.time() + settings.TEMPLATE_RENDER_TIMEOUT_SECONDS
+    while True:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(finished), timeout=DEADLINE_POLL_SECONDS)
+            break
+        except asyncio.TimeoutError:
+            pass
+        timed_out = loop.time() > deadline
+        with watch.lock:
+            if watch.finished:
+                continue
+            if timed_out:
+                watch.cancelled = True
+            used = _thread_cpu_time(watch.thread_id) if watch.started is not None else None
+            if timed_out or (cpu_seconds > 0 and used is not None and used - watch.started > cpu_seconds):
+                watch.started = None
+                _interrupt(watch.thread_id)
+        if timed_out:
+            # The thread stops at its next bytecode; nothing waits on it any more
+            logger.error("Inline template render timed out")
+            return ["Template rendering timed out"] * len(contexts)
+    if isinstance(result, BaseException):
+        return ["Template rendering was interrupted"] * len(contexts)
+    return result
+
+
+async def render_batch(
+    templates: Dict[str, Tuple[int, int, str]],
+    sources: Sequence[str],
+    contexts: Sequence[dict],
+) -> List[Union[Tuple[str, ...], RenderError]]:
+    """Render `sources` for each context, spread across the workers; never raises"""
+    if not contexts:
+        return []
+    pool = await _get_pool()
+    if pool is None:
+        results = await _render_inline(templates, sources, contexts)
+    else:
+        try:
+            results = await _render_pooled(pool, templates, sources, contexts)
+        except (BrokenProcessPool, RuntimeError):
+            # The pool broke or was shut down before all chunks were submitted
+            logger.error("Template render pool unusable; replacing it")
+            if _pool is pool:
+                _retire(pool, set())
+            results = ["Template render worker crashed"] * len(contexts)
+    return [RenderError(result) if isinstance(result, str) else result for result in results]
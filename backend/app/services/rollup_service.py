@@ -0,0 +1,90 @@
+"""
+Hourly send-volume rollups.
+
+The send loop records each outcome in a RollupBuffer and flushes it with the
+transaction that stores recipient statuses: one upsert statement adds the
+buffered counts to the campaign's hourly rows and to the user's totals
+(campaign_id 0). Time series are then read from rollups alone, so their cost
+depends on the time range, not on how many recipients were ever sent.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.upsert import upsert_increment
+from app.models.rollup import SendRollup
+
+COUNTERS = ("sent", "failed", "suppressed")
+INTERVALS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_start(at: datetime, interval: str) -> datetime:
+    at = hour_bucket(at)
+    return at.replace(hour=0) if interval == "day" else at
+
+
+class RollupBuffer:
+    """Counts outcomes in memory until flushed in one batched upsert"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._counts: Dict[Tuple[int, datetime], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def record(self, campaign_id: int, outcome: str, at: Optional[datetime] = None) -> None:
+        bucket = hour_bucket(at or utcnow())
+        self._counts[(campaign_id, bucket)][outcome] += 1
+        self._counts[(0, bucket)][outcome] += 1
+
+    async def flush(self, db: AsyncSession) -> None:
+        """Add buffered counts to the rollup table; the caller commits"""
+        if not self._counts:
+            return
+        rows = [
+            {"user_id": self.user_id, "campaign_id": campaign_id, "bucket": bucket, **counts}
+            for (campaign_id, bucket), counts in self._counts.items()
+        ]
+        await upsert_increment(db, SendRollup.__table__, ("user_id", "campaign_id", "bucket"), COUNTERS, rows)
+        self._counts.clear()
+
+
+async def timeseries(
+    db: AsyncSession,
+    user_id: int,
+    start: datetime,
+    end: datetime,
+    interval: str = "hour",
+    campaign_id: int = 0,
+) -> List[Dict]:
+    """Counts per interval in [start, end), zero-filled, from rollups only"""
+    start = _bucket_start(start, interval)
+    result = await db.execute(
+        select(SendRollup.bucket, SendRollup.sent, SendRollup.failed, SendRollup.suppressed)
+        .filter(
+            SendRollup.user_id == user_id,
+            SendRollup.campaign_id == campaign_id,
+            SendRollup.bucket >= start,
+            SendRollup.bucket < end,
+        )
+    )
+    totals: Dict[datetime, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in result:
+        counts = totals[_bucket_start(row.bucket, interval)]
+        for name in COUNTERS:
+            counts[name] += getattr(row, name)
+
+    points = []
+    step = INTERVALS[interval]
+    bucket = start
+    while bucket < end:
+        points.append({"bucket": bucket, **totals.get(bucket, dict.fromkeys(COUNTERS, 0))})
+        bucket += step
+    return points
@@ -0,0 +1,151 @@
+"""
+Per-user suppression list with a Bloom-filter fast path.
+
+Each worker keeps a Bloom filter of every user's suppressed addresses. Checking
+a batch of recipients costs one fingerprint query (count and max id, both
+answered from the unique index) plus a few hash probes per address; only the
+addresses the filter flags are confirmed against the table, so false
+positives never drop a real recipient. When the fingerprint changes the
+filter is extended with the new rows rather than rebuilt.
+"""
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.upsert import upsert_rows
+from app.models.suppression import Suppression
+
+# Users whose filters are kept in memory per worker
+FILTER_CACHE_SIZE = 256
+# Addresses per IN (...) when confirming Bloom hits or inserting
+CHUNK_SIZE = 500
+
+_filters: "OrderedDict[int, Tuple[tuple, BloomFilter]]" = OrderedDict()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(capacity, 1)
+        self.count = 0
+        self.size = max(int(-self.capacity * math.log(fp_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> list:
+        h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=16).digest(), "little")
+        h1, h2 = h & 0xFFFFFFFFFFFFFFFF, (h >> 64) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, value: str) -> None:
+        bits = self.bits
+        for pos in self._positions(value):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self.bits
+        for pos in self._positions(value):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+def normalize(email: str) -> str:
+    return email.strip().lower()
+
+
+async def _fingerprint(db: AsyncSession, user_id: int) -> tuple:
+    result = await db.execute(
+        select(func.count(Suppression.id), func.max(Suppression.id)).filter(Suppression.user_id == user_id)
+    )
+    return tuple(result.one())
+
+
+async def _get_filter(db: AsyncSession, user_id: int) -> Optional[BloomFilter]:
+    """The user's filter, brought up to date; None when the list is empty.
+
+    New rows (id above the cached max) are added incrementally. Deleted
+    addresses may linger in the filter, which is harmless since hits are
+    confirmed. The filter is rebuilt when rows appeared below the cached max
+    id (out-of-order commits) or it has outgrown its capacity.
+    """
+    count, max_id = await _fingerprint(db, user_id)
+    if count == 0:
+        _filters.pop(user_id, None)
+        return None
+    cached = _filters.get(user_id)
+    if cached is not None:
+        (cached_count, cached_max), bloom = cached
+        if (cached_count, cached_max) == (count, max_id):
+            _filters.move_to_end(user_id)
+            return bloom
+        new_rows = []
+        if max_id > cached_max:
+            result = await db.execute(
+                select(Suppression.email).filter(Suppression.user_id == user_id, Suppression.id > cached_max)
+            )
+            new_rows = result.scalars().all()
+        if count <= cached_count + len(new_rows) and bloom.count + len(new_rows) <= bloom.capacity:
+            for email in new_rows:
+                bloom.add(email)
+            _filters[user_id] = ((count, max_id), bloom)
+            _filters.move_to_end(user_id)
+            return bloom
+
+    # Headroom so a growing list is extended in place for a while
+    bloom = BloomFilter(count * 2, settings.SUPPRESSION_BLOOM_FP_RATE)
+    result = await db.stream_scalars(
+        select(Suppression.email).filter(Suppression.user_id == user_id).execution_options(yield_per=5000)
+    )
+    async for email in result:
+        bloom.add(email)
+    _filters[user_id] = ((count, max_id), bloom)
+    _filters.move_to_end(user_id)
+    while len(_filters) > FILTER_CACHE_SIZE:
+        _filters.popitem(last=False)
+    return bloom
+
+
+async def suppressed_emails(db: AsyncSession, user_id: int, emails: Iterable[str]) -> Set[str]:
+    """Normalized addresses among `emails` that are on the user's suppression list"""
+    bloom = await _get_filter(db, user_id)
+    if bloom is None:
+        return set()
+    candidates = list({e for e in map(normalize, emails) if e in bloom})
+    confirmed = set()
+    for start in range(0, len(candidates), CHUNK_SIZE):
+        result = await db.execute(
+            select(Suppression.email).filter(
+                Suppression.user_id == user_id,
+                Suppression.email.in_(candidates[start:start + CHUNK_SIZE]),
+            )
+        )
+        confirmed.update(result.scalars())
+    return confirmed
+
+
+async def add_suppressions(db: AsyncSession, user_id: int, emails: Iterable[str], reason: str = "manual") -> int:
+    """Insert addresses not yet suppressed; returns how many were new. Does not commit.
+
+    Already suppressed addresses are skipped by the database (insert-or-ignore), so
+    concurrent writers adding the same address don't fail each other's batches.
+    """
+    rows: List[Dict] = [{"user_id": user_id, "email": e, "reason": reason} for e in {e for e in map(normalize, emails) if e}]
+    added = 0
+    for start in range(0, len(rows), CHUNK_SIZE):
+        added += await upsert_rows(db, Suppression.__table__, ("user_id", "email"), rows[start:start + CHUNK_SIZE])
+    return added
+
+
+async def remove_suppression(db: AsyncSession, user_id: int, email: str) -> bool:
+    """Delete one address; returns False when it was not suppressed. Does not commit."""
+    result = await db.execute(
+        delete(Suppression).where(Suppression.user_id == user_id, Suppression.email == normalize(email))
+    )
+    return result.rowcount > 0
@@ -1,5 +1,121 @@
-from jinja2 import Template
+"""
+Campaign rendering against the user's stored templates.
 
-def render_template(content: str, context: dict) -> str:
-    template = Template(content)
-    return template.render(context)
+Campaign subjects and bodies can `{% extends %}`, `{% include %}` or
+`{% import %}` the user's Template rows by name. Each worker keeps a snapshot
+of those rows per user (LRU); `get_user_templates` refreshes it with a single
+(name, version) query and fetches content only for rows whose version
+changed. Rendering itself is sandboxed and happens in `render_pool`, whose
+workers recompile exactly the layouts that were edited and reuse compiled
+campaign bodies across recipients.
+
+Imports jinja2 at module level; routers import this module lazily so the
+serverless cold start doesn't pay for it.
+"""
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple, Union
+from jinja2 import meta
+from jinja2.sandbox import SandboxedEnvironment
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.template import Template
+from app.services import render_pool
+from app.services.render_pool import RenderError
+
+_user_templates: "OrderedDict[int, UserTemplates]" = OrderedDict()
+
+
+class DatabaseLoader(render_pool.SnapshotLoader):
+    """Serves a user's Template rows by name; the highest id wins on duplicate names"""
+
+    async def refresh(self, db: AsyncSession, user_id: int) -> None:
+        """Bring the snapshot up to date, loading content only for changed rows"""
+        result = await db.execute(
+            select(Template.id, Template.name, Template.version)
+            .filter(Template.user_id == user_id)
+            .order_by(Template.id)
+        )
+        current = {row.name: (row.id, row.version) for row in result}
+        stale = [
+            template_id for name, (template_id, version) in current.items()
+            if self.sources.get(name, (None, None))[:2] != (template_id, version)
+        ]
+        sources = {name: self.sources[name] for name in current if name in self.sources}
+        if stale:
+            result = await db.execute(
+                select(Template.id, Template.name, Template.version, Template.content)
+                .filter(Template.id.in_(stale))
+            )
+            for row in result:
+                sources[row.name] = (row.id, row.version, row.content)
+        self.sources = sources
+
+
+class UserTemplates:
+    """A user's stored templates, for analysing and rendering campaign content"""
+
+    def __init__(self):
+        self.loader = DatabaseLoader()
+        # Parsing only; rendering happens in render_pool
+        self.env = SandboxedEnvironment(loader=self.loader)
+
+    def _walk(self, sources: Sequence[str]) -> Tuple[set, Optional[set]]:
+        """(top-level variables, referenced stored templates) of `sources`, recursively.
+
+        The referenced set is None when a reference is dynamic (e.g.
+        `{% include name_var %}`) and can't be known ahead of rendering.
+        """
+        names = set()
+        refs = set()
+        pending = list(sources)
+        while pending:
+            ast = self.env.parse(pending.pop() or "")
+            names |= meta.find_undeclared_variables(ast)
+            for ref in meta.find_referenced_templates(ast):
+                if ref is None:
+                    return names, None
+                if ref not in refs and ref in self.loader.sources:
+                    refs.add(ref)
+                    pending.append(self.loader.sources[ref][2])
+        return names, refs
+
+    def template_variables(self, *sources: str) -> Optional[set]:
+        """Top-level variables used by `sources` and every stored template they reference.
+
+        Returns None when the full set can't be known ahead of rendering.
+        """
+        names, refs = self._walk(sources)
+        return None if refs is None else names
+
+    async def render_batch(
+        self, sources: Sequence[str], contexts: Sequence[dict]
+    ) -> List[Union[Tuple[str, ...], RenderError]]:
+        """Render `sources` once per context; failed contexts get a RenderError"""
+        try:
+            refs = self._walk(sources)[1]
+        except Exception as e:
+            return [RenderError(f"{type(e).__name__}: {e}")] * len(contexts)
+        # Ship only the stored templates these sources can reach
+        templates = self.loader.sources if refs is None else {name: self.loader.sources[name] for name in refs}
+        return await render_pool.render_batch(templates, sources, contexts)
+
+    async def render(self, context: dict, *sources: str) -> Tuple[str, ...]:
+        """Render each source with one context; raises RenderError"""
+        result = (await self.render_batch(sources, [context]))[0]
+        if isinstance(result, RenderError):
+            raise result
+        return result
+
+
+async def get_user_templates(db: AsyncSession, user_id: int) -> UserTemplates:
+    """The user's templates, refreshed against the database"""
+    user_templates = _user_templates.get(user_id)
+    if user_templates is None:
+        user_templates = _user_templates[user_id] = UserTemplates()
+        while len(_user_templates) > settings.TEMPLATE_ENV_CACHE_SIZE:
+            _user_templates.popitem(last=False)
+    else:
+        _user_templates.move_to_end(user_id)
+    await user_templates.loader.refresh(db, user_id)
+    return user_templates
@@ -0,0 +1,210 @@
+"""
+Open and click tracking.
+
+When a campaign with tracking enabled is sent, `prepare_body` rewrites the
+body source once: every static http(s) href becomes a redirect through
+/t/c/{token}/{position}, with the targets stored in campaign_links. Per
+recipient only a signed token is added to the render context and, for
+opens, a pixel is appended to the rendered body.
+
+The public endpoints verify the token's HMAC without a database lookup,
+resolve link targets from a per-worker cache, and queue events for a
+BatchWriter that inserts them in bulk. When the queue is full, hits are
+dropped and counted in metrics rather than slowing the redirect down.
+"""
+import base64
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import distinct, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import metrics, signing
+from app.core.batch_writer import BatchWriter
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, ReadSessionLocal
+from app.models.campaign import Campaign
+from app.models.recipient import Recipient
+from app.models.tracking import CampaignLink, TrackingEvent
+
+logger = logging.getLogger(__name__)
+
+# Render-context variable holding the recipient's tracking token
+TOKEN_VARIABLE = "_nova_tracking"
+PIXEL_GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+# Static absolute links only; links built from template expressions are left alone
+_HREF = re.compile(r"""(href\s*=\s*)(["'])(https?://[^"'{}<>\s]+)\2""", re.IGNORECASE)
+# Campaigns whose link tables stay cached per worker
+MAX_CACHED_CAMPAIGNS = 1000
+
+_links: "OrderedDict[int, List[str]]" = OrderedDict()
+
+
+def base_url() -> str:
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}{settings.API_V1_STR}/t"
+
+
+def token(campaign_id: int, recipient_id: int) -> str:
+    return signing.sign("track", campaign_id, recipient_id)
+
+
+def parse_token(value: str) -> Optional[Tuple[int, int]]:
+    """(campaign_id, recipient_id) of a valid token, else None"""
+    parts = signing.verify("track", value)
+    if not parts or len(parts) != 2:
+        return None
+    try:
+        return int(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+
+async def prepare_body(db: AsyncSession, campaign: Campaign) -> str:
+    """The body source with static links rewritten to click redirects; the caller commits"""
+    urls = list(dict.fromkeys(match.group(3) for match in _HREF.finditer(campaign.body)))
+    if not urls:
+        return campaign.body
+    result = await db.execute(
+        select(CampaignLink.position, CampaignLink.url).filter(CampaignLink.campaign_id == campaign.id)
+    )
+    # Keep positions stable across re-sends so links in earlier emails still resolve
+    positions = {row.url: row.position for row in result}
+    next_position = max(positions.values(), default=-1) + 1
+    new_links = []
+    for url in urls:
+        if url not in positions:
+            positions[url] = next_position
+            new_links.append({"campaign_id": campaign.id, "position": next_position, "url": url})
+            next_position += 1
+    if new_links:
+        await db.execute(insert(CampaignLink), new_links)
+        _links.pop(campaign.id, None)
+
+    prefix = f"{base_url()}/c/{{{{ {TOKEN_VARIABLE} }}}}/"
+    return _HREF.sub(
+        lambda match: f"{match.group(1)}{match.group(2)}{prefix}{positions[match.group(3)]}{match.group(2)}",
+        campaign.body,
+    )
+
+
+def add_open_pixel(body: str, recipient_token: str) -> str:
+    pixel = f'<img src="{base_url()}/o/{recipient_token}.gif" width="1" height="1" alt="" style="display:none">'
+    index = body.rfind("</body>")
+    if index == -1:
+        return body + pixel
+    return body[:index] + pixel + body[index:]
+
+
+async def _load_links(session_factory, campaign_id: int) -> List[Optional[str]]:
+    async with session_factory() as db:
+        result = await db.execute(
+            select(CampaignLink.position, CampaignLink.url).filter(CampaignLink.campaign_id == campaign_id)
+        )
+        rows = result.all()
+    urls = [None] * (max((row.position for row in rows), default=-1) + 1)
+    for row in rows:
+        urls[row.position] = row.url
+    return urls
+
+
+async def link_url(campaign_id: int, position: int) -> Optional[str]:
+    """Target of a tracked link, loading the campaign's link table once per worker.
+
+    A position the cached (or replica) table doesn't have yet, because a
+    re-send in another worker added links or the replica lags, is looked up
+    again on the primary before giving up.
+    """
+    if position < 0:
+        return None
+    urls = _links.get(campaign_id)
+    if urls is None:
+        urls = await _load_links(ReadSessionLocal, campaign_id)
+    if position >= len(urls) or urls[position] is None:
+        urls = await _load_links(AsyncSessionLocal, campaign_id)
+        if position >= len(urls):
+            return None
+    if urls:
+        _links[campaign_id] = urls
+        _links.move_to_end(campaign_id)
+        while len(_links) > MAX_CACHED_CAMPAIGNS:
+            _links.popitem(last=False)
+    return urls[position]
+
+
+async def record(event: str, campaign_id: int, recipient_id: int, link_position: Optional[int] = None) -> None:
+    row = {
+        "campaign_id": campaign_id,
+        "recipient_id": recipient_id,
+        "event": event,
+        "link_position": link_position,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    if not _writer.running:
+        await _write([row])
+        outcome = "queued"
+    else:
+        outcome = "queued" if _writer.offer(row) else "dropped"
+    metrics.TRACKING_EVENTS.labels(event, outcome).inc()
+
+
+async def _write(rows: List[dict]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(TrackingEvent).values(rows))
+            await db.commit()
+    except Exception:
+        logger.exception("Failed to write %d tracking events", len(rows))
+
+
+_writer = BatchWriter(
+    _write,
+    settings.TRACKING_EVENTS_BATCH_SIZE,
+    settings.TRACKING_EVENTS_FLUSH_SECONDS,
+    settings.TRACKING_EVENTS_QUEUE_SIZE,
+)
+# Long-running loop batching tracking hits into multi-row inserts
+run_writer = _writer.run
+
+
+async def engagement(db: AsyncSession, campaign_id: int) -> Dict:
+    """Open and click totals for a campaign, per link as well"""
+    result = await db.execute(
+        select(func.count(Recipient.id)).filter(Recipient.campaign_id == campaign_id, Recipient.status == "sent")
+    )
+    sent = result.scalar() or 0
+
+    totals = {"open": (0, 0), "click": (0, 0)}
+    result = await db.execute(
+        select(TrackingEvent.event, func.count(TrackingEvent.id), func.count(distinct(TrackingEvent.recipient_id)))
+        .filter(TrackingEvent.campaign_id == campaign_id)
+        .group_by(TrackingEvent.event)
+    )
+    for event, count, unique in result:
+        totals[event] = (count, unique)
+
+    result = await db.execute(
+        select(
+            CampaignLink.position,
+            CampaignLink.url,
+            func.count(TrackingEvent.id).label("clicks"),
+            func.count(distinct(TrackingEvent.recipient_id)).label("unique_clicks"),
+        )
+        .outerjoin(
+            TrackingEvent,
+            (TrackingEvent.campaign_id == CampaignLink.campaign_id)
+            & (TrackingEvent.event == "click")
+            & (TrackingEvent.link_position == CampaignLink.position),
+        )
+        .filter(CampaignLink.campaign_id == campaign_id)
+        .group_by(CampaignLink.position, CampaignLink.url)
+        .order_by(CampaignLink.position)
+    )
+    return {
+        "sent": sent,
+        "opens": totals["open"][0],
+        "unique_opens": totals["open"][1],
+        "clicks": totals["click"][0],
+        "unique_clicks": totals["click"][1],
+        "links": [dict(row._mapping) for row in result],
+    }
@@ -0,0 +1,93 @@
+"""
+One-click unsubscribe.
+
+Every campaign email carries a List-Unsubscribe URL (and an
+`unsubscribe_url` template variable) whose token encodes the sending user,
+the campaign and the recipient address, signed with SECRET_KEY. Verifying
+it needs no database lookup. Accepted unsubscribes are queued for a
+BatchWriter that adds them to the suppression list per user in batches.
+Unlike tracking hits they are never dropped: a full queue makes the request
+wait, and a batch that fails to store is retried with backoff until it
+succeeds (the inserts are idempotent). Without a running writer
+(serverless), the request stores its unsubscribe itself and fails if that
+fails, so nobody is shown a confirmation for an unsubscribe that was lost.
+"""
+import asyncio
+import base64
+import binascii
+import logging
+from collections import defaultdict
+from typing import List, Optional, Tuple
+from app.core import metrics, signing
+from app.core.batch_writer import BatchWriter
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services import suppression_service
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_email(email: str) -> str:
+    return base64.urlsafe_b64encode(email.encode()).rstrip(b"=").decode()
+
+
+def _decode_email(value: str) -> str:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+
+
+def unsubscribe_url(user_id: int, campaign_id: int, email: str) -> str:
+    token = signing.sign("unsubscribe", user_id, campaign_id, _encode_email(suppression_service.normalize(email)))
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}{settings.API_V1_STR}/unsubscribe/{token}"
+
+
+def parse_token(token: str) -> Optional[Tuple[int, int, str]]:
+    """(user_id, campaign_id, email) of a valid token, else None"""
+    parts = signing.verify("unsubscribe", token)
+    if not parts or len(parts) != 3:
+        return None
+    try:
+        return int(parts[0]), int(parts[1]), _decode_email(parts[2])
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+async def unsubscribe(user_id: int, campaign_id: int, email: str) -> None:
+    row = {"user_id": user_id, "campaign_id": campaign_id, "email": email}
+    if _writer.running:
+        await _writer.put(row)
+    else:
+        await _store([row])
+    metrics.UNSUBSCRIBES.inc()
+
+
+async def _store(rows: List[dict]) -> None:
+    emails_by_user = defaultdict(set)
+    for row in rows:
+        emails_by_user[row["user_id"]].add(row["email"])
+    async with AsyncSessionLocal() as db:
+        for user_id, emails in emails_by_user.items():
+            await suppression_service.add_suppressions(db, user_id, emails, "unsubscribe")
+        await db.commit()
+
+
+async def _write(rows: List[dict]) -> None:
+    """Store a queued batch, retrying until it succeeds; its senders were already told it worked"""
+    delay = settings.UNSUBSCRIBE_RETRY_SECONDS
+    while True:
+        try:
+            await _store(rows)
+            return
+        except Exception:
+            logger.exception("Failed to store %d unsubscribes; retrying in %gs", len(rows), delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.UNSUBSCRIBE_RETRY_MAX_SECONDS)
+
+
+_writer = BatchWriter(
+    _write,
+    settings.UNSUBSCRIBE_BATCH_SIZE,
+    settings.UNSUBSCRIBE_FLUSH_SECONDS,
+    settings.UNSUBSCRIBE_QUEUE_SIZE,
+)
+# Long-running loop coalescing unsubscribes into per-user suppression inserts
+run_writer = _writer.run
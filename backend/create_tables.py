@@ -1,13 +1,12 @@
 """Create all tables in Supabase database"""
 import asyncio
-from app.core.database import engine, Base
-from app.models import user, otp, smtp, campaign, template, recipient, attachment
+from app.core.database import engine
+from app.migrations.runner import run_migrations
 
 async def create_tables():
     print("Connecting to Supabase...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ All tables created in Supabase!")
+    version = await run_migrations(engine)
+    print(f"✅ All tables created in Supabase (schema version {version})!")
 
 if __name__ == "__main__":
     asyncio.run(create_tables())
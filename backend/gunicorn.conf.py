@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+Workers share Prometheus samples through PROMETHEUS_MULTIPROC_DIR so that
+/metrics reports the whole server rather than the worker that answered.
+"""
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/novamailer-metrics")
+
+
+def on_starting(server):
+    # Stale files from a previous run would be aggregated into new scrapes
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop live gauges (in-flight requests, pool usage) of workers that exited
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
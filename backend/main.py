@@ -1,19 +1,54 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, campaigns, templates, smtp, uploads, stats
+from app.routers import auth, campaigns, templates, smtp, uploads, stats, suppressions, tracking, unsubscribe
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core import metrics, query_stats, replica
+from app.core.compression import CompressionMiddleware
+from app.core.responses import ORJSONResponse
+from app.core.logging import setup_logging, shutdown_logging
+from app.core import tasks
+from app.core.database import engine, read_engine, pool_status
+from app.migrations.runner import run_migrations
+from app.services import delivery_events, otp_service, outbox, render_pool, upload_service
+from app.services import tracking as tracking_service, unsubscribe as unsubscribe_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup - create tables only if they don't exist (checkfirst=True)
-    async with engine.begin() as conn:
-        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, checkfirst=True))
+    setup_logging()
+    # Startup - one schema version query, migrating only when behind
+    if settings.AUTO_MIGRATE:
+        await run_migrations(engine)
+    tasks.start_periodic(
+        "otp-purge",
+        settings.OTP_PURGE_INTERVAL_SECONDS,
+        lambda: otp_service.purge_expired_otps(settings.OTP_PURGE_BATCH_SIZE),
+    )
+    # Hourly is plenty: abandoned uploads only cost disk space
+    tasks.start_periodic("upload-purge", 3600, upload_service.purge_abandoned)
+    # Ingests interrupted by a worker restart continue where they stopped
+    tasks.start_periodic("upload-resume", 300, upload_service.resume_stalled)
+    tasks.start_periodic(
+        "outbox-purge",
+        settings.OUTBOX_PURGE_INTERVAL_SECONDS,
+        lambda: outbox.purge_resolved(settings.OTP_PURGE_BATCH_SIZE),
+    )
+    tasks.start_background("outbox-dispatcher", outbox.run_dispatcher)
+    tasks.start_background("delivery-event-writer", delivery_events.run_writer)
+    tasks.start_background("tracking-event-writer", tracking_service.run_writer)
+    tasks.start_background("unsubscribe-writer", unsubscribe_service.run_writer)
     yield
-    # Shutdown (if needed)
+    # Shutdown - stop background tasks (buffered delivery events are flushed) and render workers, then flush log records
+    await tasks.stop_all()
+    render_pool.shutdown()
+    shutdown_logging()
 
-app = FastAPI(title="NovaMailer API", version="1.0.0", lifespan=lifespan)
+app = FastAPI(title="NovaMailer API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+app.add_middleware(replica.ReadYourWritesMiddleware)
+app.add_middleware(query_stats.QueryStatsMiddleware)
+app.add_middleware(metrics.PrometheusMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -30,6 +65,9 @@ app.include_router(templates.router, prefix=f"{settings.API_V1_STR}/templates",
 app.include_router(smtp.router, prefix=f"{settings.API_V1_STR}/smtp", tags=["smtp"])
 app.include_router(uploads.router, prefix=f"{settings.API_V1_STR}/uploads", tags=["uploads"])
 app.include_router(stats.router, prefix=f"{settings.API_V1_STR}/stats", tags=["stats"])
+app.include_router(suppressions.router, prefix=f"{settings.API_V1_STR}/suppressions", tags=["suppressions"])
+app.include_router(tracking.router, prefix=f"{settings.API_V1_STR}/t", tags=["tracking"])
+app.include_router(unsubscribe.router, prefix=f"{settings.API_V1_STR}/unsubscribe", tags=["unsubscribe"])
 
 @app.get("/")
 async def root():
@@ -38,3 +76,15 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+@app.get("/health/db")
+async def database_health():
+    status = {"status": "ok", "pool": pool_status()}
+    if read_engine is not engine:
+        status["read_pool"] = pool_status(read_engine)
+    return status
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
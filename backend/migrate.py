@@ -0,0 +1,22 @@
+"""
+Apply pending schema migrations.
+
+Usage:
+    python migrate.py           # migrate to the latest version
+    python migrate.py --status  # print the current and latest versions
+"""
+import asyncio
+import sys
+from app.core.database import engine
+from app.migrations.runner import LATEST_VERSION, current_version, run_migrations
+
+async def main(argv):
+    if "--status" in argv:
+        version = await current_version(engine)
+        print(f"Schema version {version} (latest {LATEST_VERSION})")
+        return
+    version = await run_migrations(engine)
+    print(f"Schema is at version {version}")
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""
+Test setup: one throwaway SQLite database per session, migrated by the app
+lifespan, and templates rendered inline (no render processes).
+
+Run from backend/:  python -m pytest
+"""
+import os
+import tempfile
+import uuid
+
+_tmp = tempfile.mkdtemp(prefix="novamailer-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["TEMPLATE_RENDER_WORKERS"] = "0"
+os.environ["LOG_JSON"] = "false"
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def login(app_client, run):
+    """Register and verify a fresh user; returns its Authorization header"""
+    from sqlalchemy import update
+    from app.core.database import AsyncSessionLocal
+    from app.models.user import User
+
+    def login():
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        response = app_client.post(
+            "/api/v1/auth/register", json={"email": email, "password": "pw"}, headers={"Authorization": ""}
+        )
+        assert response.status_code == 200, response.text
+
+        async def verify():
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(User).where(User.email == email).values(email_verified=True))
+                await db.commit()
+
+        run(verify)
+        response = app_client.post("/api/v1/auth/login", data={"username": email, "password": "pw"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def client(app_client, login):
+    """The app client, authenticated as a fresh verified user"""
+    app_client.headers.update(login())
+    yield app_client
+    app_client.headers.pop("Authorization", None)
+
+
+@pytest.fixture(scope="session")
+def run(app_client):
+    """Call an async function on the app's event loop, where the engine's connections live"""
+    return app_client.portal.call
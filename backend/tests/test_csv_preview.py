@@ -0,0 +1,47 @@
+import io
+import pandas as pd
+import pytest
+from app.services import csv_service
+from app.services.csv_service import _RecordCounter
+
+CASES = [
+    b"email\na@x.com\nb@x.com\n\n\n",
+    b"email\na@x.com\nb@x.com",
+    b"\n\nemail\n\na@x.com\n  \n\t\r\nb@x.com\n \r\n",
+    b"email\r\na@x.com\r\n\r\nb@x.com\r\n",
+    b'email,note\na@x.com,"line one\n\nline two"\nb@x.com,""\n\n',
+    b'email,note\na@x.com,"say ""hi""\nthere"\nb@x.com,"\n"\n',
+    b'email,note\na@x.com,x\n"b@x.com",\n"c@x.com"',
+]
+
+
+def _records(data: bytes) -> int:
+    return len(pd.read_csv(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("data", CASES)
+def test_record_counter_matches_pandas_at_every_block_boundary(data):
+    expected = _records(data) + 1
+    for split in range(len(data) + 1):
+        counter = _RecordCounter()
+        counter.feed(data[:split])
+        counter.feed(data[split:])
+        assert counter.lines == expected, (data, split)
+    # One byte at a time
+    counter = _RecordCounter()
+    for i in range(len(data)):
+        counter.feed(data[i:i + 1])
+    assert counter.lines == expected
+
+
+def test_preview_count_ignores_blank_and_trailing_lines(client, monkeypatch):
+    monkeypatch.setattr(csv_service, "PREVIEW_BLOCK_BYTES", 16)
+    data = b"email,note\n" + b"".join(b'r%d@x.com,"a\n\nb"\n\n' % i for i in range(20)) + b"\n \n\n"
+    response = client.post(
+        "/api/v1/uploads/csv/preview", params={"rows": 2}, files={"file": ("r.csv", data, "text/csv")}
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["count"] == 20 and not body["estimated"]
+    assert [row["email"] for row in body["preview"]] == ["r0@x.com", "r1@x.com"]
+    assert body["preview"][0]["note"] == "a\n\nb"
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import event
+from app.core.database import engine
+
+
+@pytest.fixture
+def statements():
+    """SQL statements executed while the test runs"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+def _revalidate(client, url):
+    """GET url, then GET it again with the returned ETag"""
+    first = client.get(url)
+    assert first.status_code == 200, first.text
+    etag = first.headers["etag"]
+    return etag, client.get(url, headers={"If-None-Match": etag})
+
+
+def _new_campaign(client):
+    return client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+
+
+def test_template_revalidation_does_not_load_the_body(client, statements):
+    template_id = client.post("/api/v1/templates/", json={"name": "t", "content": "<p>" + "x" * 1000}).json()["id"]
+    etag, again = _revalidate(client, f"/api/v1/templates/{template_id}")
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+
+    statements.clear()
+    assert client.get(f"/api/v1/templates/{template_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert not any("templates.content" in s for s in statements), statements
+
+
+def test_template_etag_changes_on_update(client):
+    template_id = client.post("/api/v1/templates/", json={"name": "t", "content": "one"}).json()["id"]
+    etag, _ = _revalidate(client, f"/api/v1/templates/{template_id}")
+    client.put(f"/api/v1/templates/{template_id}", json={"name": "t", "content": "two"})
+    response = client.get(f"/api/v1/templates/{template_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["content"] == "two" and response.headers["etag"] != etag
+
+
+def test_other_users_template_is_not_found_even_with_an_etag(client, login):
+    template_id = client.post("/api/v1/templates/", json={"name": "t", "content": "c"}).json()["id"]
+    etag = client.get(f"/api/v1/templates/{template_id}").headers["etag"]
+    response = client.get(f"/api/v1/templates/{template_id}", headers={**login(), "If-None-Match": etag})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("url", ["/api/v1/campaigns/", "/api/v1/templates/"])
+def test_list_etag_changes_on_insert(client, url):
+    _new_campaign(client)
+    client.post("/api/v1/templates/", json={"name": "t", "content": "c"})
+    etag, again = _revalidate(client, url)
+    assert again.status_code == 304
+    _new_campaign(client)
+    client.post("/api/v1/templates/", json={"name": "t", "content": "c"})
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_details_etag_changes_when_recipients_change(client):
+    campaign_id = _new_campaign(client)
+    url = f"/api/v1/campaigns/{campaign_id}/details"
+    etag, again = _revalidate(client, url)
+    assert again.status_code == 304
+    client.post(f"/api/v1/campaigns/{campaign_id}/upload-csv", files={"file": ("r.csv", "email\na@example.com\n")})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["stats"]["total_recipients"] == 1
+
+
+@pytest.mark.parametrize("header", ["{etag}", "{strong}", '"other", {etag}', "*"])
+def test_if_none_match_forms(client, header):
+    campaign_id = _new_campaign(client)
+    url = f"/api/v1/campaigns/{campaign_id}/details"
+    etag = client.get(url).headers["etag"]
+    value = header.format(etag=etag, strong=etag.removeprefix("W/"))
+    assert client.get(url, headers={"If-None-Match": value}).status_code == 304
+
+
+def test_stale_etag_gets_the_full_response(client):
+    campaign_id = _new_campaign(client)
+    response = client.get(f"/api/v1/campaigns/{campaign_id}/details", headers={"If-None-Match": 'W/"stale"'})
+    assert response.status_code == 200 and response.json()["id"] == campaign_id
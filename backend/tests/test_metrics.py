@@ -0,0 +1,84 @@
+import asyncio
+from prometheus_client import REGISTRY
+from app.core import metrics
+from app.services.relay_pool import RelayPool
+
+RELAY = {"host": "smtp.example.com", "port": 587, "username": "u", "password": "p", "from_email": "me@example.com"}
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_latency_is_labelled_by_route_template(client):
+    campaign_id = client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+    assert client.get(f"/api/v1/campaigns/{campaign_id}").status_code == 200
+    assert client.get("/api/v1/campaigns/999999999").status_code == 404
+
+    body = client.get("/metrics").text
+    assert 'route="/api/v1/campaigns/{campaign_id}",status="200"' in body
+    assert 'route="/api/v1/campaigns/{campaign_id}",status="404"' in body
+    assert f"/api/v1/campaigns/{campaign_id}\"" not in body
+    # /metrics itself is not recorded
+    assert 'route="/metrics"' not in body
+
+
+def test_unmatched_paths_share_one_label(app_client):
+    app_client.get("/no/such/path/123")
+    assert 'method="GET",route="unmatched",status="404"' in app_client.get("/metrics").text
+
+
+def test_in_flight_gauge_covers_the_request():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(_sample("novamailer_http_requests_in_flight", method="PATCH"))
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "PATCH", "path": "/x", "headers": []}
+    before = _sample("novamailer_http_requests_in_flight", method="PATCH")
+    asyncio.run(metrics.PrometheusMiddleware(app)(scope, None, send))
+    assert seen == [before + 1]
+    assert _sample("novamailer_http_requests_in_flight", method="PATCH") == before
+
+
+def test_in_flight_gauge_is_released_when_the_app_raises():
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    scope = {"type": "http", "method": "PATCH", "path": "/x", "headers": []}
+    before = _sample("novamailer_http_requests_in_flight", method="PATCH")
+    try:
+        asyncio.run(metrics.PrometheusMiddleware(app)(scope, None, None))
+    except RuntimeError:
+        pass
+    assert _sample("novamailer_http_requests_in_flight", method="PATCH") == before
+    assert _sample("novamailer_http_request_duration_seconds_count", method="PATCH", route="unmatched", status="500") >= 1
+
+
+def test_send_counts_emails_by_status(client, monkeypatch):
+    async def fake_send(self, to_email, *args, **kwargs):
+        if to_email.startswith("bounce"):
+            raise RuntimeError("550 mailbox unavailable")
+        return self.relays[0]
+
+    monkeypatch.setattr(RelayPool, "send", fake_send)
+    assert client.post("/api/v1/smtp/relays", json=RELAY).status_code == 200
+    campaign_id = client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+    csv = "email\na@example.com\nb@example.com\nbounce@example.com\n"
+    client.post(f"/api/v1/campaigns/{campaign_id}/upload-csv", files={"file": ("r.csv", csv)})
+    # Suppressed after upload, so it is skipped at send time
+    client.post("/api/v1/suppressions/bulk", json={"emails": ["b@example.com"]})
+
+    before = {status: _sample("novamailer_emails_total", status=status) for status in ("sent", "failed", "suppressed")}
+    response = client.post(f"/api/v1/campaigns/{campaign_id}/send")
+    assert response.status_code == 200, response.text
+    assert response.json()["sent"] == 1
+
+    after = {status: _sample("novamailer_emails_total", status=status) for status in before}
+    assert {status: after[status] - before[status] for status in before} == {"sent": 1, "failed": 1, "suppressed": 1}
+    assert "novamailer_emails_total{status=\"sent\"}" in client.get("/metrics").text
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import func, inspect, select, text
+from app.core.database import Base, _create_engine
+from app.migrations.runner import LATEST_VERSION, current_version, run_migrations, schema_migrations
+
+# The schema create_all produced before versioned migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, email VARCHAR(255) NOT NULL, hashed_password VARCHAR(255) NOT NULL,
+    is_active BOOLEAN, full_name VARCHAR(255), email_verified BOOLEAN, two_factor_enabled BOOLEAN,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE smtp_configs (
+    id INTEGER NOT NULL, host VARCHAR(255) NOT NULL, port INTEGER NOT NULL, username VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL, from_email VARCHAR(255) NOT NULL, user_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_smtp_configs_id ON smtp_configs (id);
+CREATE TABLE campaigns (
+    id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, subject VARCHAR(500) NOT NULL, body TEXT NOT NULL,
+    created_at DATETIME, status VARCHAR(50), user_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_campaigns_id ON campaigns (id);
+CREATE TABLE templates (
+    id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, content TEXT NOT NULL, user_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_templates_id ON templates (id);
+CREATE TABLE otps (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, code VARCHAR(6) NOT NULL, purpose VARCHAR(50) NOT NULL,
+    expires_at DATETIME NOT NULL, used BOOLEAN, created_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_otps_id ON otps (id);
+CREATE TABLE recipients (
+    id INTEGER NOT NULL, email VARCHAR(255) NOT NULL, data JSON, status VARCHAR(50), campaign_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(campaign_id) REFERENCES campaigns (id)
+);
+CREATE INDEX ix_recipients_id ON recipients (id);
+CREATE TABLE attachments (
+    id INTEGER NOT NULL, filename VARCHAR(255) NOT NULL, content_type VARCHAR(100) NOT NULL,
+    file_data BLOB NOT NULL, file_size INTEGER NOT NULL, campaign_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(campaign_id) REFERENCES campaigns (id)
+);
+CREATE INDEX ix_attachments_id ON attachments (id);
+"""
+
+RECIPIENTS = [
+    (1, "a@example.com", {"name": "Ann"}, "pending"),
+    (2, " A@Example.com", {"name": "Ann again"}, "sent"),
+    (3, "b@example.com", {"city": "Oslo", "name": "Bo"}, "pending"),
+    (4, "c@example.com", None, "failed"),
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db_engine = _create_engine(f"sqlite+aiosqlite:///{tmp_path}/baseline.db")
+    yield db_engine
+    asyncio.run(db_engine.dispose())
+
+
+async def _seed_baseline(db_engine):
+    async with db_engine.begin() as conn:
+        for statement in BASELINE_SCHEMA.split(";"):
+            if statement.strip():
+                await conn.execute(text(statement))
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) VALUES (1, 'owner@example.com', 'x', 1)"
+        ))
+        await conn.execute(text(
+            "INSERT INTO campaigns (id, name, subject, body, status, user_id) VALUES (1, 'n', 's', 'b', 'draft', 1)"
+        ))
+        await conn.execute(text("INSERT INTO templates (id, name, content, user_id) VALUES (1, 't', 'c', 1)"))
+        for rid, email, data, status in RECIPIENTS:
+            await conn.execute(
+                text("INSERT INTO recipients (id, email, data, status, campaign_id) VALUES (:id, :email, :data, :status, 1)"),
+                {"id": rid, "email": email, "data": json.dumps(data) if data else None, "status": status},
+            )
+
+
+def _live_schema(conn):
+    inspector = inspect(conn)
+    columns = {t: {c["name"] for c in inspector.get_columns(t)} for t in inspector.get_table_names()}
+    return columns, {i["name"] for i in inspector.get_indexes("recipients")}
+
+
+def test_chain_upgrades_a_baseline_database(engine):
+    async def scenario():
+        await _seed_baseline(engine)
+        assert await current_version(engine) == 0
+        assert await run_migrations(engine) == LATEST_VERSION
+
+        async with engine.connect() as conn:
+            applied = (await conn.execute(select(schema_migrations.c.version))).scalars().all()
+            columns, indexes = await conn.run_sync(_live_schema)
+            campaign = (await conn.execute(text("SELECT version, recipient_columns FROM campaigns"))).one()
+            template_version = (await conn.execute(text("SELECT version FROM templates"))).scalar()
+            recipients = (await conn.execute(text("SELECT id, email, status, fields FROM recipients ORDER BY id"))).all()
+            # Every mapped table and column is readable through the models
+            for table in Base.metadata.sorted_tables:
+                await conn.execute(select(table).limit(1))
+        return applied, columns, indexes, campaign, template_version, recipients
+
+    applied, columns, indexes, campaign, template_version, recipients = asyncio.run(scenario())
+    assert applied == list(range(1, LATEST_VERSION + 1))
+    for table in Base.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= columns[table.name], table.name
+    assert "data" not in columns["recipients"]
+    assert "uq_recipients_campaign_email" in indexes
+
+    assert campaign.version == 1 and template_version == 1
+    assert json.loads(campaign.recipient_columns) == ["name", "city"]
+    # The duplicate address collapses onto the row that was already sent
+    assert [(r.id, r.email, r.status) for r in recipients] == [
+        (2, "a@example.com", "sent"),
+        (3, "b@example.com", "pending"),
+        (4, "c@example.com", "failed"),
+    ]
+    assert [json.loads(r.fields) if r.fields else None for r in recipients] == [["Ann again"], ["Bo", "Oslo"], None]
+
+
+def test_up_to_date_database_is_left_alone(engine):
+    async def scenario():
+        await _seed_baseline(engine)
+        await run_migrations(engine)
+        async with engine.connect() as conn:
+            before = (await conn.execute(select(func.count()).select_from(schema_migrations))).scalar()
+        version = await run_migrations(engine)
+        async with engine.connect() as conn:
+            after = (await conn.execute(select(func.count()).select_from(schema_migrations))).scalar()
+        return version, before, after
+
+    assert asyncio.run(scenario()) == (LATEST_VERSION, LATEST_VERSION, LATEST_VERSION)
@@ -0,0 +1,207 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy import select, update
+from starlette.requests import Request
+from app.core import tasks
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.outbox import OutboxEmail
+from app.services import email as email_service, outbox
+
+RELAY = {"host": "smtp.example.com", "port": 587, "username": "u", "password": "p", "from_email": "me@example.com"}
+
+
+@pytest.fixture
+def dispatch(run):
+    """dispatch_pending, with the app's own dispatcher stopped so it can't race the test"""
+
+    async def stop():
+        for task in [t for t in tasks._tasks if t.get_name() == "outbox-dispatcher"]:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            tasks._tasks.remove(task)
+
+    async def start():
+        tasks.start_background("outbox-dispatcher", outbox.run_dispatcher)
+
+    run(stop)
+    yield outbox.dispatch_pending
+    run(start)
+
+
+@pytest.fixture
+def relay_id(client):
+    return client.post("/api/v1/smtp/relays", json=RELAY).json()["id"]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Fake SMTP: records recipients, refuses addresses starting with 'bounce'"""
+    delivered = []
+
+    async def send(smtp_config, message):
+        if message["To"].startswith("bounce"):
+            raise ConnectionError("relay refused")
+        delivered.append(message["To"])
+        return "250 OK"
+
+    monkeypatch.setattr(email_service.smtp_pool, "send", send)
+    return delivered
+
+
+def _queue(run, relay_id, *addresses):
+    async def queue():
+        async with AsyncSessionLocal() as db:
+            entries = [outbox.enqueue(db, "test", address, "s", "b", relay_id) for address in addresses]
+            await db.commit()
+            return [entry.id for entry in entries]
+
+    return run(queue)
+
+
+def _entries(run, ids):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(OutboxEmail).where(OutboxEmail.id.in_(ids)).order_by(OutboxEmail.id))
+            return list(result.scalars())
+
+    return run(load)
+
+
+def test_concurrent_claims_never_share_a_row(run, relay_id, dispatch):
+    ids = _queue(run, relay_id, *(f"c{i}@example.com" for i in range(6)))
+
+    async def claim_twice():
+        async def claim():
+            async with AsyncSessionLocal() as db:
+                return [entry.id for entry in await outbox._claim(db, ids)]
+
+        return await asyncio.gather(claim(), claim())
+
+    first, second = run(claim_twice)
+    assert not set(first) & set(second)
+    assert sorted(first + second) == ids
+    # Leased rows aren't due until the lease runs out
+    assert run(claim_twice) == [[], []]
+    assert all(entry.attempts == 1 for entry in _entries(run, ids))
+
+
+def test_dispatch_sends_only_the_requested_entries(run, relay_id, dispatch, smtp):
+    wanted, other = _queue(run, relay_id, "wanted@example.com", "other@example.com")
+    assert run(dispatch, [wanted]) == 1
+    assert smtp == ["wanted@example.com"]
+    sent, pending = _entries(run, [wanted, other])
+    assert sent.status == "sent" and sent.sent_at is not None and sent.last_error is None
+    assert pending.status == "pending" and pending.attempts == 0
+
+
+def test_failures_back_off_then_give_up(run, relay_id, dispatch, smtp, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    [entry_id] = _queue(run, relay_id, "bounce@example.com")
+
+    assert run(dispatch, [entry_id]) == 1
+    [entry] = _entries(run, [entry_id])
+    assert (entry.status, entry.attempts) == ("pending", 1)
+    assert "relay refused" in entry.last_error
+    assert entry.next_attempt_at - outbox._utcnow() > timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS - 5)
+    # Not due again until the backoff has passed
+    assert run(dispatch, [entry_id]) == 0
+
+    async def make_due():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(OutboxEmail).where(OutboxEmail.id == entry_id).values(next_attempt_at=outbox._utcnow()))
+            await db.commit()
+
+    run(make_due)
+    assert run(dispatch, [entry_id]) == 1
+    [entry] = _entries(run, [entry_id])
+    assert (entry.status, entry.attempts) == ("failed", 2)
+
+
+def test_purge_deletes_only_old_resolved_rows(run, relay_id, dispatch):
+    old_sent, old_pending, new_sent = _queue(run, relay_id, "a@example.com", "b@example.com", "c@example.com")
+    long_ago = outbox._utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS + 1)
+
+    async def age():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(OutboxEmail).where(OutboxEmail.id.in_([old_sent, new_sent])).values(status="sent"))
+            await db.execute(
+                update(OutboxEmail).where(OutboxEmail.id.in_([old_sent, old_pending])).values(created_at=long_ago)
+            )
+            await db.commit()
+
+    run(age)
+    run(outbox.purge_resolved, 1)
+    assert [entry.id for entry in _entries(run, [old_sent, old_pending, new_sent])] == [old_pending, new_sent]
+
+
+def test_kick_wakes_the_in_process_dispatcher(monkeypatch):
+    wakeup = asyncio.Event()
+    monkeypatch.setattr(outbox, "_wakeup", wakeup)
+    background = BackgroundTasks()
+    outbox.kick(background, OutboxEmail(id=1))
+    assert wakeup.is_set() and not background.tasks
+
+
+def test_kick_without_dispatcher_delivers_after_the_response(monkeypatch):
+    monkeypatch.setattr(outbox, "_wakeup", None)
+    monkeypatch.setattr(settings, "CRON_SECRET", "")
+    background = BackgroundTasks()
+    outbox.kick(background, OutboxEmail(id=7))
+    [task] = background.tasks
+    assert task.func is outbox.deliver_now and task.args == ([7],)
+
+    # With a cron dispatch configured, requests only queue
+    monkeypatch.setattr(settings, "CRON_SECRET", "s3cret")
+    background = BackgroundTasks()
+    outbox.kick(background, OutboxEmail(id=7))
+    assert not background.tasks
+
+
+def test_deliver_now_sends_and_closes_smtp_sessions(run, relay_id, dispatch, smtp, monkeypatch):
+    closed = []
+
+    async def close_all():
+        closed.append(True)
+
+    monkeypatch.setattr(email_service.smtp_pool, "close_all", close_all)
+    [entry_id] = _queue(run, relay_id, "now@example.com")
+    assert run(outbox.deliver_now, [entry_id]) == 1
+    assert smtp == ["now@example.com"] and closed == [True]
+
+
+def test_registration_without_dispatcher_sends_its_otp(app_client, relay_id, dispatch, smtp, monkeypatch):
+    monkeypatch.setattr(settings, "CRON_SECRET", "")
+    response = app_client.post(
+        "/api/v1/auth/register", json={"email": "serverless@example.com", "password": "pw"}, headers={"Authorization": ""}
+    )
+    assert response.status_code == 200
+    assert smtp == ["serverless@example.com"]
+
+
+def _cron_request(authorization=None):
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "method": "GET", "path": "/api/cron/outbox", "headers": headers})
+
+
+def test_cron_endpoint_requires_the_secret(run, monkeypatch):
+    from api import index
+
+    monkeypatch.setattr(settings, "CRON_SECRET", "")
+    assert run(index.dispatch_outbox, _cron_request("Bearer ")).status_code == 404
+    monkeypatch.setattr(settings, "CRON_SECRET", "s3cret")
+    assert run(index.dispatch_outbox, _cron_request()).status_code == 404
+    assert run(index.dispatch_outbox, _cron_request("Bearer wrong")).status_code == 404
+
+
+def test_cron_endpoint_dispatches_queued_mail(run, relay_id, dispatch, smtp, monkeypatch):
+    from api import index
+
+    monkeypatch.setattr(settings, "CRON_SECRET", "s3cret")
+    ids = _queue(run, relay_id, "cron1@example.com", "cron2@example.com")
+    response = run(index.dispatch_outbox, _cron_request("Bearer s3cret"))
+    assert response["attempted"] >= 2
+    assert {"cron1@example.com", "cron2@example.com"} <= set(smtp)
+    assert [entry.status for entry in _entries(run, ids)] == ["sent", "sent"]
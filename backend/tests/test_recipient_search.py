@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import update
+from app.core.database import AsyncSessionLocal
+from app.models.recipient import Recipient
+
+
+@pytest.fixture
+def campaign(client, run):
+    """A campaign with 25 recipients; every third one marked sent"""
+    campaign_id = client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+    rows = "".join(f"user{i:02d}@example.com,N{i}\n" for i in range(24)) + "odd_%name@example.com,X\n"
+    response = client.post(
+        f"/api/v1/campaigns/{campaign_id}/upload-csv", files={"file": ("r.csv", "email,name\n" + rows)}
+    )
+    assert response.status_code == 200, response.text
+
+    async def mark_sent():
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Recipient)
+                .where(Recipient.campaign_id == campaign_id, Recipient.id % 3 == 0)
+                .values(status="sent")
+            )
+            await db.commit()
+
+    run(mark_sent)
+    return campaign_id
+
+
+def _pages(client, campaign_id, **params):
+    pages, after = [], None
+    while True:
+        query = dict(params, **({"after": after} if after is not None else {}))
+        body = client.get(f"/api/v1/campaigns/{campaign_id}/recipients", params=query).json()
+        pages.append(body["recipients"])
+        after = body["next_cursor"]
+        if after is None:
+            return pages
+
+
+def test_keyset_pages_cover_every_row_once_in_id_order(client, campaign):
+    pages = _pages(client, campaign, limit=7)
+    ids = [r["id"] for page in pages for r in page]
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert len(ids) == 25 and ids == sorted(set(ids))
+
+
+def test_exact_page_boundary_has_no_empty_trailing_page(client, campaign):
+    pages = _pages(client, campaign, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 5]
+
+
+def test_cursor_is_the_last_id_of_the_page(client, campaign):
+    body = client.get(f"/api/v1/campaigns/{campaign}/recipients", params={"limit": 3}).json()
+    assert body["next_cursor"] == body["recipients"][-1]["id"]
+
+
+def test_status_filter_pages(client, campaign):
+    sent = [r for page in _pages(client, campaign, status="sent", limit=2) for r in page]
+    assert sent and all(r["status"] == "sent" and r["id"] % 3 == 0 for r in sent)
+    both = [r for page in _pages(client, campaign, status=["sent", "pending"], limit=4) for r in page]
+    assert len(both) == 25
+
+
+def test_exact_email_is_normalized(client, campaign):
+    body = client.get(f"/api/v1/campaigns/{campaign}/recipients", params={"email": " USER07@Example.com "}).json()
+    assert [r["email"] for r in body["recipients"]] == ["user07@example.com"]
+    assert body["recipients"][0]["data"] == {"email": "user07@example.com", "name": "N7"}
+
+
+def test_prefix_search_treats_wildcards_literally(client, campaign):
+    emails = lambda prefix: [
+        r["email"] for page in _pages(client, campaign, email_prefix=prefix, limit=3) for r in page
+    ]
+    assert emails("user1") == [f"user{i}@example.com" for i in range(10, 20)]
+    assert emails("odd_%") == ["odd_%name@example.com"]
+    assert emails("user_") == []
+    assert emails("%") == []
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": 1001}, {"status": "bogus"}])
+def test_invalid_parameters(client, campaign, params):
+    assert client.get(f"/api/v1/campaigns/{campaign}/recipients", params=params).status_code == 422
+
+
+def test_other_users_campaign_is_not_found(client, campaign, login):
+    response = client.get(f"/api/v1/campaigns/{campaign}/recipients", headers=login())
+    assert response.status_code == 404
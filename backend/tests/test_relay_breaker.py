@@ -0,0 +1,77 @@
+import time
+from types import SimpleNamespace
+import pytest
+from app.core.config import settings
+from app.services import relay_pool
+from app.services.relay_pool import RelayPool, RelayState
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "SMTP_BREAKER_RESET_SECONDS", 60.0)
+    relay_pool._states.clear()
+    yield
+    relay_pool._states.clear()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    state = RelayState()
+    assert state.record_failure(0) is False
+    assert state.record_failure(1) is False
+    assert state.available(2)
+    assert state.record_failure(2) is True
+    assert not state.available(3)
+    assert not state.available(61.9)
+
+
+def test_success_resets_the_failure_count():
+    state = RelayState()
+    state.record_failure(0)
+    state.record_failure(1)
+    state.record_success()
+    assert state.record_failure(2) is False
+    assert state.available(3)
+
+
+def test_half_open_lets_one_trial_through():
+    state = RelayState()
+    for now in range(3):
+        state.record_failure(now)
+    assert state.available(62)
+    state.take(None, 62)
+    assert not state.available(62.5)  # trial in flight
+    assert state.record_failure(63) is True  # trial failed: open again
+    assert not state.available(100)
+    assert state.available(123)
+    state.take(None, 123)
+    state.record_success()
+    assert state.available(123) and state.failures == 0
+
+
+def test_token_bucket_limits_rate():
+    state = RelayState()
+    start = state.refilled_at
+    for _ in range(2):
+        assert state.wait_time(2, start) == 0
+        state.take(2, start)
+    assert state.wait_time(2, start) == pytest.approx(30)
+    assert state.wait_time(2, start + 30) == 0
+
+
+def _relay(relay_id, weight=1, rate=None, active=True):
+    return SimpleNamespace(id=relay_id, weight=weight, rate_limit_per_minute=rate, is_active=active)
+
+
+def test_weighted_round_robin_interleaves():
+    pool = RelayPool([_relay(1, weight=2), _relay(2, weight=1), _relay(3, active=False)])
+    picks = [pool._pick(set()).id for _ in range(6)]
+    assert picks == [1, 2, 1, 1, 2, 1]
+
+
+def test_open_breaker_removes_relay_from_rotation():
+    pool = RelayPool([_relay(1), _relay(2)])
+    for _ in range(3):
+        relay_pool.relay_state(1).record_failure(time.monotonic())
+    assert {pool._pick(set()).id for _ in range(4)} == {2}
+    assert pool._pick({2}) is None
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+import pytest
+from jinja2.exceptions import SecurityError
+from app.core.config import settings
+from app.services import render_pool
+from app.services.render_pool import LimitedSandbox, RenderError
+
+SPIN = "{% for i in range(100000) %}{% for j in range(100000) %}{% endfor %}{% endfor %}"
+
+
+@pytest.mark.parametrize(
+    "source",
+    ["{{ 'x' * 300000000 }}", "{{ 300000000 * 'x' }}", "{{ s * n }}", "{{ ([1] * n)|length }}", "{{ 10 ** n }}"],
+)
+def test_sandbox_refuses_oversized_operator_results(source):
+    env = LimitedSandbox(max_size=1000)
+    started = time.perf_counter()
+    # Compiling must not fold the constant expression either
+    template = env.from_string(source)
+    with pytest.raises(SecurityError):
+        template.render(s="ab", n=10 ** 8)
+    assert time.perf_counter() - started < 1
+
+
+def test_sandbox_allows_small_operator_results():
+    env = LimitedSandbox(max_size=1000)
+    assert env.from_string("{{ '-' * 10 }}{{ 2 ** 10 }}{{ [0] * 3 }}{{ 6 * 7 }}").render() == "-" * 10 + "1024[0, 0, 0]42"
+
+
+def test_inline_render_stops_a_spinning_template_at_the_cpu_limit(run, monkeypatch):
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_CPU_SECONDS", 0.3)
+    started = time.perf_counter()
+    results = run(render_pool.render_batch, {}, ["{{ name }}", SPIN], [{"name": "a"}])
+    assert isinstance(results[0], RenderError) and "0.3s CPU limit" in str(results[0])
+    assert time.perf_counter() - started < 5
+
+    results = run(render_pool.render_batch, {}, ["{{ name }}"], [{"name": "a"}, {"name": "b"}])
+    assert results == [("a",), ("b",)]
+
+
+def test_inline_render_thread_stops_after_the_deadline(run, monkeypatch):
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_CPU_SECONDS", 0)
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_TIMEOUT_SECONDS", 0.5)
+    [result] = run(render_pool.render_batch, {}, [SPIN], [{}])
+    assert str(result) == "Template rendering timed out"
+    for _ in range(50):
+        if not any(t.name == "template-render-inline" for t in threading.enumerate()):
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("inline render thread still running after the deadline")
+
+
+class _UnstartablePool:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, *args, **kwargs):
+        raise PermissionError("no /dev/shm")
+
+    def shutdown(self, *args, **kwargs):
+        pass
+
+
+def test_pool_that_cannot_start_logs_and_renders_inline(run, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_WORKERS", 2)
+    monkeypatch.setattr(render_pool, "_pool", None)
+    monkeypatch.setattr(render_pool, "_pool_unavailable", False)
+    monkeypatch.setattr(render_pool, "ProcessPoolExecutor", _UnstartablePool)
+    with caplog.at_level(logging.WARNING, logger="app.services.render_pool"):
+        results = run(render_pool.render_batch, {}, ["hi {{ name }}"], [{"name": "a"}])
+    assert results == [("hi a",)]
+    assert "can't start" in caplog.text and "no /dev/shm" in caplog.text
+    assert render_pool._pool is None and render_pool._pool_unavailable
+
+
+@pytest.fixture
+def pool(run, monkeypatch):
+    """Real render processes, shut down afterwards"""
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_WORKERS", 1)
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_MEMORY_MB", 256)
+    monkeypatch.setattr(render_pool, "_pool_unavailable", False)
+    yield
+    render_pool.shutdown(kill=True)
+
+
+def test_pool_workers_have_a_memory_limit(run, pool):
+    [result] = run(render_pool.render_batch, {}, ["{{ 'x'.center(400000000)|length }}"], [{}])
+    assert isinstance(result, RenderError) and "MemoryError" in str(result)
+    # The worker survives and keeps rendering
+    assert run(render_pool.render_batch, {}, ["ok {{ n }}"], [{"n": 1}]) == [("ok 1",)]
@@ -0,0 +1,99 @@
+import time
+import pytest
+
+BASE = "/api/v1/uploads/csv/resumable"
+CSV = ("email,name\n" + "".join(f"r{i}@example.com,N{i}\n" for i in range(300))).encode()
+
+
+@pytest.fixture
+def campaign_id(client):
+    return client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+
+
+def _start(client, campaign_id, data=CSV):
+    response = client.post(BASE, json={"campaign_id": campaign_id, "filename": "r.csv", "size": len(data)})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _put(client, upload_id, offset, data):
+    return client.put(f"{BASE}/{upload_id}", params={"offset": offset}, content=data)
+
+
+def _wait_done(client, upload_id):
+    for _ in range(100):
+        status = client.get(f"{BASE}/{upload_id}").json()
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError("ingest did not finish")
+
+
+def test_chunks_must_arrive_at_the_received_offset(client, campaign_id):
+    upload_id = _start(client, campaign_id)
+    assert _put(client, upload_id, 0, CSV[:1000]).json()["received"] == 1000
+    assert _put(client, upload_id, 0, CSV[:1000]).status_code == 409  # replayed chunk
+    assert _put(client, upload_id, 1500, CSV[1500:2000]).status_code == 409  # gap
+    status = client.get(f"{BASE}/{upload_id}").json()
+    assert status["received"] == 1000 and status["columns"] == ["email", "name"]
+    assert _put(client, upload_id, 1000, CSV[1000:]).json()["received"] == len(CSV)
+
+
+def test_chunk_past_declared_size_is_rejected(client, campaign_id):
+    upload_id = _start(client, campaign_id)
+    assert _put(client, upload_id, 0, CSV + b"extra@example.com,X\n").status_code == 400
+    assert client.get(f"{BASE}/{upload_id}").json()["received"] == 0
+
+
+def test_complete_requires_every_byte(client, campaign_id):
+    upload_id = _start(client, campaign_id)
+    _put(client, upload_id, 0, CSV[:-10])
+    assert client.post(f"{BASE}/{upload_id}/complete").status_code == 409
+    _put(client, upload_id, len(CSV) - 10, CSV[-10:])
+    assert client.post(f"{BASE}/{upload_id}/complete").status_code == 202
+    assert client.post(f"{BASE}/{upload_id}/complete").status_code == 409
+    status = _wait_done(client, upload_id)
+    assert (status["status"], status["rows_processed"], status["added"]) == ("completed", 300, 300)
+
+
+def test_header_without_email_column_fails_early(client, campaign_id):
+    data = b"name,phone\nA,1\n"
+    upload_id = _start(client, campaign_id, data)
+    assert _put(client, upload_id, 0, data).status_code == 400
+    assert client.get(f"{BASE}/{upload_id}").json()["status"] == "failed"
+
+
+def test_resumed_ingest_skips_processed_rows(client, campaign_id, run, monkeypatch):
+    from datetime import timedelta
+    from sqlalchemy import func, select, update
+    from app.core.config import settings
+    from app.core.database import AsyncSessionLocal
+    from app.models.recipient import Recipient
+    from app.models.upload import CsvUpload
+    from app.services import upload_service
+
+    monkeypatch.setattr(settings, "UPLOAD_INGEST_BATCH_ROWS", 100)
+    upload_id = _start(client, campaign_id)
+    _put(client, upload_id, 0, CSV)
+
+    async def interrupted_after_first_batch():
+        # What a worker killed after committing its first batch leaves behind
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(CsvUpload)
+                .where(CsvUpload.id == upload_id)
+                .values(status="processing", rows_processed=100, updated_at=upload_service.datetime(2000, 1, 1))
+            )
+            await db.commit()
+        return await upload_service.resume_stalled()
+
+    assert run(interrupted_after_first_batch) == 1
+    status = client.get(f"{BASE}/{upload_id}").json()
+    assert (status["status"], status["rows_processed"], status["added"]) == ("completed", 300, 200)
+
+    async def recipients():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Recipient.email).where(Recipient.campaign_id == campaign_id))
+            return sorted(result.scalars())
+
+    assert run(recipients) == sorted(f"r{i}@example.com" for i in range(100, 300))
@@ -0,0 +1,54 @@
+import pytest
+from app.core import signing
+from app.core.config import settings
+from app.services import tracking, unsubscribe
+
+
+def test_round_trip():
+    token = signing.sign("track", 12, 345)
+    assert signing.verify("track", token) == ["12", "345"]
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda t: t.replace("12.", "13.", 1),  # payload
+    lambda t: t[:-1] + ("A" if t[-1] != "A" else "B"),  # signature
+    lambda t: t.rsplit(".", 1)[0],  # signature dropped
+    lambda t: t + ".extra",
+])
+def test_tampered_tokens_are_rejected(mutate):
+    token = signing.sign("track", 12, 345)
+    assert signing.verify("track", mutate(token)) is None
+
+
+@pytest.mark.parametrize("token", ["", ".", "abc", "..", "a.b.c"])
+def test_malformed_tokens_are_rejected(token):
+    assert signing.verify("track", token) is None
+
+
+def test_purpose_separates_tokens():
+    token = signing.sign("track", 1, 2)
+    assert signing.verify("unsubscribe", token) is None
+
+
+def test_secret_key_rotation_invalidates(monkeypatch):
+    token = signing.sign("track", 1, 2)
+    monkeypatch.setattr(settings, "SECRET_KEY", "another-secret")
+    assert signing.verify("track", token) is None
+
+
+def test_tracking_token_parses_back():
+    assert tracking.parse_token(tracking.token(7, 99)) == (7, 99)
+    assert tracking.parse_token(signing.sign("track", "x", 99)) is None
+    assert tracking.parse_token(signing.sign("track", 7)) is None
+
+
+@pytest.mark.parametrize("email", ["a.b@example.com", "first.last+tag@sub.example.co.uk", "ü@例え.jp"])
+def test_unsubscribe_url_carries_email_with_dots(email):
+    url = unsubscribe.unsubscribe_url(3, 4, email)
+    token = url.rsplit("/", 1)[1]
+    assert unsubscribe.parse_token(token) == (3, 4, email)
+
+
+def test_unsubscribe_token_needs_three_parts():
+    assert unsubscribe.parse_token(signing.sign("unsubscribe", 3, 4)) is None
+    assert unsubscribe.parse_token(tracking.token(3, 4)) is None
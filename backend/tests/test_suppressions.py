@@ -0,0 +1,71 @@
+from app.core.database import AsyncSessionLocal
+from app.services import suppression_service
+from app.services.suppression_service import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(5000, 0.001)
+    members = [f"member{i}@example.com" for i in range(5000)]
+    for email in members:
+        bloom.add(email)
+    assert all(email in bloom for email in members)
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(5000, 0.01)
+    for i in range(5000):
+        bloom.add(f"member{i}@example.com")
+    false_positives = sum(f"other{i}@example.com" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
+
+
+def _user_id(client):
+    return client.get("/api/v1/auth/me").json()["id"]
+
+
+def test_suppressed_emails_confirms_bloom_hits(client, run, monkeypatch):
+    client.post("/api/v1/suppressions/bulk", json={"emails": ["Blocked@Example.com", "other@example.com"]})
+    user_id = _user_id(client)
+    # Force every address through the filter to prove hits are confirmed in the database
+    monkeypatch.setattr(BloomFilter, "__contains__", lambda self, value: True)
+
+    async def check():
+        async with AsyncSessionLocal() as db:
+            return await suppression_service.suppressed_emails(
+                db, user_id, [" blocked@example.com", "fine@example.com", "OTHER@example.com"]
+            )
+
+    assert run(check) == {"blocked@example.com", "other@example.com"}
+
+
+def test_filter_picks_up_new_and_removed_suppressions(client, run):
+    user_id = _user_id(client)
+
+    async def suppressed(*emails):
+        async with AsyncSessionLocal() as db:
+            return await suppression_service.suppressed_emails(db, user_id, emails)
+
+    assert run(suppressed, "a@example.com") == set()
+    client.post("/api/v1/suppressions/bulk", json={"emails": ["a@example.com"]})
+    assert run(suppressed, "a@example.com", "b@example.com") == {"a@example.com"}
+    client.post("/api/v1/suppressions/bulk", json={"emails": ["b@example.com"]})
+    assert run(suppressed, "a@example.com", "b@example.com") == {"a@example.com", "b@example.com"}
+    assert client.delete("/api/v1/suppressions/a@example.com").status_code == 200
+    assert run(suppressed, "a@example.com", "b@example.com") == {"b@example.com"}
+
+
+def test_adding_is_idempotent_and_counts_only_new_addresses(client):
+    first = client.post("/api/v1/suppressions/bulk", json={"emails": ["x@example.com", " X@example.com", "y@example.com"]})
+    second = client.post("/api/v1/suppressions/bulk", json={"emails": ["x@example.com", "z@example.com"]})
+    assert first.json()["added"] == 2
+    assert second.json()["added"] == 1
+
+
+def test_suppressed_recipients_are_skipped_at_upload(client):
+    client.post("/api/v1/suppressions/bulk", json={"emails": ["gone@example.com"]})
+    campaign_id = client.post("/api/v1/campaigns/", json={"name": "n", "subject": "s", "body": "b"}).json()["id"]
+    response = client.post(
+        f"/api/v1/campaigns/{campaign_id}/upload-csv",
+        files={"file": ("r.csv", "email\nGONE@example.com\nkept@example.com\n")},
+    )
+    assert response.json()["suppressed"] == 1
@@ -0,0 +1,62 @@
+import pytest
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services import suppression_service, unsubscribe
+
+
+def _user_id(client):
+    return client.get("/api/v1/auth/me").json()["id"]
+
+
+def _suppressed(run, user_id, *emails):
+    async def check():
+        async with AsyncSessionLocal() as db:
+            return await suppression_service.suppressed_emails(db, user_id, emails)
+
+    return run(check)
+
+
+@pytest.fixture
+def flaky_store(monkeypatch):
+    """add_suppressions failing the first `failures[0]` calls"""
+    real = suppression_service.add_suppressions
+    failures = [0]
+    calls = []
+
+    async def add_suppressions(*args, **kwargs):
+        calls.append(args[2])
+        if len(calls) <= failures[0]:
+            raise ConnectionError("database unavailable")
+        return await real(*args, **kwargs)
+
+    monkeypatch.setattr(suppression_service, "add_suppressions", add_suppressions)
+    return failures, calls
+
+
+def test_failed_batch_is_retried_until_stored(client, run, flaky_store, monkeypatch):
+    monkeypatch.setattr(settings, "UNSUBSCRIBE_RETRY_SECONDS", 0.01)
+    failures, calls = flaky_store
+    failures[0] = 3
+    user_id = _user_id(client)
+    rows = [{"user_id": user_id, "campaign_id": 1, "email": f"retry{i}@example.com"} for i in range(2)]
+
+    run(unsubscribe._write, rows)
+    assert len(calls) == 4
+    assert _suppressed(run, user_id, "retry0@example.com", "retry1@example.com") == {
+        "retry0@example.com",
+        "retry1@example.com",
+    }
+
+
+def test_unsubscribe_without_writer_fails_instead_of_confirming(client, run, flaky_store, monkeypatch):
+    failures, _ = flaky_store
+    failures[0] = 1
+    monkeypatch.setattr(unsubscribe._writer, "_queue", None)
+    user_id = _user_id(client)
+
+    with pytest.raises(ConnectionError):
+        run(unsubscribe.unsubscribe, user_id, 1, "direct@example.com")
+    assert not _suppressed(run, user_id, "direct@example.com")
+
+    run(unsubscribe.unsubscribe, user_id, 1, "direct@example.com")
+    assert _suppressed(run, user_id, "direct@example.com") == {"direct@example.com"}
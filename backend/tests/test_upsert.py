@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, UniqueConstraint, select
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.upsert import upsert_increment, upsert_rows
+
+metadata = MetaData()
+items = Table(
+    "items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("owner", Integer, nullable=False),
+    Column("key", String(50), nullable=False),
+    Column("value", String(50)),
+    Column("hits", Integer, nullable=False, default=0),
+    UniqueConstraint("owner", "key"),
+)
+
+
+def with_session(fn):
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+        try:
+            async with AsyncSession(engine) as db:
+                return await fn(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _rows(db):
+    result = await db.execute(select(items.c.owner, items.c.key, items.c.value, items.c.hits).order_by(items.c.id))
+    return [tuple(row) for row in result]
+
+
+def test_insert_ignore_keeps_existing_rows_and_counts_new_ones():
+    async def scenario(db):
+        first = await upsert_rows(db, items, ("owner", "key"), [{"owner": 1, "key": "a", "value": "old"}])
+        second = await upsert_rows(
+            db, items, ("owner", "key"),
+            [{"owner": 1, "key": "a", "value": "new"}, {"owner": 1, "key": "b", "value": "b"}, {"owner": 2, "key": "a", "value": "x"}],
+        )
+        return first, second, await _rows(db)
+
+    first, second, rows = with_session(scenario)
+    assert (first, second) == (1, 2)
+    assert rows == [(1, "a", "old", 0), (1, "b", "b", 0), (2, "a", "x", 0)]
+
+
+def test_update_columns_overwrite_only_those_columns():
+    async def scenario(db):
+        await upsert_rows(db, items, ("owner", "key"), [{"owner": 1, "key": "a", "value": "old", "hits": 5}])
+        await upsert_rows(db, items, ("owner", "key"), [{"owner": 1, "key": "a", "value": "new", "hits": 0}], ("value",))
+        return await _rows(db)
+
+    assert with_session(scenario) == [(1, "a", "new", 5)]
+
+
+def test_upsert_increment_adds_counters():
+    async def scenario(db):
+        for hits in (2, 3):
+            await upsert_increment(db, items, ("owner", "key"), ("hits",), [{"owner": 1, "key": "a", "hits": hits}])
+        return await _rows(db)
+
+    assert with_session(scenario) == [(1, "a", None, 5)]
+
+
+def test_empty_rows_issue_no_statement():
+    async def scenario(db):
+        return await upsert_rows(db, items, ("owner", "key"), [])
+
+    assert with_session(scenario) == 0
+
+
+class _Recorder:
+    """Stands in for a session on dialects that can't run here; keeps the compiled SQL"""
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect.name))
+        self.sql = None
+
+    async def execute(self, stmt):
+        self.sql = str(stmt.compile(dialect=self.dialect))
+        return SimpleNamespace(rowcount=1)
+
+
+@pytest.mark.parametrize("dialect, update_columns, expected", [
+    (postgresql.dialect(), (), "ON CONFLICT (owner, key) DO NOTHING"),
+    (postgresql.dialect(), ("value",), "ON CONFLICT (owner, key) DO UPDATE SET value = excluded.value"),
+    (mysql.dialect(), (), "INSERT IGNORE INTO items"),
+    (mysql.dialect(), ("value",), "ON DUPLICATE KEY UPDATE value = VALUES(value)"),
+])
+def test_dialect_statements(dialect, update_columns, expected):
+    db = _Recorder(dialect)
+    asyncio.run(upsert_rows(db, items, ("owner", "key"), [{"owner": 1, "key": "a", "value": "v"}], update_columns))
+    assert expected in db.sql